@@ -0,0 +1,128 @@
+import asyncio
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from app.config import settings
+
+# Paths never queued, so that docs and the admin endpoints stay reachable
+# while the API is shedding load.
+EXEMPT_PATHS = ("/docs", "/redoc", "/openapi.json", "/admin")
+LIST_PATHS = ("/movies", "/actors", "/ratings")
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded FIFO wait queue for one class of routes.
+
+    Runs on the event loop: requests over the limit wait for a slot for at
+    most ``timeout`` seconds and are shed when the queue is full or the wait
+    runs out. A released slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.shed_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.timeout)
+        except BaseException:
+            # Client went away while queued; pass on a slot it was handed.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._forget(waiter)
+            raise
+        if waiter.done():
+            self.admitted += 1
+            return True
+        self._forget(waiter)
+        self.shed_timeout += 1
+        return False
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+def _make_gates() -> Dict[str, AdmissionGate]:
+    # The limits add up to less than the 40 threads of the default threadpool,
+    # so a flood of one kind of request can't take every thread.
+    timeout = settings.admission_queue_timeout_ms / 1000
+    return {
+        "list": AdmissionGate("list", settings.admission_list_limit, settings.admission_list_queue, timeout),
+        "read": AdmissionGate("read", settings.admission_read_limit, settings.admission_read_queue, timeout),
+        "rating_write": AdmissionGate(
+            "rating_write", settings.admission_rating_write_limit, settings.admission_rating_write_queue, timeout
+        ),
+        "write": AdmissionGate("write", settings.admission_write_limit, settings.admission_write_queue, timeout),
+    }
+
+
+gates = _make_gates()
+
+
+def classify(method: str, path: str, query_string: bytes) -> Optional[str]:
+    if path == "/" or path.startswith(EXEMPT_PATHS):
+        return None
+    if method in ("GET", "HEAD"):
+        if path.rstrip("/") in LIST_PATHS and b"ids=" not in query_string:
+            return "list"
+        return "read"
+    if path.startswith("/ratings"):
+        return "rating_write"
+    return "write"
+
+
+def get_gates() -> List[AdmissionGate]:
+    return list(gates.values())
+
+
+async def admission_control(request: Request, call_next):
+    name = classify(request.method, request.url.path, request.scope.get("query_string", b""))
+    if not settings.admission_enabled or name is None:
+        return await call_next(request)
+    gate = gates[name]
+    if not await gate.acquire():
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": f"Too many concurrent {name.replace('_', ' ')} requests, retry later"},
+            headers={"Retry-After": str(max(1, math.ceil(gate.timeout)))},
+        )
+    try:
+        return await call_next(request)
+    finally:
+        gate.release()
@@ -0,0 +1,53 @@
+import json
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.database.connection import get_db
+from app.business.idempotency import IdempotencyService, IdempotencyConflictError
+
+
+class IdempotencyGuard:
+    def __init__(self, service: IdempotencyService, key: Optional[str], scope: str):
+        self.service = service
+        self.key = key
+        self.scope = scope
+        self.record = None
+
+    def replay(self, payload: BaseModel) -> Optional[JSONResponse]:
+        if self.key is None:
+            return None
+        try:
+            record, owned = self.service.begin(self.key, self.scope, payload.model_dump_json(by_alias=True))
+        except IdempotencyConflictError as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+        if owned:
+            self.record = record
+            return None
+        return JSONResponse(
+            status_code=record.status_code,
+            content=json.loads(record.response_body),
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    def remember(self, status_code: int, response: BaseModel) -> None:
+        if self.record is None:
+            return
+        self.service.complete(self.record, status_code, response.model_dump_json(by_alias=True))
+        self.record = None
+
+
+def get_idempotency_guard(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db)
+):
+    guard = IdempotencyGuard(IdempotencyService(db), idempotency_key, f"{request.method} {request.url.path}")
+    try:
+        yield guard
+    finally:
+        # The write failed or was rejected: free the key so the client can retry.
+        if guard.record is not None:
+            db.rollback()
+            guard.service.release(guard.record)
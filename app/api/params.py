@@ -0,0 +1,63 @@
+from typing import List, Literal, Optional
+from fastapi import HTTPException, Query, status
+from app.config import settings
+from app.business.query_cache import HIT, STALE
+from app.business.services import MovieQuery
+
+MAX_IDS_PER_REQUEST = 100
+
+
+def parse_ids(
+    ids: Optional[str] = Query(None, description="Comma separated ids to fetch in one request, e.g. 1,2,3")
+) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    try:
+        parsed = [int(value) for value in ids.split(',') if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="ids must be a comma separated list of integers"
+        )
+    if len(parsed) > MAX_IDS_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {MAX_IDS_PER_REQUEST} ids can be requested at once"
+        )
+    # Keep the first occurrence of each id so the response follows request order.
+    return list(dict.fromkeys(parsed))
+
+
+def missing_ids_header(missing: List[int]) -> dict:
+    return {"X-Missing-Ids": ",".join(str(missing_id) for missing_id in missing)} if missing else {}
+
+
+MovieSort = Literal["id", "-id", "title", "-title", "releaseDate", "-releaseDate", "rating", "-rating"]
+
+
+def parse_movie_query(
+    genre: Optional[str] = Query(None, description="Only movies with this genre"),
+    language: Optional[str] = Query(None, description="Only movies in this language"),
+    year: Optional[int] = Query(None, ge=1800, le=3000, description="Only movies released this year"),
+    sort: Optional[MovieSort] = Query(None, description="Order, with '-' for descending; rating is the average")
+) -> Optional[MovieQuery]:
+    if genre is None and language is None and year is None and sort is None:
+        return None
+    return MovieQuery(genre=_normalize(genre), language=_normalize(language), year=year, sort=sort or "id")
+
+
+def _normalize(value: Optional[str]) -> Optional[str]:
+    # Matching ignores case, so the cache key does too.
+    value = value.strip().lower() if value is not None else None
+    return value or None
+
+
+def query_cache_headers(cache_status: str, total: int) -> dict:
+    return {
+        "Cache-Control": (
+            f"max-age={settings.query_cache_max_age_seconds}, "
+            f"stale-while-revalidate={settings.query_cache_stale_seconds}"
+        ),
+        "X-Cache": {HIT: "HIT", STALE: "STALE"}.get(cache_status, "MISS"),
+        "X-Total-Count": str(total),
+    }
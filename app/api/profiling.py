@@ -0,0 +1,204 @@
+import functools
+import inspect
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import Header, HTTPException, Request, status
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from app.config import settings
+from app.database.connection import engine
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """Stack samples and SQL timings collected while one request runs.
+
+    A background thread samples the stacks of the threads that run the
+    endpoint (registered by ``ProfiledRoute``) every ``profile_interval_ms``.
+    Samples are kept as collapsed stacks (``frame;frame;frame count``), the
+    input format of flamegraph.pl, speedscope and most other flame graph tools.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.duration_ms: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.samples: Counter = Counter()
+        self.statements: List[dict] = []
+        self.thread_ids = set()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.id[:8]}", daemon=True)
+        self._sampler.start()
+
+    def stop(self, status_code: int) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        self.status_code = status_code
+
+    @property
+    def sql_ms(self) -> float:
+        return round(sum(statement["duration_ms"] for statement in self.statements), 3)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _sample(self) -> None:
+        interval = settings.profile_interval_ms / 1000
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class ProfileStore:
+    def __init__(self):
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > settings.profile_retention:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+profile_store = ProfileStore()
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(settings.admin_token) and token is not None and secrets.compare_digest(token, settings.admin_token)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")) -> None:
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="A valid X-Admin-Token is required")
+
+
+def should_profile(request: Request) -> bool:
+    if request.headers.get("X-Profile") == "1" and is_admin(request.headers.get("X-Admin-Token")):
+        return True
+    return settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate
+
+
+async def profile_request(request: Request, call_next):
+    if not should_profile(request):
+        return await call_next(request)
+    profile = RequestProfile(request.method, request.url.path)
+    token = current_profile.set(profile)
+    profile.start()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        profile.stop(status_code)
+        current_profile.reset(token)
+        profile_store.add(profile)
+    response.headers["X-Profile-Id"] = profile.id
+    response.headers["Server-Timing"] = f"db;dur={profile.sql_ms}, total;dur={profile.duration_ms}"
+    return response
+
+
+@contextmanager
+def _watched_thread():
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profile.thread_ids.add(thread_id)
+    try:
+        yield
+    finally:
+        profile.thread_ids.discard(thread_id)
+
+
+class ProfiledRoute(APIRoute):
+    """Registers the thread that runs the endpoint with the request's profile.
+
+    Sync endpoints run in the threadpool, away from the middleware, so the
+    sampler has to be told which thread to watch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Swapped after the endpoint's signature has been analysed; the
+        # request handler looks dependant.call up on every request.
+        call = self.dependant.call
+        if inspect.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def profiled(*call_args, **call_kwargs):
+                with _watched_thread():
+                    return await call(*call_args, **call_kwargs)
+        else:
+            @functools.wraps(call)
+            def profiled(*call_args, **call_kwargs):
+                with _watched_thread():
+                    return call(*call_args, **call_kwargs)
+        self.dependant.call = profiled
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_statement_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    started = conn.info.get("profile_statement_started")
+    if profile is None or not started:
+        return
+    profile.statements.append({
+        "statement": " ".join(statement.split()),
+        "duration_ms": round((time.perf_counter() - started.pop()) * 1000, 3),
+        "executemany": executemany,
+    })
@@ -1,11 +1,16 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from app.database.connection import get_db
+from app.api.profiling import ProfiledRoute
+from app.api.idempotency import IdempotencyGuard, get_idempotency_guard
+from app.api.params import parse_ids, missing_ids_header
 from app.business.services import ActorService
-from app.api.schemas import ActorCreate, ActorUpdate, ActorResponse
+from app.api.schemas import (
+    ActorCreate, ActorUpdate, ActorResponse, CostarResponse, CostarPathResponse, CostarPathStep, MovieReference
+)
 
-router = APIRouter(prefix="/actors", tags=["actors"])
+router = APIRouter(prefix="/actors", tags=["actors"], route_class=ProfiledRoute)
 
 
 def convert_actor_to_response(actor) -> ActorResponse:
@@ -20,9 +25,17 @@ def convert_actor_to_response(actor) -> ActorResponse:
 
 
 @router.get("", response_model=List[ActorResponse])
-def get_actors(db: Session = Depends(get_db)):
+def get_actors(
+    response: Response,
+    ids: Optional[List[int]] = Depends(parse_ids),
+    db: Session = Depends(get_db)
+):
     service = ActorService(db)
-    actors = service.get_all_actors()
+    if ids is not None:
+        actors, missing = service.get_actors_by_ids(ids)
+        response.headers.update(missing_ids_header(missing))
+    else:
+        actors = service.get_all_actors()
     return [convert_actor_to_response(actor) for actor in actors]
 
 
@@ -38,8 +51,63 @@ def get_actor(actor_id: int, db: Session = Depends(get_db)):
     return convert_actor_to_response(actor)
 
 
+@router.get("/{actor_id}/costars", response_model=List[CostarResponse])
+def get_costars(
+    actor_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    service = ActorService(db)
+    costars = service.get_costars(actor_id, limit)
+    if costars is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Actor with id {actor_id} not found"
+        )
+    return [
+        CostarResponse(actor=convert_actor_to_response(actor), shared_movies=shared)
+        for actor, shared in costars
+    ]
+
+
+@router.get("/{actor_id}/path/{other_actor_id}", response_model=CostarPathResponse)
+def get_costar_path(actor_id: int, other_actor_id: int, db: Session = Depends(get_db)):
+    service = ActorService(db)
+    for requested_id in (actor_id, other_actor_id):
+        if not service.get_actor_by_id(requested_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Actor with id {requested_id} not found"
+            )
+    steps = service.find_costar_path(actor_id, other_actor_id)
+    if steps is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No co-star path between actors {actor_id} and {other_actor_id}"
+        )
+    return CostarPathResponse(
+        degrees=len(steps) - 1,
+        path=[
+            CostarPathStep(
+                actor=convert_actor_to_response(actor),
+                via_movie=MovieReference(movie_id=movie.id, title=movie.title, href=f"/movies/{movie.id}")
+                if movie else None
+            )
+            for actor, movie in steps
+        ]
+    )
+
+
 @router.post("", response_model=ActorResponse, status_code=status.HTTP_201_CREATED)
-def create_actor(actor_data: ActorCreate, db: Session = Depends(get_db)):
+def create_actor(
+    actor_data: ActorCreate,
+    idempotency: IdempotencyGuard = Depends(get_idempotency_guard),
+    db: Session = Depends(get_db)
+):
+    replayed = idempotency.replay(actor_data)
+    if replayed:
+        return replayed
+
     service = ActorService(db)
     actor = service.create_actor(
         first_name=actor_data.first_name,
@@ -47,7 +115,9 @@ def create_actor(actor_data: ActorCreate, db: Session = Depends(get_db)):
         birth_date=actor_data.birth_date,
         nationality=actor_data.nationality
     )
-    return convert_actor_to_response(actor)
+    actor_response = convert_actor_to_response(actor)
+    idempotency.remember(status.HTTP_201_CREATED, actor_response)
+    return actor_response
 
 
 @router.put("/{actor_id}", response_model=ActorResponse)
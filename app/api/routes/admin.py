@@ -0,0 +1,115 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.api.admission import get_gates
+from app.api.profiling import profile_store, require_admin
+from app.api.schemas import (
+    ProfileSummaryResponse, ProfileResponse, StatementTimingResponse, AdmissionGateResponse, SnapshotResponse
+)
+from app.database.connection import snapshot_sources
+from app.database.snapshots import snapshot_manager
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+def convert_profile_to_summary(profile) -> dict:
+    return dict(
+        id=profile.id,
+        method=profile.method,
+        path=profile.path,
+        started_at=profile.started_at,
+        status_code=profile.status_code,
+        duration_ms=profile.duration_ms,
+        sql_ms=profile.sql_ms,
+        statement_count=len(profile.statements),
+        sample_count=sum(profile.samples.values())
+    )
+
+
+def get_profile_or_404(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} not found"
+        )
+    return profile
+
+
+@router.get("/profiles", response_model=List[ProfileSummaryResponse])
+def get_profiles():
+    return [ProfileSummaryResponse(**convert_profile_to_summary(profile)) for profile in profile_store.list()]
+
+
+@router.get("/profiles/{profile_id}", response_model=ProfileResponse)
+def get_profile(profile_id: str):
+    profile = get_profile_or_404(profile_id)
+    return ProfileResponse(
+        **convert_profile_to_summary(profile),
+        statements=[StatementTimingResponse(**statement) for statement in profile.statements],
+        collapsed_stacks=profile.collapsed()
+    )
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def get_profile_collapsed_stacks(profile_id: str):
+    return get_profile_or_404(profile_id).collapsed()
+
+
+@router.get("/admission", response_model=List[AdmissionGateResponse])
+def get_admission_gates():
+    return [
+        AdmissionGateResponse(
+            name=gate.name,
+            limit=gate.limit,
+            queue_size=gate.queue_size,
+            active=gate.active,
+            waiting=gate.waiting,
+            admitted=gate.admitted,
+            shed_queue_full=gate.shed_queue_full,
+            shed_timeout=gate.shed_timeout
+        )
+        for gate in get_gates()
+    ]
+
+
+def convert_snapshot_to_response(snapshot) -> SnapshotResponse:
+    return SnapshotResponse(
+        id=snapshot.id,
+        status=snapshot.status,
+        path=str(snapshot.path),
+        files=snapshot.files,
+        started_at=snapshot.started_at,
+        finished_at=snapshot.finished_at,
+        pages_total=snapshot.pages_total,
+        pages_copied=snapshot.pages_copied,
+        restarts=snapshot.restarts,
+        error=snapshot.error
+    )
+
+
+@router.post("/snapshots", response_model=SnapshotResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_snapshot():
+    snapshot = snapshot_manager.start(snapshot_sources())
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A snapshot is already running"
+        )
+    return convert_snapshot_to_response(snapshot)
+
+
+@router.get("/snapshots", response_model=List[SnapshotResponse])
+def get_snapshots():
+    return [convert_snapshot_to_response(snapshot) for snapshot in snapshot_manager.list()]
+
+
+@router.get("/snapshots/{snapshot_id}", response_model=SnapshotResponse)
+def get_snapshot(snapshot_id: str):
+    snapshot = snapshot_manager.get(snapshot_id)
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Snapshot {snapshot_id} not found"
+        )
+    return convert_snapshot_to_response(snapshot)
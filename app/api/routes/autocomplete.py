@@ -0,0 +1,28 @@
+from typing import List, Literal
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database.connection import get_db
+from app.api.profiling import ProfiledRoute
+from app.business.services import MovieService, ActorService
+from app.api.schemas import SuggestionResponse
+
+router = APIRouter(prefix="/autocomplete", tags=["autocomplete"], route_class=ProfiledRoute)
+
+
+@router.get("", response_model=List[SuggestionResponse])
+def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Literal["movie", "actor"] = Query("movie", alias="type"),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    if kind == "movie":
+        suggestions = MovieService(db).suggest(q, limit)
+        base = "/movies"
+    else:
+        suggestions = ActorService(db).suggest(q, limit)
+        base = "/actors"
+    return [
+        SuggestionResponse(id=item_id, type=kind, label=label, popularity=popularity, href=f"{base}/{item_id}")
+        for item_id, label, popularity in suggestions
+    ]
@@ -0,0 +1,195 @@
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.connection import BatchSession, BatchSessionLocal
+from app.database.partitions import rating_partitions
+from app.api.profiling import ProfiledRoute
+from app.api.idempotency import IdempotencyGuard, get_idempotency_guard
+from app.api.routes import movies, actors, ratings
+from app.api.schemas import (
+    MovieCreate, MovieUpdate, ActorCreate, ActorUpdate, RatingCreate, RatingUpdate,
+    BatchOperation, BatchOperationResult, BatchRequest, BatchResponse
+)
+from app.business.cache_bus import cache_bus
+from app.business.idempotency import IdempotencyService
+from app.business.services import RatingService
+
+router = APIRouter(prefix="/batch", tags=["batch"], route_class=ProfiledRoute)
+
+
+def no_idempotency(db: Session) -> IdempotencyGuard:
+    # An Idempotency-Key covers the whole batch, not the operations in it.
+    return IdempotencyGuard(IdempotencyService(db), None, "batch")
+
+
+# (method, collection) -> (body schema, handler(db, id, body), status code).
+# Each handler is the endpoint the operation would otherwise be sent to.
+OPERATIONS = {
+    ("POST", "movies"): (
+        MovieCreate, lambda db, _, data: movies.create_movie(data, no_idempotency(db), db), status.HTTP_201_CREATED
+    ),
+    ("PUT", "movies"): (MovieUpdate, lambda db, movie_id, data: movies.update_movie(movie_id, data, db), status.HTTP_200_OK),
+    ("DELETE", "movies"): (None, lambda db, movie_id, _: movies.delete_movie(movie_id, db), status.HTTP_204_NO_CONTENT),
+    ("POST", "actors"): (
+        ActorCreate, lambda db, _, data: actors.create_actor(data, no_idempotency(db), db), status.HTTP_201_CREATED
+    ),
+    ("PUT", "actors"): (ActorUpdate, lambda db, actor_id, data: actors.update_actor(actor_id, data, db), status.HTTP_200_OK),
+    ("DELETE", "actors"): (None, lambda db, actor_id, _: actors.delete_actor(actor_id, db), status.HTTP_204_NO_CONTENT),
+    # Ratings are written at once even with the write-behind queue on, so
+    # that they are part of the batch's transaction.
+    ("POST", "ratings"): (
+        RatingCreate, lambda db, _, data: ratings.store_rating(data, RatingService(db)), status.HTTP_201_CREATED
+    ),
+    ("PUT", "ratings"): (
+        RatingUpdate, lambda db, rating_id, data: ratings.update_rating(rating_id, data, db), status.HTTP_200_OK
+    ),
+    ("DELETE", "ratings"): (None, lambda db, rating_id, _: ratings.delete_rating(rating_id, db), status.HTTP_204_NO_CONTENT),
+}
+
+
+def check_batch(batch: BatchRequest) -> None:
+    if len(batch.operations) > settings.batch_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can have at most {settings.batch_max_operations} operations"
+        )
+    refs = [operation.ref for operation in batch.operations if operation.ref]
+    if len(refs) != len(set(refs)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each ref can only be defined once in a batch"
+        )
+    if rating_partitions.enabled:
+        # Partitioned ratings are committed in their own files, outside the
+        # batch's transaction.
+        for operation in batch.operations:
+            collection = operation.path.strip("/").split("/")[0]
+            if collection == "ratings" or (collection == "movies" and operation.method == "DELETE"):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Batches can't write ratings while ratings are partitioned"
+                )
+
+
+def resolve_ref(name: str, refs: Dict[str, int]) -> int:
+    if name not in refs:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown ref {name}; refs must be defined by an earlier operation"
+        )
+    return refs[name]
+
+
+def resolve_refs(value: Any, refs: Dict[str, int]) -> Any:
+    # {"$ref": "name"} anywhere in a body stands for the id of the row
+    # created by the operation with that ref.
+    if isinstance(value, dict):
+        if set(value) == {"$ref"}:
+            return resolve_ref(value["$ref"], refs)
+        return {key: resolve_refs(item, refs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(item, refs) for item in value]
+    return value
+
+
+def parse_path(operation: BatchOperation, refs: Dict[str, int]) -> Tuple[str, Optional[int]]:
+    segments = operation.path.strip("/").split("/")
+    target = segments[1] if len(segments) == 2 else None
+    target_id = None
+    if target is not None and target.startswith("$"):
+        target_id = resolve_ref(target[1:], refs)
+    elif target is not None and target.isdigit():
+        target_id = int(target)
+    if (
+        len(segments) > 2
+        or (target is not None and target_id is None)
+        or (operation.method, segments[0]) not in OPERATIONS
+        or (operation.method == "POST") != (target_id is None)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported operation {operation.method} {operation.path}"
+        )
+    return segments[0], target_id
+
+
+def run_operation(db: Session, operation: BatchOperation, refs: Dict[str, int]) -> BatchOperationResult:
+    collection, target_id = parse_path(operation, refs)
+    schema, handler, status_code = OPERATIONS[(operation.method, collection)]
+    data = None
+    if schema is not None:
+        try:
+            data = schema.model_validate(resolve_refs(operation.body or {}, refs))
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=jsonable_encoder(exc.errors(include_url=False))
+            )
+    response = handler(db, target_id, data)
+    body = response.model_dump(mode="json", by_alias=True) if response is not None else None
+    if operation.ref:
+        refs[operation.ref] = body["id"] if body else target_id
+    return BatchOperationResult(status=status_code, ref=operation.ref, body=body)
+
+
+def run_operations(db: Session, operations: List[BatchOperation]) -> Tuple[List[BatchOperationResult], Optional[int]]:
+    refs: Dict[str, int] = {}
+    results = []
+    for index, operation in enumerate(operations):
+        try:
+            results.append(run_operation(db, operation, refs))
+        except HTTPException as exc:
+            results.append(BatchOperationResult(status=exc.status_code, ref=operation.ref, detail=exc.detail))
+            results.extend(
+                BatchOperationResult(
+                    status=status.HTTP_424_FAILED_DEPENDENCY,
+                    ref=skipped.ref,
+                    detail=f"Not run because operation {index} failed"
+                )
+                for skipped in operations[index + 1:]
+            )
+            return results, exc.status_code
+    return results, None
+
+
+def roll_back(db: BatchSession) -> None:
+    # The services have already applied the batch's writes to the in-memory
+    # caches, so those are put back as well.
+    changes = list(db.info.get('uncommitted_changes', []))
+    db.rollback()
+    if changes:
+        cache_bus.revert(db, changes)
+
+
+@router.post("", response_model=BatchResponse)
+def run_batch(
+    batch: BatchRequest,
+    idempotency: IdempotencyGuard = Depends(get_idempotency_guard)
+):
+    check_batch(batch)
+    replayed = idempotency.replay(batch)
+    if replayed:
+        return replayed
+
+    with BatchSessionLocal() as db:
+        try:
+            results, failed_status = run_operations(db, batch.operations)
+            if failed_status is None:
+                db.commit_batch()
+        except Exception:
+            roll_back(db)
+            raise
+        if failed_status is not None:
+            roll_back(db)
+            return JSONResponse(
+                status_code=failed_status,
+                content=BatchResponse(committed=False, results=results).model_dump(mode="json", by_alias=True)
+            )
+
+    batch_response = BatchResponse(committed=True, results=results)
+    idempotency.remember(status.HTTP_200_OK, batch_response)
+    return batch_response
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database.connection import get_db
+from app.api.profiling import ProfiledRoute
+from app.business.change_feed import ChangeFeedService
+from app.api.schemas import ChangeFeedResponse, ChangeResponse, MovieSummaryResponse, RatingWithMovieResponse
+from app.api.routes.actors import convert_actor_to_response
+
+router = APIRouter(prefix="/changes", tags=["changes"], route_class=ProfiledRoute)
+
+
+def convert_change_data(change) -> dict:
+    if change.entity == "movie":
+        movie, actor_ids = change.data
+        data = MovieSummaryResponse(
+            id=movie.id,
+            title=movie.title,
+            release_date=movie.release_date,
+            runtime=movie.runtime,
+            synopsis=movie.synopsis,
+            poster_url=movie.poster_url,
+            language=movie.language,
+            genres=movie.genres.split(',') if movie.genres else [],
+            budget=movie.budget,
+            revenue=movie.revenue,
+            actor_ids=actor_ids
+        )
+    elif change.entity == "actor":
+        data = convert_actor_to_response(change.data)
+    else:
+        rating = change.data
+        data = RatingWithMovieResponse(
+            id=rating.id,
+            score=rating.score,
+            review_text=rating.review_text,
+            reviewer_email=rating.reviewer_email,
+            movie_id=rating.movie_id
+        )
+    return data.model_dump(mode="json", by_alias=True)
+
+
+@router.get("", response_model=ChangeFeedResponse)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    service = ChangeFeedService(db)
+    changes, next_since, has_more = service.get_changes(since, limit)
+    return ChangeFeedResponse(
+        changes=[
+            ChangeResponse(
+                seq=change.seq,
+                entity=change.entity,
+                id=change.entity_id,
+                op=change.operation,
+                data=convert_change_data(change) if change.operation == "upsert" else None
+            )
+            for change in changes
+        ],
+        next_since=next_since,
+        has_more=has_more
+    )
@@ -1,11 +1,17 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from app.database.connection import get_db
-from app.business.services import MovieService
-from app.api.schemas import MovieCreate, MovieUpdate, MovieResponse, ActorResponse, RatingResponse
+from app.api.profiling import ProfiledRoute
+from app.api.idempotency import IdempotencyGuard, get_idempotency_guard
+from app.api.params import parse_ids, missing_ids_header, parse_movie_query, query_cache_headers
+from app.business.services import MovieQuery, MovieService
+from app.api.schemas import (
+    MovieCreate, MovieUpdate, MovieResponse, ActorResponse, RatingResponse, SimilarMovieResponse,
+    TrendingMovieResponse
+)
 
-router = APIRouter(prefix="/movies", tags=["movies"])
+router = APIRouter(prefix="/movies", tags=["movies"], route_class=ProfiledRoute)
 
 
 def convert_movie_to_response(movie, service: MovieService) -> MovieResponse:
@@ -49,12 +55,50 @@ def convert_movie_to_response(movie, service: MovieService) -> MovieResponse:
 
 
 @router.get("", response_model=List[MovieResponse])
-def get_movies(db: Session = Depends(get_db)):
+def get_movies(
+    response: Response,
+    ids: Optional[List[int]] = Depends(parse_ids),
+    query: Optional[MovieQuery] = Depends(parse_movie_query),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cache_control: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     service = MovieService(db)
-    movies = service.get_all_movies()
+    if ids is not None:
+        movies, missing = service.get_movies_by_ids(ids)
+        response.headers.update(missing_ids_header(missing))
+    elif query is not None or offset or limit is not None:
+        # Filtered, sorted or paged lists go through the query cache;
+        # "Cache-Control: no-cache" asks for the ids to be read again.
+        refresh = cache_control is not None and "no-cache" in cache_control.lower()
+        movies, total, cache_status = service.find_movies(query or MovieQuery(), offset, limit, refresh)
+        response.headers.update(query_cache_headers(cache_status, total))
+    else:
+        movies = service.get_all_movies()
     return [convert_movie_to_response(movie, service) for movie in movies]
 
 
+@router.get("/trending", response_model=List[TrendingMovieResponse])
+def get_trending_movies(
+    window: Literal["1h", "24h", "7d"] = "24h",
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    service = MovieService(db)
+    return [
+        TrendingMovieResponse(
+            movie_id=movie.id,
+            title=movie.title,
+            release_date=movie.release_date,
+            genres=movie.genres.split(',') if movie.genres else [],
+            rating_count=count,
+            href=f"/movies/{movie.id}"
+        )
+        for movie, count in service.get_trending(window, limit)
+    ]
+
+
 @router.get("/{movie_id}", response_model=MovieResponse)
 def get_movie(movie_id: int, db: Session = Depends(get_db)):
     service = MovieService(db)
@@ -67,8 +111,42 @@ def get_movie(movie_id: int, db: Session = Depends(get_db)):
     return convert_movie_to_response(movie, service)
 
 
+@router.get("/{movie_id}/similar", response_model=List[SimilarMovieResponse])
+def get_similar_movies(
+    movie_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    service = MovieService(db)
+    similar = service.get_similar_movies(movie_id, limit)
+    if similar is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Movie with id {movie_id} not found"
+        )
+    return [
+        SimilarMovieResponse(
+            movie_id=movie.id,
+            title=movie.title,
+            release_date=movie.release_date,
+            genres=movie.genres.split(',') if movie.genres else [],
+            score=score,
+            href=f"/movies/{movie.id}"
+        )
+        for movie, score in similar
+    ]
+
+
 @router.post("", response_model=MovieResponse, status_code=status.HTTP_201_CREATED)
-def create_movie(movie_data: MovieCreate, db: Session = Depends(get_db)):
+def create_movie(
+    movie_data: MovieCreate,
+    idempotency: IdempotencyGuard = Depends(get_idempotency_guard),
+    db: Session = Depends(get_db)
+):
+    replayed = idempotency.replay(movie_data)
+    if replayed:
+        return replayed
+
     service = MovieService(db)
 
     movie = service.create_movie(
@@ -84,7 +162,9 @@ def create_movie(movie_data: MovieCreate, db: Session = Depends(get_db)):
         actor_ids=movie_data.actor_ids
     )
 
-    return convert_movie_to_response(movie, service)
+    movie_response = convert_movie_to_response(movie, service)
+    idempotency.remember(status.HTTP_201_CREATED, movie_response)
+    return movie_response
 
 
 @router.put("/{movie_id}", response_model=MovieResponse)
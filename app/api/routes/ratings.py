@@ -1,11 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from app.database.connection import get_db
+from app.api.profiling import ProfiledRoute
+from app.api.idempotency import IdempotencyGuard, get_idempotency_guard
+from app.api.params import parse_ids, missing_ids_header
 from app.business.services import RatingService
-from app.api.schemas import RatingCreate, RatingUpdate, RatingResponse
+from app.business.rating_writer import rating_writer, QueueFullError
+from app.api.schemas import RatingCreate, RatingUpdate, RatingResponse, RatingSubmissionResponse
 
-router = APIRouter(prefix="/ratings", tags=["ratings"])
+router = APIRouter(prefix="/ratings", tags=["ratings"], route_class=ProfiledRoute)
 
 
 def convert_rating_to_response(rating) -> RatingResponse:
@@ -18,12 +22,42 @@ def convert_rating_to_response(rating) -> RatingResponse:
 
 
 @router.get("", response_model=List[RatingResponse])
-def get_ratings(db: Session = Depends(get_db)):
+def get_ratings(
+    response: Response,
+    ids: Optional[List[int]] = Depends(parse_ids),
+    db: Session = Depends(get_db)
+):
     service = RatingService(db)
-    ratings = service.get_all_ratings()
+    if ids is not None:
+        ratings, missing = service.get_ratings_by_ids(ids)
+        response.headers.update(missing_ids_header(missing))
+    else:
+        ratings = service.get_all_ratings()
     return [convert_rating_to_response(rating) for rating in ratings]
 
 
+def convert_submission_to_response(submission) -> RatingSubmissionResponse:
+    return RatingSubmissionResponse(
+        tracking_id=submission.tracking_id,
+        status=submission.status,
+        rating_id=submission.rating_id,
+        detail=submission.detail,
+        href=f"/ratings/submissions/{submission.tracking_id}"
+    )
+
+
+@router.get("/submissions/{tracking_id}", response_model=RatingSubmissionResponse)
+def get_rating_submission(tracking_id: str, db: Session = Depends(get_db)):
+    service = RatingService(db)
+    submission = service.get_submission(tracking_id)
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Rating submission {tracking_id} not found"
+        )
+    return convert_submission_to_response(submission)
+
+
 @router.get("/{rating_id}", response_model=RatingResponse)
 def get_rating(rating_id: int, db: Session = Depends(get_db)):
     service = RatingService(db)
@@ -36,9 +70,54 @@ def get_rating(rating_id: int, db: Session = Depends(get_db)):
     return convert_rating_to_response(rating)
 
 
-@router.post("", response_model=RatingResponse, status_code=status.HTTP_201_CREATED)
-def create_rating(rating_data: RatingCreate, db: Session = Depends(get_db)):
+@router.post(
+    "",
+    response_model=Union[RatingResponse, RatingSubmissionResponse],
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": RatingSubmissionResponse}}
+)
+def create_rating(
+    rating_data: RatingCreate,
+    response: Response,
+    idempotency: IdempotencyGuard = Depends(get_idempotency_guard),
+    db: Session = Depends(get_db)
+):
+    replayed = idempotency.replay(rating_data)
+    if replayed:
+        return replayed
+
     service = RatingService(db)
+    if rating_writer.enabled:
+        try:
+            submission = service.submit_rating(
+                score=rating_data.score,
+                movie_id=rating_data.movie_id,
+                review_text=rating_data.review_text,
+                reviewer_email=rating_data.reviewer_email
+            )
+        except QueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Rating queue is full, retry later",
+                headers={"Retry-After": "1"}
+            )
+        if not submission:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Movie with id {rating_data.movie_id} not found"
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
+        submission_response = convert_submission_to_response(submission)
+        idempotency.remember(status.HTTP_202_ACCEPTED, submission_response)
+        return submission_response
+
+    rating_response = store_rating(rating_data, service)
+    idempotency.remember(status.HTTP_201_CREATED, rating_response)
+    return rating_response
+
+
+def store_rating(rating_data: RatingCreate, service: RatingService) -> RatingResponse:
+    # Writes the rating now, whether or not the write-behind queue is on.
     rating = service.create_rating(
         score=rating_data.score,
         movie_id=rating_data.movie_id,
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from app.database.connection import get_db
+from app.api.profiling import ProfiledRoute
+from app.business.services import ReviewerService
+from app.api.schemas import ReviewerResponse, ReviewerRatingsResponse, RatingWithMovieResponse
+
+router = APIRouter(prefix="/reviewers", tags=["reviewers"], route_class=ProfiledRoute)
+
+
+def reviewer_not_found(email: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Reviewer {email} not found"
+    )
+
+
+@router.get("/{email}", response_model=ReviewerResponse)
+def get_reviewer(email: str, db: Session = Depends(get_db)):
+    service = ReviewerService(db)
+    summary = service.get_summary(email)
+    if not summary:
+        raise reviewer_not_found(email)
+    return ReviewerResponse(
+        email=summary.email,
+        rating_count=summary.rating_count,
+        mean_score=summary.mean_score,
+        bias=summary.bias
+    )
+
+
+@router.get("/{email}/ratings", response_model=ReviewerRatingsResponse)
+def get_reviewer_ratings(
+    email: str,
+    after: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    service = ReviewerService(db)
+    page = service.get_ratings(email, after, limit)
+    if page is None:
+        raise reviewer_not_found(email)
+    ratings, has_more = page
+    return ReviewerRatingsResponse(
+        ratings=[
+            RatingWithMovieResponse(
+                id=rating.id,
+                score=rating.score,
+                review_text=rating.review_text,
+                reviewer_email=rating.reviewer_email,
+                movie_id=rating.movie_id
+            )
+            for rating in ratings
+        ],
+        next_after=ratings[-1].id if ratings else after,
+        has_more=has_more
+    )
@@ -1,5 +1,5 @@
-from datetime import date
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field, EmailStr
 
 
@@ -19,6 +19,15 @@ class RatingReference(BaseModel):
         populate_by_name = True
 
 
+class MovieReference(BaseModel):
+    movie_id: int = Field(alias="movieId")
+    title: str
+    href: str
+
+    class Config:
+        populate_by_name = True
+
+
 class ActorBase(BaseModel):
     first_name: str = Field(alias="firstName")
     last_name: str = Field(alias="lastName")
@@ -52,6 +61,27 @@ class ActorResponse(ActorBase):
         from_attributes = True
 
 
+class CostarResponse(BaseModel):
+    actor: ActorResponse
+    shared_movies: int = Field(alias="sharedMovies")
+
+    class Config:
+        populate_by_name = True
+
+
+class CostarPathStep(BaseModel):
+    actor: ActorResponse
+    via_movie: Optional[MovieReference] = Field(None, alias="viaMovie")
+
+    class Config:
+        populate_by_name = True
+
+
+class CostarPathResponse(BaseModel):
+    degrees: int
+    path: List[CostarPathStep]
+
+
 class RatingBase(BaseModel):
     score: float = Field(ge=0, le=10)
     review_text: Optional[str] = Field(None, alias="reviewText")
@@ -85,6 +115,25 @@ class RatingResponse(RatingBase):
         from_attributes = True
 
 
+class RatingWithMovieResponse(RatingResponse):
+    movie_id: int = Field(alias="movieId")
+
+    class Config:
+        populate_by_name = True
+        from_attributes = True
+
+
+class RatingSubmissionResponse(BaseModel):
+    tracking_id: str = Field(alias="trackingId")
+    status: str
+    rating_id: Optional[int] = Field(None, alias="ratingId")
+    detail: Optional[str] = None
+    href: str
+
+    class Config:
+        populate_by_name = True
+
+
 class MovieBase(BaseModel):
     title: str
     release_date: date = Field(alias="releaseDate")
@@ -132,3 +181,167 @@ class MovieResponse(MovieBase):
     class Config:
         populate_by_name = True
         from_attributes = True
+
+
+class SimilarMovieResponse(BaseModel):
+    movie_id: int = Field(alias="movieId")
+    title: str
+    release_date: date = Field(alias="releaseDate")
+    genres: List[str]
+    score: float
+    href: str
+
+    class Config:
+        populate_by_name = True
+
+
+class TrendingMovieResponse(BaseModel):
+    movie_id: int = Field(alias="movieId")
+    title: str
+    release_date: date = Field(alias="releaseDate")
+    genres: List[str]
+    rating_count: int = Field(alias="ratingCount")
+    href: str
+
+    class Config:
+        populate_by_name = True
+
+
+class MovieSummaryResponse(MovieBase):
+    id: int
+    actor_ids: List[int] = Field(alias="actorIds")
+
+    class Config:
+        populate_by_name = True
+
+
+class ChangeResponse(BaseModel):
+    seq: int
+    entity: str
+    id: int
+    op: str
+    data: Optional[Dict[str, Any]] = None
+
+
+class ChangeFeedResponse(BaseModel):
+    changes: List[ChangeResponse]
+    next_since: int = Field(alias="nextSince")
+    has_more: bool = Field(alias="hasMore")
+
+    class Config:
+        populate_by_name = True
+
+
+class SuggestionResponse(BaseModel):
+    id: int
+    type: str
+    label: str
+    popularity: int
+    href: str
+
+    class Config:
+        populate_by_name = True
+
+
+class ReviewerResponse(BaseModel):
+    email: str
+    rating_count: int = Field(alias="ratingCount")
+    mean_score: float = Field(alias="meanScore")
+    bias: Optional[float] = None
+
+    class Config:
+        populate_by_name = True
+
+
+class ReviewerRatingsResponse(BaseModel):
+    ratings: List[RatingWithMovieResponse]
+    next_after: int = Field(alias="nextAfter")
+    has_more: bool = Field(alias="hasMore")
+
+    class Config:
+        populate_by_name = True
+
+
+class StatementTimingResponse(BaseModel):
+    statement: str
+    duration_ms: float = Field(alias="durationMs")
+    executemany: bool
+
+    class Config:
+        populate_by_name = True
+
+
+class ProfileSummaryResponse(BaseModel):
+    id: str
+    method: str
+    path: str
+    started_at: datetime = Field(alias="startedAt")
+    status_code: int = Field(alias="statusCode")
+    duration_ms: float = Field(alias="durationMs")
+    sql_ms: float = Field(alias="sqlMs")
+    statement_count: int = Field(alias="statementCount")
+    sample_count: int = Field(alias="sampleCount")
+
+    class Config:
+        populate_by_name = True
+
+
+class ProfileResponse(ProfileSummaryResponse):
+    statements: List[StatementTimingResponse]
+    collapsed_stacks: str = Field(alias="collapsedStacks")
+
+    class Config:
+        populate_by_name = True
+
+
+class SnapshotResponse(BaseModel):
+    id: str
+    status: str
+    path: str
+    files: List[str]
+    started_at: datetime = Field(alias="startedAt")
+    finished_at: Optional[datetime] = Field(None, alias="finishedAt")
+    pages_total: int = Field(alias="pagesTotal")
+    pages_copied: int = Field(alias="pagesCopied")
+    restarts: int
+    error: Optional[str] = None
+
+    class Config:
+        populate_by_name = True
+
+
+class AdmissionGateResponse(BaseModel):
+    name: str
+    limit: int
+    queue_size: int = Field(alias="queueSize")
+    active: int
+    waiting: int
+    admitted: int
+    shed_queue_full: int = Field(alias="shedQueueFull")
+    shed_timeout: int = Field(alias="shedTimeout")
+
+    class Config:
+        populate_by_name = True
+
+
+class BatchOperation(BaseModel):
+    method: Literal["POST", "PUT", "DELETE"]
+    path: str
+    body: Optional[Dict[str, Any]] = None
+    ref: Optional[str] = Field(None, pattern=r"^\w+$")
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1)
+
+
+class BatchOperationResult(BaseModel):
+    status: int
+    ref: Optional[str] = None
+    body: Optional[Any] = None
+    detail: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: List[BatchOperationResult]
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qsl
+from fastapi import Request
+from app.config import settings
+
+# Never recorded: docs, admin calls (and their tokens) and the root page.
+SKIPPED_PATHS = ("/docs", "/redoc", "/openapi.json", "/admin")
+# Free text is replaced by filler of the same length, so request sizes stay
+# realistic without keeping what people wrote.
+FREE_TEXT_FIELDS = {"reviewText", "synopsis"}
+MAX_BODY_BYTES = 64 * 1024
+EMAIL = re.compile(r"[^@\s/]+@[^@\s/]+\.[^@\s/]+")
+
+
+def pseudonymize(email: str, salt: str) -> str:
+    digest = hashlib.sha256((salt + email.lower()).encode()).hexdigest()[:12]
+    return f"user-{digest}@example.com"
+
+
+class TrafficRecorder:
+    """Writes sanitized request lines to a rotating JSONL file.
+
+    Lines are handed to a queue and written by a background thread, so the
+    event loop never waits on the disk. Reviewer emails are replaced by
+    pseudonyms that are stable for a given ``traffic_capture_salt``, which
+    keeps per-reviewer access patterns without keeping addresses.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger("movie_api.traffic")
+        self._logger.propagate = False
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._salt = settings.traffic_capture_salt or secrets.token_hex(16)
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        path = Path(settings.traffic_capture_path.format(pid=os.getpid()))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=settings.traffic_capture_max_bytes, backupCount=settings.traffic_capture_backups,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        lines: queue.Queue = queue.Queue(settings.traffic_capture_queue_size)
+        self._logger.addHandler(_DroppingQueueHandler(lines))
+        self._logger.setLevel(logging.INFO)
+        self._listener = logging.handlers.QueueListener(lines, handler)
+        self._listener.start()
+
+    def stop(self) -> None:
+        if self._listener is None:
+            return
+        self._listener.stop()
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+
+    def record(self, line: dict) -> None:
+        self._logger.info(json.dumps(line, separators=(",", ":"), default=str))
+
+    def sanitize(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, dict):
+            return {name: self.sanitize(item, name) for name, item in value.items()}
+        if isinstance(value, list):
+            return [self.sanitize(item) for item in value]
+        if isinstance(value, str):
+            if key in FREE_TEXT_FIELDS:
+                return "x" * len(value)
+            return EMAIL.sub(lambda match: pseudonymize(match.group(0), self._salt), value)
+        return value
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    # A full queue drops lines rather than blocking requests.
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+traffic_recorder = TrafficRecorder()
+
+
+def _parse_body(body: bytes, content_type: str) -> Any:
+    if not body or len(body) > MAX_BODY_BYTES or "json" not in content_type:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def capture_traffic(request: Request, call_next):
+    path = request.url.path
+    if (
+        not traffic_recorder.running
+        or path == "/"
+        or path.startswith(SKIPPED_PATHS)
+        or random.random() >= settings.traffic_capture_sample_rate
+    ):
+        return await call_next(request)
+
+    arrived = time.time()
+    started = time.perf_counter()
+    body = await request.body()
+    response = await call_next(request)
+    recorder = traffic_recorder
+    route = request.scope.get("route")
+    line = {
+        "ts": round(arrived, 6),
+        "method": request.method,
+        "path": recorder.sanitize(path),
+        "query": [[name, recorder.sanitize(value)] for name, value in parse_qsl(request.url.query, keep_blank_values=True)],
+        "body": recorder.sanitize(_parse_body(body, request.headers.get("content-type", ""))),
+        "idempotencyKey": (
+            hashlib.sha256(request.headers["Idempotency-Key"].encode()).hexdigest()[:16]
+            if "Idempotency-Key" in request.headers else None
+        ),
+        "route": route.path if route else None,
+        "status": response.status_code,
+    }
+    if request.method != "POST" or response.status_code != 201:
+        line["durationMs"] = round((time.perf_counter() - started) * 1000, 3)
+        recorder.record(line)
+        return response
+
+    # Created ids are kept so that a replay can point later requests at the
+    # rows it creates itself; the body is read as it is streamed out.
+    chunks = []
+    original = response.body_iterator
+
+    async def record_after_body():
+        async for chunk in original:
+            chunks.append(chunk)
+            yield chunk
+        line["durationMs"] = round((time.perf_counter() - started) * 1000, 3)
+        created = _parse_body(b"".join(chunks), response.headers.get("content-type", ""))
+        if isinstance(created, dict):
+            line["createdId"] = created.get("id")
+        recorder.record(line)
+
+    response.body_iterator = record_after_body()
+    return response
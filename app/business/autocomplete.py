@@ -0,0 +1,297 @@
+import heapq
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.database.models import Movie, Actor
+from app.persistence.repositories import MovieRepository, ActorRepository, get_rating_repository
+from app.business.costar_graph import costar_graph
+
+MAX_SUGGESTIONS = 20
+CACHE_THRESHOLD = 256
+_MAX_CHAR = '\U0010ffff'
+
+# (item id, label, popularity)
+Suggestion = Tuple[int, str, int]
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(' ' if not char.isalnum() else char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+def movie_keys(title: str) -> List[str]:
+    return [normalize(title)]
+
+
+def actor_label(first_name: str, last_name: str) -> str:
+    return f"{first_name} {last_name}"
+
+
+def actor_keys(first_name: str, last_name: str) -> List[str]:
+    return [normalize(actor_label(first_name, last_name)), normalize(last_name)]
+
+
+class PrefixIndex:
+    """Normalized keys in a sorted list with a parallel id array, searched by bisect.
+
+    Prefixes matching more than ``CACHE_THRESHOLD`` keys keep their ranked top
+    ``MAX_SUGGESTIONS`` ids. Those lists are patched in place when an item is
+    added or gains popularity, and dropped when one of their items is removed
+    or loses popularity so that the next search recomputes them.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._ids = array('i')
+        self._labels: Dict[int, str] = {}
+        self._item_keys: Dict[int, Tuple[str, ...]] = {}
+        self._popularity: Dict[int, int] = {}
+        self._top: Dict[str, List[int]] = {}
+
+    def load(self, items: Iterable[Tuple[int, str, Iterable[str]]], popularity: Dict[int, int]) -> None:
+        entries = []
+        for item_id, label, keys in items:
+            keys = tuple(dict.fromkeys(key for key in keys if key))
+            self._labels[item_id] = label
+            self._item_keys[item_id] = keys
+            entries.extend((key, item_id) for key in keys)
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._ids = array('i', (item_id for _, item_id in entries))
+        self._popularity = {item_id: count for item_id, count in popularity.items() if item_id in self._labels}
+        self._top = {}
+        self._warm('', 0, len(self._keys))
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._labels
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._labels))
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def popularity(self, item_id: int) -> int:
+        return self._popularity.get(item_id, 0)
+
+    def search(self, prefix: str, limit: int) -> List[Suggestion]:
+        if not prefix:
+            return []
+        top = self._top.get(prefix)
+        if top is None:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix + _MAX_CHAR, lo)
+            top = self._rank(self._ids[lo:hi])
+            if hi - lo > CACHE_THRESHOLD:
+                self._top[prefix] = top
+        return [(item_id, self._labels[item_id], self.popularity(item_id)) for item_id in top[:limit]]
+
+    def put(self, item_id: int, label: str, keys: Iterable[str]) -> None:
+        keys = tuple(dict.fromkeys(key for key in keys if key))
+        previous = self._item_keys.get(item_id, ())
+        # The label breaks popularity ties, so cached lists holding the item are stale.
+        self._forget(item_id, previous)
+        for key in previous:
+            if key not in keys:
+                self._remove_entry(key, item_id)
+        for key in keys:
+            if key not in previous:
+                position = bisect_right(self._keys, key)
+                self._keys.insert(position, key)
+                self._ids.insert(position, item_id)
+        self._labels[item_id] = label
+        self._item_keys[item_id] = keys
+        self._promote(item_id, keys)
+
+    def remove(self, item_id: int) -> None:
+        keys = self._item_keys.pop(item_id, None)
+        if keys is None:
+            return
+        self._forget(item_id, keys)
+        for key in keys:
+            self._remove_entry(key, item_id)
+        del self._labels[item_id]
+        self._popularity.pop(item_id, None)
+
+    def add_popularity(self, item_id: int, delta: int) -> None:
+        if item_id not in self._labels or not delta:
+            return
+        self._popularity[item_id] = self.popularity(item_id) + delta
+        if delta > 0:
+            self._promote(item_id, self._item_keys[item_id])
+        else:
+            self._forget(item_id, self._item_keys[item_id])
+
+    def _rank_key(self, item_id: int):
+        return -self.popularity(item_id), self._labels[item_id], item_id
+
+    def _rank(self, item_ids: Iterable[int]) -> List[int]:
+        return heapq.nsmallest(MAX_SUGGESTIONS, dict.fromkeys(item_ids), key=self._rank_key)
+
+    def _warm(self, prefix: str, lo: int, hi: int) -> List[int]:
+        # Builds the cached lists bottom-up: a prefix's top ids are ranked from
+        # its children's top ids, so every key is looked at once per level.
+        if hi - lo <= CACHE_THRESHOLD:
+            return list(self._ids[lo:hi])
+        depth = len(prefix)
+        position = lo
+        candidates = []
+        while position < hi and len(self._keys[position]) == depth:
+            candidates.append(self._ids[position])
+            position += 1
+        while position < hi:
+            child = self._keys[position][:depth + 1]
+            end = bisect_left(self._keys, child + _MAX_CHAR, position, hi)
+            candidates.extend(self._warm(child, position, end))
+            position = end
+        top = self._rank(candidates)
+        if prefix:
+            self._top[prefix] = top
+        return top
+
+    def _prefixes(self, keys: Iterable[str]) -> Iterable[str]:
+        for key in keys:
+            for length in range(1, len(key) + 1):
+                yield key[:length]
+
+    def _promote(self, item_id: int, keys: Iterable[str]) -> None:
+        for prefix in self._prefixes(keys):
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if item_id not in top:
+                if len(top) >= MAX_SUGGESTIONS and self._rank_key(item_id) > self._rank_key(top[-1]):
+                    continue
+                top.append(item_id)
+            top.sort(key=self._rank_key)
+            del top[MAX_SUGGESTIONS:]
+
+    def _forget(self, item_id: int, keys: Iterable[str]) -> None:
+        for prefix in self._prefixes(keys):
+            top = self._top.get(prefix)
+            if top is not None and item_id in top:
+                del self._top[prefix]
+
+    def _remove_entry(self, key: str, item_id: int) -> None:
+        position = bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position] == key:
+            if self._ids[position] == item_id:
+                del self._keys[position]
+                del self._ids[position]
+                return
+            position += 1
+
+
+class AutocompleteIndex:
+    """Prefix indexes over movie titles and actor names, ranked by rating count.
+
+    An actor's popularity is the number of ratings on the movies they appear
+    in. Like the co-star graph, write patches are ignored until the first
+    rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.movies = PrefixIndex()
+        self.actors = PrefixIndex()
+        self.loaded = False
+
+    def rebuild(self, db: Session) -> None:
+        movie_repository = MovieRepository(db)
+        counts = get_rating_repository(db).get_counts_by_movie()
+        actor_counts = Counter()
+        for movie_id, actor_id in movie_repository.get_actor_pairs():
+            actor_counts[actor_id] += counts.get(movie_id, 0)
+
+        movies = PrefixIndex()
+        movies.load(((row.id, row.title, movie_keys(row.title)) for row in movie_repository.iter_rows()), counts)
+        actors = PrefixIndex()
+        actors.load(
+            (
+                (row.id, actor_label(row.first_name, row.last_name), actor_keys(row.first_name, row.last_name))
+                for row in ActorRepository(db).iter_rows()
+            ),
+            actor_counts,
+        )
+
+        with self._lock:
+            self.movies = movies
+            self.actors = actors
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self.loaded:
+            self.rebuild(db)
+
+    def search(self, kind: str, query: str, limit: int) -> List[Suggestion]:
+        prefix = normalize(query)
+        with self._lock:
+            index = self.movies if kind == "movie" else self.actors
+            return index.search(prefix, min(limit, MAX_SUGGESTIONS))
+
+    def upsert_movie(self, movie: Movie) -> None:
+        with self._lock:
+            if self.loaded:
+                self.movies.put(movie.id, movie.title, movie_keys(movie.title))
+
+    def set_movie_actors(self, movie_id: int, previous_ids: Iterable[int], actor_ids: Iterable[int]) -> None:
+        previous_ids, actor_ids = set(previous_ids), set(actor_ids)
+        with self._lock:
+            if not self.loaded:
+                return
+            count = self.movies.popularity(movie_id)
+            for actor_id in previous_ids - actor_ids:
+                self.actors.add_popularity(actor_id, -count)
+            for actor_id in actor_ids - previous_ids:
+                self.actors.add_popularity(actor_id, count)
+
+    def remove_movie(self, movie_id: int, actor_ids: Iterable[int]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            count = self.movies.popularity(movie_id)
+            for actor_id in actor_ids:
+                self.actors.add_popularity(actor_id, -count)
+            self.movies.remove(movie_id)
+
+    def add_ratings(self, movie_id: int, count: int) -> None:
+        with self._lock:
+            if self.loaded:
+                self._add_ratings(movie_id, count)
+
+    def set_ratings(self, counts: Dict[int, int], movie_ids: Optional[Iterable[int]] = None) -> None:
+        # Sets absolute rating counts for movie_ids (every indexed movie when
+        # None); movies missing from counts have no ratings.
+        with self._lock:
+            if not self.loaded:
+                return
+            for movie_id in (self.movies if movie_ids is None else movie_ids):
+                self._add_ratings(movie_id, counts.get(movie_id, 0) - self.movies.popularity(movie_id))
+
+    def upsert_actor(self, actor: Actor) -> None:
+        with self._lock:
+            if self.loaded:
+                self.actors.put(
+                    actor.id, actor_label(actor.first_name, actor.last_name),
+                    actor_keys(actor.first_name, actor.last_name),
+                )
+
+    def remove_actor(self, actor_id: int) -> None:
+        with self._lock:
+            if self.loaded:
+                self.actors.remove(actor_id)
+
+    def _add_ratings(self, movie_id: int, count: int) -> None:
+        if movie_id not in self.movies or not count:
+            return
+        self.movies.add_popularity(movie_id, count)
+        for actor_id in costar_graph.actor_ids(movie_id):
+            self.actors.add_popularity(actor_id, count)
+
+
+autocomplete = AutocompleteIndex()
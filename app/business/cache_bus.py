@@ -0,0 +1,294 @@
+import json
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.persistence.repositories import (
+    ChangeLogRepository, MovieRepository, ActorRepository, change_origin, get_rating_repository,
+)
+from app.business.autocomplete import autocomplete
+from app.business.costar_graph import costar_graph
+from app.business.read_model import read_model
+from app.business.trending import trending
+from app.business.query_cache import query_cache
+
+# (entity, entity_id, operation), as recorded in the change log.
+Change = Tuple[str, int, str]
+
+POLL_BATCH_SIZE = 1000
+# Changed entity -> table whose cached queries it invalidates.
+QUERY_TABLES = {'movie': 'movies', 'rating': 'ratings'}
+
+
+class ChangeLogChannel:
+    """Reads other processes' writes from the change_log table.
+
+    Entries are written in the same transaction as the rows they describe,
+    so nothing is published separately and no committed write can be missed.
+    SQLite has a single writer, so sequence numbers become visible in order
+    and a cursor is enough to resume.
+    """
+
+    # receive() returns at once; the bus sleeps between polls.
+    blocking = False
+    # Changes survive failed polls, so there is nothing to recover.
+    durable = True
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self._session_factory = session_factory
+        self.cursor = 0
+
+    def subscribe(self) -> None:
+        with self._session_factory() as db:
+            self.cursor = ChangeLogRepository(db).get_latest_seq()
+
+    def publish(self, changes: List[Change]) -> None:
+        pass
+
+    def receive(self, timeout: float) -> List[Change]:
+        origin = change_origin()
+        changes = []
+        with self._session_factory() as db:
+            repository = ChangeLogRepository(db)
+            while True:
+                entries = repository.get_entries_since(self.cursor, POLL_BATCH_SIZE)
+                for seq, entity, entity_id, operation, entry_origin in entries:
+                    if entry_origin != origin:
+                        changes.append((entity, entity_id, operation))
+                    self.cursor = seq
+                if len(entries) < POLL_BATCH_SIZE:
+                    break
+        return changes
+
+    def close(self) -> None:
+        pass
+
+
+class RedisChannel:
+    """Publishes committed changes on a Redis pub/sub channel.
+
+    Delivery is at most once: a worker that is disconnected while a message
+    is sent never sees it. Requires the ``redis`` package.
+    """
+
+    blocking = True
+    durable = False
+
+    def __init__(self, url: str, channel: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._channel = channel
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+
+    def subscribe(self) -> None:
+        self._pubsub.subscribe(self._channel)
+
+    def publish(self, changes: List[Change]) -> None:
+        self._client.publish(self._channel, json.dumps({'origin': change_origin(), 'changes': changes}))
+
+    def receive(self, timeout: float) -> List[Change]:
+        origin = change_origin()
+        changes = []
+        message = self._pubsub.get_message(timeout=timeout)
+        while message is not None:
+            payload = json.loads(message['data'])
+            if payload['origin'] != origin:
+                changes.extend((entity, entity_id, operation) for entity, entity_id, operation in payload['changes'])
+            message = self._pubsub.get_message(timeout=0)
+        return changes
+
+    def close(self) -> None:
+        self._pubsub.close()
+        self._client.close()
+
+
+def make_channel(name: str, session_factory: Callable[[], Session]):
+    if name == 'changelog':
+        return ChangeLogChannel(session_factory)
+    if name == 'redis':
+        return RedisChannel(settings.redis_url, settings.cache_bus_channel)
+    raise ValueError(f"Unknown cache bus {name!r}; expected 'changelog' or 'redis'")
+
+
+class CacheBus:
+    """Keeps this worker's in-memory caches in step with other workers' writes.
+
+    Each worker already patches its own read model, co-star graph and
+    autocomplete index on the write paths. The bus delivers the writes made
+    by other processes and applies them by reloading the changed rows, which
+    makes applying a change twice harmless.
+    """
+
+    def __init__(self):
+        self._channel = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.applied = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._channel is not None
+
+    def subscribe(self, session_factory: Callable[[], Session], name: str) -> None:
+        # Called before the caches are built, so that changes committed while
+        # they load are delivered afterwards rather than lost.
+        self._session_factory = session_factory
+        self._channel = make_channel(name, session_factory)
+        self._channel.subscribe()
+
+    def start(self) -> None:
+        if self._channel is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+
+    def publish(self, changes: List[Change]) -> None:
+        if self._channel is not None:
+            self._channel.publish(changes)
+
+    def apply(self, db: Session, changes: Iterable[Change]) -> None:
+        latest: Dict[str, Dict[int, str]] = {'movie': {}, 'actor': {}, 'rating': {}}
+        for entity, entity_id, operation in changes:
+            latest[entity][entity_id] = operation
+        invalidate_queries([entity for entity, entries in latest.items() if entries])
+
+        def ids(entity: str, operation: str) -> List[int]:
+            return [entity_id for entity_id, op in latest[entity].items() if op == operation]
+
+        # Actors first so that movies can link them; deletes last so that
+        # ratings can still be traced to their movie.
+        # Rows that are gone by now were deleted by a change still to come.
+        actor_ids = ids('actor', 'upsert')
+        actors = ActorRepository(db).get_by_ids(actor_ids)
+        deleted_actors = ids('actor', 'delete') + sorted(set(actor_ids) - {actor.id for actor in actors})
+        for actor in actors:
+            read_model.upsert_actor(actor)
+            autocomplete.upsert_actor(actor)
+
+        movie_ids = ids('movie', 'upsert')
+        movies = MovieRepository(db).get_by_ids(movie_ids, include_relations=True)
+        deleted_movies = ids('movie', 'delete') + sorted(set(movie_ids) - {movie.id for movie in movies})
+        for movie in movies:
+            actor_ids = [actor.id for actor in movie.actors]
+            read_model.upsert_movie(movie)
+            autocomplete.upsert_movie(movie)
+            autocomplete.set_movie_actors(movie.id, costar_graph.actor_ids(movie.id), actor_ids)
+            costar_graph.set_movie_actors(movie.id, actor_ids)
+
+        rating_ids = ids('rating', 'upsert')
+        ratings = get_rating_repository(db).get_by_ids(rating_ids)
+        deleted_ratings = ids('rating', 'delete') + sorted(set(rating_ids) - {rating.id for rating in ratings})
+        rated_movies: Optional[Set[int]] = set()
+        for rating in ratings:
+            read_model.upsert_rating(rating)
+            rated_movies.add(rating.movie_id)
+        for rating_id in deleted_ratings:
+            row = read_model.get_rating(rating_id) if read_model.loaded else None
+            if row is None:
+                # The row is gone and nothing local remembers its movie.
+                rated_movies = None
+            elif rated_movies is not None:
+                rated_movies.add(row.movie_id)
+            read_model.remove_rating(rating_id)
+        if autocomplete.loaded and rated_movies != set():
+            autocomplete.set_ratings(get_rating_repository(db).get_counts_by_movie(rated_movies), rated_movies)
+        if trending.loaded and rated_movies != set():
+            # Recounted, since an upsert doesn't tell a new rating from an edit.
+            trending.set_movies(get_rating_repository(db).get_creation_times(trending.since(), rated_movies), rated_movies)
+
+        for movie_id in deleted_movies:
+            read_model.remove_movie(movie_id)
+            autocomplete.remove_movie(movie_id, costar_graph.actor_ids(movie_id))
+            costar_graph.remove_movie(movie_id)
+            trending.remove_movie(movie_id)
+        for actor_id in deleted_actors:
+            read_model.remove_actor(actor_id)
+            autocomplete.remove_actor(actor_id)
+            costar_graph.remove_actor(actor_id)
+        self.applied += sum(len(entries) for entries in latest.values())
+
+    def revert(self, db: Session, changes: Iterable[Change]) -> None:
+        # Puts the local caches back after a rollback of writes that were
+        # already applied to them. Reloading a row undoes an upsert, but a
+        # delete can take rows with it that no change names, so those
+        # reload everything.
+        changes = list(changes)
+        if any(operation == 'delete' for _, _, operation in changes):
+            self.rebuild(db)
+        else:
+            self.apply(db, [(entity, entity_id, 'upsert') for entity, entity_id, _ in changes])
+
+    def rebuild(self, db: Session) -> None:
+        if costar_graph.loaded:
+            costar_graph.rebuild(db)
+        if autocomplete.loaded:
+            autocomplete.rebuild(db)
+        if read_model.loaded:
+            read_model.rebuild(db)
+        if trending.loaded:
+            trending.rebuild(db)
+        query_cache.invalidate(*QUERY_TABLES.values())
+
+    def _run(self) -> None:
+        interval = settings.cache_bus_interval_ms / 1000
+        while not self._stop.is_set():
+            try:
+                changes = self._channel.receive(interval)
+            except Exception:
+                if not self._channel.durable:
+                    self._rebuild()
+                self._stop.wait(interval)
+                continue
+            if changes:
+                try:
+                    with self._session_factory() as db:
+                        self.apply(db, changes)
+                except Exception:
+                    # A change that could not be applied leaves the caches
+                    # behind in unknown ways, so they are reloaded instead.
+                    self._rebuild()
+            elif not self._channel.blocking:
+                self._stop.wait(interval)
+
+    def _rebuild(self) -> None:
+        try:
+            with self._session_factory() as db:
+                self.rebuild(db)
+        except Exception:
+            pass
+
+
+cache_bus = CacheBus()
+
+
+def invalidate_queries(entities) -> None:
+    query_cache.invalidate(*(QUERY_TABLES[entity] for entity in entities if entity in QUERY_TABLES))
+
+
+@event.listens_for(Session, "after_commit")
+def publish_committed_changes(session: Session) -> None:
+    changes = session.info.pop('uncommitted_changes', None)
+    if changes:
+        # The services invalidate cached queries after their own commits, but
+        # a batch commits after the services have run.
+        invalidate_queries({entity for entity, _, _ in changes})
+    if changes and cache_bus.enabled:
+        cache_bus.publish(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_rolled_back_changes(session: Session) -> None:
+    session.info.pop('uncommitted_changes', None)
@@ -0,0 +1,148 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from app.database.models import ChangeLogEntry, Movie
+from app.database.partitions import rating_partitions
+from app.persistence.repositories import ChangeLogRepository, MovieRepository, ActorRepository, get_rating_repository
+
+
+class Change:
+    __slots__ = ('seq', 'entity', 'entity_id', 'operation', 'data')
+
+    def __init__(self, seq: int, entity: str, entity_id: int, operation: str, data=None):
+        self.seq = seq
+        self.entity = entity
+        self.entity_id = entity_id
+        self.operation = operation
+        self.data = data
+
+
+class ChangeFeedService:
+    def __init__(self, db: Session):
+        self.repository = ChangeLogRepository(db)
+        self.movie_repository = MovieRepository(db)
+        self.actor_repository = ActorRepository(db)
+        self.rating_repository = get_rating_repository(db)
+
+    def get_changes(self, since: int, limit: int) -> Tuple[List[Change], int, bool]:
+        entries = self.repository.get_since(since, limit + 1)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        next_since = entries[-1].seq if entries else max(since, 0)
+
+        # Only the latest entry per entity matters to a client catching up.
+        latest: Dict[Tuple[str, int], Change] = {}
+        for entry in entries:
+            latest[(entry.entity, entry.entity_id)] = Change(entry.seq, entry.entity, entry.entity_id, entry.operation)
+
+        upserted: Dict[str, List[int]] = {'movie': [], 'actor': [], 'rating': []}
+        for change in latest.values():
+            if change.operation == 'upsert':
+                upserted[change.entity].append(change.entity_id)
+
+        rows = {
+            'movie': self._movies(upserted['movie']),
+            'actor': {actor.id: actor for actor in self.actor_repository.get_by_ids(upserted['actor'])},
+            'rating': {rating.id: rating for rating in self.rating_repository.get_by_ids(upserted['rating'])},
+        }
+        changes = sorted(latest.values(), key=lambda change: change.seq)
+        for change in changes:
+            if change.operation != 'upsert':
+                continue
+            change.data = rows[change.entity].get(change.entity_id)
+            if change.data is None:
+                # Deleted by a later entry that is not part of this page yet.
+                change.operation = 'delete'
+        return changes, next_since, has_more
+
+    def _movies(self, movie_ids: List[int]) -> Dict[int, Tuple[Movie, List[int]]]:
+        movies = self.movie_repository.get_by_ids(movie_ids)
+        if not movies:
+            return {}
+        actor_ids: Dict[int, List[int]] = {movie.id: [] for movie in movies}
+        for movie_id, actor_id in self.movie_repository.get_actor_pairs(actor_ids):
+            actor_ids[movie_id].append(actor_id)
+        return {movie.id: (movie, actor_ids[movie.id]) for movie in movies}
+
+
+SHIP_BATCH_SIZE = 1000
+
+
+class ChangeLogShipper:
+    """Moves change log entries from the rating partitions into the main log.
+
+    With partitioned ratings, each partition records its changes in its own
+    change_log table, in the same transaction as the rating write. A
+    background thread moves them into the main change log in batches. An
+    entry is removed from its partition only after it is copied, so a crash
+    between the two steps copies it twice; the change feed and the cache bus
+    both tolerate repeats.
+    """
+
+    def __init__(self):
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, session_factory: Callable[[], Session], interval: float) -> None:
+        if self._thread is not None:
+            return
+        self._session_factory = session_factory
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="change-log-shipper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.ship(self._session_factory)
+
+    def ship(self, session_factory: Callable[[], Session]) -> int:
+        shipped = 0
+        for partition in range(rating_partitions.count):
+            while True:
+                count = self._ship_batch(session_factory, partition)
+                shipped += count
+                if count < SHIP_BATCH_SIZE:
+                    break
+        return shipped
+
+    def _ship_batch(self, session_factory: Callable[[], Session], partition: int) -> int:
+        with rating_partitions.writing(partition) as partition_db:
+            # The DELETE takes the partition's write lock first, so workers
+            # shipping at the same time don't copy the same entries.
+            batch = select(ChangeLogEntry.seq).order_by(ChangeLogEntry.seq).limit(SHIP_BATCH_SIZE)
+            entries = partition_db.execute(
+                delete(ChangeLogEntry).where(ChangeLogEntry.seq.in_(batch)).returning(
+                    ChangeLogEntry.seq, ChangeLogEntry.entity, ChangeLogEntry.entity_id,
+                    ChangeLogEntry.operation, ChangeLogEntry.changed_at, ChangeLogEntry.origin,
+                )
+            ).all()
+            if not entries:
+                return 0
+            with session_factory() as db:
+                db.execute(insert(ChangeLogEntry), [
+                    {
+                        'entity': entity, 'entity_id': entity_id, 'operation': operation,
+                        'changed_at': changed_at, 'origin': origin,
+                    }
+                    for _, entity, entity_id, operation, changed_at, origin in sorted(entries)
+                ])
+                db.commit()
+            partition_db.commit()
+        return len(entries)
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.ship(self._session_factory)
+            except Exception:
+                # Entries stay in their partition until a later pass succeeds.
+                pass
+
+
+change_log_shipper = ChangeLogShipper()
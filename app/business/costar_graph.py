@@ -0,0 +1,149 @@
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.persistence.repositories import MovieRepository
+
+# One step of a co-star path: the actor reached and the movie that links it to
+# the previous actor (None for the starting actor).
+PathStep = Tuple[int, Optional[int]]
+
+
+class CostarGraph:
+    """Bipartite movie <-> actor adjacency kept in compact integer arrays.
+
+    The graph is rebuilt from ``movie_actors`` on startup and patched by the
+    service write paths. Patches are ignored until the first rebuild so that
+    scripts using the services without the API don't build partial graphs.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._movie_actors: Dict[int, array] = {}
+        self._actor_movies: Dict[int, array] = {}
+        self.loaded = False
+
+    def rebuild(self, db: Session) -> None:
+        movie_actors: Dict[int, List[int]] = {}
+        actor_movies: Dict[int, List[int]] = {}
+        for movie_id, actor_id in MovieRepository(db).get_actor_pairs():
+            movie_actors.setdefault(movie_id, []).append(actor_id)
+            actor_movies.setdefault(actor_id, []).append(movie_id)
+
+        with self._lock:
+            self._movie_actors = {movie_id: array('i', ids) for movie_id, ids in movie_actors.items()}
+            self._actor_movies = {actor_id: array('i', ids) for actor_id, ids in actor_movies.items()}
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self.loaded:
+            self.rebuild(db)
+
+    def set_movie_actors(self, movie_id: int, actor_ids: Iterable[int]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            self._unlink_movie(movie_id)
+            actor_ids = array('i', sorted(set(actor_ids)))
+            if not actor_ids:
+                return
+            self._movie_actors[movie_id] = actor_ids
+            for actor_id in actor_ids:
+                self._actor_movies.setdefault(actor_id, array('i')).append(movie_id)
+
+    def remove_movie(self, movie_id: int) -> None:
+        with self._lock:
+            if self.loaded:
+                self._unlink_movie(movie_id)
+
+    def remove_actor(self, actor_id: int) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            for movie_id in self._actor_movies.pop(actor_id, ()):
+                actor_ids = array('i', (other for other in self._movie_actors[movie_id] if other != actor_id))
+                if actor_ids:
+                    self._movie_actors[movie_id] = actor_ids
+                else:
+                    del self._movie_actors[movie_id]
+
+    def actor_ids(self, movie_id: int) -> List[int]:
+        with self._lock:
+            return list(self._movie_actors.get(movie_id, ()))
+
+    def costars(self, actor_id: int, limit: int) -> List[Tuple[int, int]]:
+        with self._lock:
+            shared = Counter()
+            for movie_id in self._actor_movies.get(actor_id, ()):
+                shared.update(self._movie_actors[movie_id])
+        shared.pop(actor_id, None)
+        return sorted(shared.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def shortest_path(self, source_id: int, target_id: int) -> Optional[List[PathStep]]:
+        if source_id == target_id:
+            return [(source_id, None)]
+
+        with self._lock:
+            if source_id not in self._actor_movies or target_id not in self._actor_movies:
+                return None
+
+            # parents map an actor to (previous actor, linking movie) on each side.
+            forward: Dict[int, Optional[Tuple[int, int]]] = {source_id: None}
+            backward: Dict[int, Optional[Tuple[int, int]]] = {target_id: None}
+            forward_frontier = [source_id]
+            backward_frontier = [target_id]
+
+            while forward_frontier and backward_frontier:
+                if len(forward_frontier) <= len(backward_frontier):
+                    forward_frontier, meetings = self._expand(forward_frontier, forward, backward)
+                else:
+                    backward_frontier, meetings = self._expand(backward_frontier, backward, forward)
+                if meetings:
+                    # The whole level is expanded first; meeting points can still
+                    # sit at different depths on the other side, so keep the shortest.
+                    paths = [self._join(meeting, forward, backward) for meeting in meetings]
+                    return min(paths, key=len)
+        return None
+
+    def _expand(self, frontier, parents, other_parents):
+        next_frontier = []
+        meetings = []
+        for actor_id in frontier:
+            for movie_id in self._actor_movies.get(actor_id, ()):
+                for costar_id in self._movie_actors[movie_id]:
+                    if costar_id in parents:
+                        continue
+                    parents[costar_id] = (actor_id, movie_id)
+                    next_frontier.append(costar_id)
+                    if costar_id in other_parents:
+                        meetings.append(costar_id)
+        return next_frontier, meetings
+
+    def _join(self, meeting, forward, backward) -> List[PathStep]:
+        path: List[PathStep] = []
+        actor_id = meeting
+        while forward[actor_id] is not None:
+            previous_id, link_movie_id = forward[actor_id]
+            path.append((actor_id, link_movie_id))
+            actor_id = previous_id
+        path.append((actor_id, None))
+        path.reverse()
+
+        actor_id = meeting
+        while backward[actor_id] is not None:
+            next_id, link_movie_id = backward[actor_id]
+            path.append((next_id, link_movie_id))
+            actor_id = next_id
+        return path
+
+    def _unlink_movie(self, movie_id: int) -> None:
+        for actor_id in self._movie_actors.pop(movie_id, ()):
+            movie_ids = array('i', (other for other in self._actor_movies[actor_id] if other != movie_id))
+            if movie_ids:
+                self._actor_movies[actor_id] = movie_ids
+            else:
+                del self._actor_movies[actor_id]
+
+
+costar_graph = CostarGraph()
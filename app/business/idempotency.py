@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.models import IdempotencyRecord
+from app.persistence.repositories import IdempotencyRepository
+
+
+class IdempotencyConflictError(Exception):
+    pass
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class IdempotencyService:
+    def __init__(self, db: Session):
+        self.repository = IdempotencyRepository(db)
+
+    def begin(self, key: str, scope: str, payload: str) -> Tuple[Optional[IdempotencyRecord], bool]:
+        """Reserve ``key`` for this request.
+
+        Returns ``(record, True)`` when the caller owns the key and should run
+        the write, or ``(record, False)`` when a stored response is available
+        for replay. Raises ``IdempotencyConflictError`` when the key is in use
+        by a different payload or by a request that is still running.
+
+        The key is held under a lease of ``idempotency_lease_seconds`` until
+        the response is stored. A request that died without storing or
+        releasing it loses the key when the lease runs out, as does a stored
+        response once its TTL has passed.
+        """
+        request_hash = hashlib.sha256(payload.encode()).hexdigest()
+        now = _utcnow()
+        record = IdempotencyRecord(
+            key=key,
+            scope=scope,
+            request_hash=request_hash,
+            expires_at=now + timedelta(seconds=settings.idempotency_lease_seconds),
+        )
+        if self.repository.reserve(record):
+            return record, True
+
+        existing = self.repository.get(key, scope)
+        if existing is None:
+            # Released by a concurrent request in the meantime.
+            return self.begin(key, scope, payload)
+        if existing.expires_at < now:
+            if self.repository.take_over(record, now):
+                return self.repository.get(key, scope), True
+            return self.begin(key, scope, payload)
+        if existing.request_hash != request_hash:
+            raise IdempotencyConflictError("Idempotency-Key was already used with a different request payload")
+        if existing.status_code is None:
+            raise IdempotencyConflictError("A request with this Idempotency-Key is still being processed")
+        return existing, False
+
+    def complete(self, record: IdempotencyRecord, status_code: int, response_body: str) -> None:
+        record.status_code = status_code
+        record.response_body = response_body
+        record.expires_at = _utcnow() + timedelta(hours=settings.idempotency_ttl_hours)
+        self.repository.complete(record)
+
+    def release(self, record: IdempotencyRecord) -> None:
+        self.repository.delete(record)
+
+    def purge_expired(self) -> None:
+        self.repository.delete_expired(_utcnow())
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+
+HIT = "hit"
+STALE = "stale"
+MISS = "miss"
+
+Loader = Callable[[Session], List[int]]
+
+
+class _Entry:
+    __slots__ = ('ids', 'generations', 'stored_at')
+
+    def __init__(self, ids: List[int], generations: Tuple[int, ...], stored_at: float):
+        self.ids = ids
+        self.generations = generations
+        self.stored_at = stored_at
+
+
+class QueryCache:
+    """Ordered id lists of list queries, keyed by their normalized parameters.
+
+    Each entry records the generation of every table it was read from, and
+    writes bump the generations of the tables they change. An entry whose
+    generations are behind is never served, so a worker's lists reflect its
+    own writes at once. An entry with current generations is fresh while it
+    is younger than ``max_age``; until ``max_age + stale_while_revalidate``
+    it is still served while one background refresh reloads it, which
+    bounds how long other workers' writes can take to show. Older entries
+    are reloaded in the request. Concurrent misses on a key share one load,
+    as long as that load started after the last write to its tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        # Key -> (load in flight, generations it was started at).
+        self._loading: Dict[Hashable, Tuple[Future, Tuple[int, ...]]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self.max_size = settings.query_cache_size
+        self.max_age = settings.query_cache_max_age_seconds
+        self.stale_while_revalidate = settings.query_cache_stale_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        # Without a running refresher, stale entries are reloaded in the request.
+        if self._executor is not None or not self.enabled:
+            return
+        self._session_factory = session_factory
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.query_cache_refresh_workers, thread_name_prefix="query-cache"
+        )
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def invalidate(self, *tables: str) -> None:
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(
+        self, key: Hashable, tables: Tuple[str, ...], load: Loader, db: Session, refresh: bool = False
+    ) -> Tuple[List[int], str]:
+        if not self.enabled:
+            return load(db), MISS
+        with self._lock:
+            # Generations are read before the query runs, so a write that
+            # lands while it runs leaves the entry behind rather than wrongly
+            # current.
+            generations = self._current(tables)
+            entry = self._entries.get(key)
+            if entry is not None and not refresh and entry.generations == generations:
+                age = time.monotonic() - entry.stored_at
+                if age < self.max_age:
+                    self._entries.move_to_end(key)
+                    return entry.ids, HIT
+                if age < self.max_age + self.stale_while_revalidate and self._executor is not None:
+                    self._entries.move_to_end(key)
+                    if key not in self._loading:
+                        future = Future()
+                        self._loading[key] = (future, generations)
+                        self._executor.submit(self._refresh, key, load, future, generations)
+                    return entry.ids, STALE
+            loading = None if refresh else self._loading.get(key)
+            if loading is not None and loading[1] == generations:
+                future, owner = loading[0], False
+            else:
+                future, owner = Future(), True
+                if not refresh:
+                    self._loading[key] = (future, generations)
+        if owner:
+            self._load(key, load, db, future, generations)
+        return future.result(), MISS
+
+    def _current(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(table, 0) for table in tables)
+
+    def _load(
+        self, key: Hashable, load: Loader, db: Session, future: Future, generations: Tuple[int, ...]
+    ) -> None:
+        try:
+            ids = load(db)
+        except BaseException as exc:
+            with self._lock:
+                self._finish(key, future)
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            # A load that started before a newer one stored its entry must
+            # not replace it.
+            current = self._entries.get(key)
+            if current is None or current.generations <= generations:
+                self._entries[key] = _Entry(ids, generations, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            self._finish(key, future)
+        future.set_result(ids)
+
+    def _finish(self, key: Hashable, future: Future) -> None:
+        loading = self._loading.get(key)
+        if loading is not None and loading[0] is future:
+            del self._loading[key]
+
+    def _refresh(self, key: Hashable, load: Loader, future: Future, generations: Tuple[int, ...]) -> None:
+        try:
+            with self._session_factory() as db:
+                self._load(key, load, db, future, generations)
+        except Exception:
+            # The stale entry stays until a request reloads it.
+            pass
+
+
+query_cache = QueryCache()
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+
+PENDING = "pending"
+COMMITTED = "committed"
+FAILED = "failed"
+
+
+class RatingSubmission:
+    __slots__ = (
+        'tracking_id', 'score', 'movie_id', 'review_text', 'reviewer_email', 'status', 'rating_id', 'detail',
+    )
+
+    def __init__(self, score, movie_id, review_text, reviewer_email):
+        self.tracking_id = uuid.uuid4().hex
+        self.score = score
+        self.movie_id = movie_id
+        self.review_text = review_text
+        self.reviewer_email = reviewer_email
+        self.status = PENDING
+        self.rating_id: Optional[int] = None
+        self.detail: Optional[str] = None
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class RatingWriteBehind:
+    """Queues accepted ratings and writes them in group commits.
+
+    A submission is only held in process memory until its batch commits:
+    ratings still queued when the process is killed are lost, while a
+    graceful shutdown drains the queue first. A submission reported as
+    ``committed`` is durable in the database.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[RatingSubmission]]" = queue.Queue()
+        self._submissions: "OrderedDict[str, RatingSubmission]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        if self._thread is not None:
+            return
+        self._session_factory = session_factory
+        self._queue = queue.Queue(maxsize=settings.rating_queue_size)
+        self._thread = threading.Thread(target=self._run, name="rating-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, score, movie_id, review_text, reviewer_email) -> RatingSubmission:
+        submission = RatingSubmission(score, movie_id, review_text, reviewer_email)
+        with self._lock:
+            self._submissions[submission.tracking_id] = submission
+            while len(self._submissions) > settings.rating_status_retention:
+                self._submissions.popitem(last=False)
+        try:
+            self._queue.put_nowait(submission)
+        except queue.Full:
+            with self._lock:
+                self._submissions.pop(submission.tracking_id, None)
+            raise QueueFullError("Rating queue is full")
+        return submission
+
+    def get_submission(self, tracking_id: str) -> Optional[RatingSubmission]:
+        with self._lock:
+            return self._submissions.get(tracking_id)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + settings.rating_batch_latency_ms / 1000
+            while len(batch) < settings.rating_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+        # Drain whatever was accepted before shutdown was requested.
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                remaining.append(item)
+        for start in range(0, len(remaining), settings.rating_batch_size):
+            self._flush(remaining[start:start + settings.rating_batch_size])
+
+    def _flush(self, batch: List[RatingSubmission]) -> None:
+        from app.business.services import RatingService
+
+        db = self._session_factory()
+        try:
+            ratings = RatingService(db).create_ratings([
+                dict(
+                    score=item.score,
+                    movie_id=item.movie_id,
+                    review_text=item.review_text,
+                    reviewer_email=item.reviewer_email,
+                )
+                for item in batch
+            ])
+            for item, rating in zip(batch, ratings):
+                if rating is None:
+                    item.status = FAILED
+                    item.detail = f"Movie with id {item.movie_id} not found"
+                else:
+                    item.status = COMMITTED
+                    item.rating_id = rating.id
+        except Exception as exc:
+            db.rollback()
+            for item in batch:
+                item.status = FAILED
+                item.detail = str(exc)
+        finally:
+            db.close()
+
+
+rating_writer = RatingWriteBehind()
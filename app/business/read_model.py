@@ -0,0 +1,262 @@
+import sys
+import threading
+from array import array
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.models import Movie, Actor, Rating
+from app.persistence.repositories import MovieRepository, ActorRepository, get_rating_repository
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class ActorRow:
+    __slots__ = ('id', 'first_name', 'last_name', 'birth_date', 'nationality')
+
+    def __init__(self, id, first_name, last_name, birth_date, nationality):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.birth_date = birth_date
+        self.nationality = _intern(nationality)
+
+
+class RatingRow:
+    __slots__ = ('id', 'score', 'review_text', 'reviewer_email', 'movie_id')
+
+    def __init__(self, id, score, review_text, reviewer_email, movie_id):
+        self.id = id
+        self.score = score
+        self.review_text = review_text
+        self.reviewer_email = reviewer_email
+        self.movie_id = movie_id
+
+
+class MovieRow:
+    __slots__ = (
+        'id', 'title', 'release_date', 'runtime', 'synopsis', 'poster_url', 'language', 'genres',
+        'budget', 'revenue', 'actor_offsets', 'rating_offsets',
+    )
+
+    def __init__(self, id, title, release_date, runtime, synopsis, poster_url, language, genres, budget, revenue):
+        self.id = id
+        self.title = title
+        self.release_date = release_date
+        self.runtime = runtime
+        self.synopsis = synopsis
+        self.poster_url = poster_url
+        # Languages and genre combinations repeat across the catalogue, so they
+        # are interned and shared between rows.
+        self.language = _intern(language)
+        self.genres = _intern(genres)
+        self.budget = budget
+        self.revenue = revenue
+        self.actor_offsets = array('i')
+        self.rating_offsets = array('i')
+
+
+class MovieView:
+    """A movie row with its actors and ratings resolved, shaped like the ORM model."""
+
+    __slots__ = ('row', 'actors', 'ratings')
+
+    def __init__(self, row: MovieRow, actors: List[ActorRow], ratings: List[RatingRow]):
+        self.row = row
+        self.actors = actors
+        self.ratings = ratings
+
+    def __getattr__(self, name):
+        return getattr(self.row, name)
+
+
+class CatalogueReadModel:
+    """In-memory copy of movies, actors, ratings and movie_actors.
+
+    Rows live in plain lists and are addressed through id -> offset dicts;
+    movies reference their actors and ratings by offset. Deleted rows leave
+    a ``None`` hole until the next rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+        self.loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.read_model_enabled and self.loaded
+
+    def rebuild(self, db: Session) -> None:
+        with self._lock:
+            self._clear()
+            for row in ActorRepository(db).iter_rows():
+                self._store_actor(ActorRow(row.id, row.first_name, row.last_name, row.birth_date, row.nationality))
+            for row in MovieRepository(db).iter_rows():
+                self._store_movie(MovieRow(
+                    row.id, row.title, row.release_date, row.runtime, row.synopsis, row.poster_url,
+                    row.language, row.genres, row.budget, row.revenue,
+                ))
+            for movie_id, actor_id in MovieRepository(db).get_actor_pairs():
+                movie = self._movie_row(movie_id)
+                if movie is not None and actor_id in self._actor_offsets:
+                    movie.actor_offsets.append(self._actor_offsets[actor_id])
+            for row in get_rating_repository(db).iter_rows():
+                self._store_rating(RatingRow(row.id, row.score, row.review_text, row.reviewer_email, row.movie_id))
+            self.loaded = True
+
+    def get_all_movies(self) -> List[MovieView]:
+        with self._lock:
+            return [self._view(row) for row in self._movies if row is not None]
+
+    def get_movie(self, movie_id: int) -> Optional[MovieView]:
+        with self._lock:
+            row = self._movie_row(movie_id)
+            return self._view(row) if row is not None else None
+
+    def get_movies(self, movie_ids: List[int]) -> List[MovieView]:
+        with self._lock:
+            rows = (self._movie_row(movie_id) for movie_id in movie_ids)
+            return [self._view(row) for row in rows if row is not None]
+
+    def get_all_actors(self) -> List[ActorRow]:
+        with self._lock:
+            return [row for row in self._actors if row is not None]
+
+    def get_actor(self, actor_id: int) -> Optional[ActorRow]:
+        with self._lock:
+            offset = self._actor_offsets.get(actor_id)
+            return self._actors[offset] if offset is not None else None
+
+    def get_actors(self, actor_ids: List[int]) -> List[ActorRow]:
+        with self._lock:
+            offsets = (self._actor_offsets.get(actor_id) for actor_id in actor_ids)
+            return [self._actors[offset] for offset in offsets if offset is not None]
+
+    def get_all_ratings(self) -> List[RatingRow]:
+        with self._lock:
+            return [row for row in self._ratings if row is not None]
+
+    def get_rating(self, rating_id: int) -> Optional[RatingRow]:
+        with self._lock:
+            offset = self._rating_offsets.get(rating_id)
+            return self._ratings[offset] if offset is not None else None
+
+    def get_ratings(self, rating_ids: List[int]) -> List[RatingRow]:
+        with self._lock:
+            offsets = (self._rating_offsets.get(rating_id) for rating_id in rating_ids)
+            return [self._ratings[offset] for offset in offsets if offset is not None]
+
+    def get_ratings_by_movie(self, movie_id: int) -> List[RatingRow]:
+        with self._lock:
+            row = self._movie_row(movie_id)
+            return [self._ratings[offset] for offset in row.rating_offsets] if row is not None else []
+
+    def upsert_movie(self, movie: Movie) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            row = MovieRow(
+                movie.id, movie.title, movie.release_date, movie.runtime, movie.synopsis, movie.poster_url,
+                movie.language, movie.genres, movie.budget, movie.revenue,
+            )
+            row.actor_offsets = array('i', (
+                self._actor_offsets[actor.id] for actor in movie.actors if actor.id in self._actor_offsets
+            ))
+            previous = self._movie_row(movie.id)
+            if previous is not None:
+                row.rating_offsets = previous.rating_offsets
+                self._movies[self._movie_offsets[movie.id]] = row
+            else:
+                self._store_movie(row)
+
+    def remove_movie(self, movie_id: int) -> None:
+        with self._lock:
+            offset = self._movie_offsets.pop(movie_id, None) if self.loaded else None
+            if offset is None:
+                return
+            for rating_offset in self._movies[offset].rating_offsets:
+                del self._rating_offsets[self._ratings[rating_offset].id]
+                self._ratings[rating_offset] = None
+            self._movies[offset] = None
+
+    def upsert_actor(self, actor: Actor) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            row = ActorRow(actor.id, actor.first_name, actor.last_name, actor.birth_date, actor.nationality)
+            offset = self._actor_offsets.get(actor.id)
+            if offset is not None:
+                self._actors[offset] = row
+            else:
+                self._store_actor(row)
+
+    def remove_actor(self, actor_id: int) -> None:
+        with self._lock:
+            offset = self._actor_offsets.pop(actor_id, None) if self.loaded else None
+            if offset is None:
+                return
+            self._actors[offset] = None
+            for movie in self._movies:
+                if movie is not None and offset in movie.actor_offsets:
+                    movie.actor_offsets.remove(offset)
+
+    def upsert_rating(self, rating: Rating) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            row = RatingRow(rating.id, rating.score, rating.review_text, rating.reviewer_email, rating.movie_id)
+            offset = self._rating_offsets.get(rating.id)
+            if offset is not None:
+                self._ratings[offset] = row
+            else:
+                self._store_rating(row)
+
+    def remove_rating(self, rating_id: int) -> None:
+        with self._lock:
+            offset = self._rating_offsets.pop(rating_id, None) if self.loaded else None
+            if offset is None:
+                return
+            movie = self._movie_row(self._ratings[offset].movie_id)
+            if movie is not None:
+                movie.rating_offsets.remove(offset)
+            self._ratings[offset] = None
+
+    def _clear(self) -> None:
+        self._movies: List[Optional[MovieRow]] = []
+        self._actors: List[Optional[ActorRow]] = []
+        self._ratings: List[Optional[RatingRow]] = []
+        self._movie_offsets: Dict[int, int] = {}
+        self._actor_offsets: Dict[int, int] = {}
+        self._rating_offsets: Dict[int, int] = {}
+
+    def _movie_row(self, movie_id: int) -> Optional[MovieRow]:
+        offset = self._movie_offsets.get(movie_id)
+        return self._movies[offset] if offset is not None else None
+
+    def _view(self, row: MovieRow) -> MovieView:
+        return MovieView(
+            row,
+            [self._actors[offset] for offset in row.actor_offsets],
+            [self._ratings[offset] for offset in row.rating_offsets],
+        )
+
+    def _store_movie(self, row: MovieRow) -> None:
+        self._movie_offsets[row.id] = len(self._movies)
+        self._movies.append(row)
+
+    def _store_actor(self, row: ActorRow) -> None:
+        self._actor_offsets[row.id] = len(self._actors)
+        self._actors.append(row)
+
+    def _store_rating(self, row: RatingRow) -> None:
+        movie = self._movie_row(row.movie_id)
+        if movie is None:
+            return
+        self._rating_offsets[row.id] = len(self._ratings)
+        movie.rating_offsets.append(len(self._ratings))
+        self._ratings.append(row)
+
+
+read_model = CatalogueReadModel()
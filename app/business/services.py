@@ -1,21 +1,102 @@
-from typing import List, Optional
-from datetime import date
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+from datetime import date, datetime, timezone
 from sqlalchemy.orm import Session
 from app.database.models import Movie, Actor, Rating
-from app.persistence.repositories import MovieRepository, ActorRepository, RatingRepository
+from app.persistence.repositories import MovieRepository, ActorRepository, get_rating_repository
+from app.business.similarity import SimilarityService
+from app.business.costar_graph import costar_graph
+from app.business.read_model import read_model
+from app.business.rating_writer import rating_writer, RatingSubmission
+from app.business.autocomplete import autocomplete
+from app.business.trending import trending
+from app.business.query_cache import MISS, query_cache
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def order_by_ids(rows, ids: List[int]) -> Tuple[list, List[int]]:
+    by_id = {row.id: row for row in rows}
+    return [by_id[row_id] for row_id in ids if row_id in by_id], [row_id for row_id in ids if row_id not in by_id]
+
+
+# Sort key of a movie query -> movies column, or None for the average rating.
+MOVIE_SORTS = {'id': 'id', 'title': 'title', 'releaseDate': 'release_date', 'rating': None}
+
+
+class MovieQuery(NamedTuple):
+    """Filters and order of a movie list, normalized so that equivalent
+    requests share a query cache entry. ``sort`` is a MOVIE_SORTS key,
+    prefixed with '-' for descending order."""
+
+    genre: Optional[str] = None
+    language: Optional[str] = None
+    year: Optional[int] = None
+    sort: str = 'id'
+
+    @property
+    def tables(self) -> Tuple[str, ...]:
+        return ('movies', 'ratings') if MOVIE_SORTS[self.sort.lstrip('-')] is None else ('movies',)
+
+    def load(self, db: Session) -> List[int]:
+        column = MOVIE_SORTS[self.sort.lstrip('-')]
+        descending = self.sort.startswith('-')
+        repository = MovieRepository(db)
+        if column is not None:
+            return repository.find_ids(self.genre, self.language, self.year, column, descending)
+        movie_ids = repository.find_ids(self.genre, self.language, self.year)
+        filtered = (self.genre, self.language, self.year) != (None, None, None)
+        averages = get_rating_repository(db).get_average_scores(movie_ids if filtered else None)
+        # Unrated movies come last in either direction.
+        return sorted(movie_ids, key=lambda movie_id: (
+            averages.get(movie_id) is None,
+            -(averages.get(movie_id) or 0) if descending else averages.get(movie_id) or 0,
+            movie_id,
+        ))
 
 
 class MovieService:
     def __init__(self, db: Session):
         self.repository = MovieRepository(db)
         self.actor_repository = ActorRepository(db)
+        self.similarity_service = SimilarityService(db)
         self.db = db
 
     def get_all_movies(self) -> List[Movie]:
+        if read_model.enabled:
+            return read_model.get_all_movies()
         return self.repository.get_all()
 
+    def find_movies(
+        self, query: MovieQuery, offset: int = 0, limit: Optional[int] = None, refresh: bool = False
+    ) -> Tuple[List[Movie], int, str]:
+        # Returns one page of the matching movies, how many match, and
+        # whether the ids came from the query cache.
+        key = ('movies', query)
+        movie_ids, cache_status = query_cache.get(key, query.tables, query.load, self.db, refresh)
+        movies, missing = self.get_movies_by_ids(self._page(movie_ids, offset, limit))
+        if missing and cache_status != MISS:
+            # Cached ids of movies another worker deleted, whose write hasn't
+            # reached this one yet; read them again so the total matches.
+            movie_ids, cache_status = query_cache.get(key, query.tables, query.load, self.db, refresh=True)
+            movies, _ = self.get_movies_by_ids(self._page(movie_ids, offset, limit))
+        return movies, len(movie_ids), cache_status
+
+    @staticmethod
+    def _page(movie_ids: List[int], offset: int, limit: Optional[int]) -> List[int]:
+        return movie_ids[offset:offset + limit] if limit is not None else movie_ids[offset:]
+
     def get_movie_by_id(self, movie_id: int) -> Optional[Movie]:
-        return self.repository.get_by_id(movie_id)
+        if read_model.enabled:
+            return read_model.get_movie(movie_id)
+        return self.repository.get_by_id(movie_id, include_relations=True)
+
+    def get_movies_by_ids(self, movie_ids: List[int]) -> Tuple[List[Movie], List[int]]:
+        if read_model.enabled:
+            return order_by_ids(read_model.get_movies(movie_ids), movie_ids)
+        return order_by_ids(self.repository.get_by_ids(movie_ids, include_relations=True), movie_ids)
 
     def create_movie(
         self,
@@ -40,14 +121,20 @@ class MovieService:
             genres=','.join(genres) if genres else None,
             budget=budget,
             revenue=revenue,
+            ratings=[],
         )
 
         if actor_ids:
-            actors = [self.actor_repository.get_by_id(actor_id) for actor_id in actor_ids]
-            actors = [actor for actor in actors if actor is not None]
-            movie.actors = actors
+            movie.actors, _ = order_by_ids(self.actor_repository.get_by_ids(actor_ids), actor_ids)
 
-        return self.repository.create(movie)
+        movie = self.repository.create(movie)
+        query_cache.invalidate('movies')
+        read_model.upsert_movie(movie)
+        autocomplete.upsert_movie(movie)
+        if actor_ids:
+            costar_graph.set_movie_actors(movie.id, [actor.id for actor in movie.actors])
+        self.similarity_service.refresh_movie(movie.id, created=True)
+        return movie
 
     def update_movie(
         self,
@@ -63,7 +150,7 @@ class MovieService:
         revenue: Optional[float] = None,
         actor_ids: Optional[List[int]] = None,
     ) -> Optional[Movie]:
-        movie = self.repository.get_by_id(movie_id)
+        movie = self.repository.get_by_id(movie_id, include_relations=True)
         if not movie:
             return None
 
@@ -86,20 +173,51 @@ class MovieService:
         if revenue is not None:
             movie.revenue = revenue
 
+        previous_actor_ids = [actor.id for actor in movie.actors]
         if actor_ids is not None:
-            actors = [self.actor_repository.get_by_id(actor_id) for actor_id in actor_ids]
-            actors = [actor for actor in actors if actor is not None]
-            movie.actors = actors
+            movie.actors, _ = order_by_ids(self.actor_repository.get_by_ids(actor_ids), actor_ids)
 
-        return self.repository.update(movie)
+        movie = self.repository.update(movie)
+        query_cache.invalidate('movies')
+        read_model.upsert_movie(movie)
+        if title is not None:
+            autocomplete.upsert_movie(movie)
+        if actor_ids is not None:
+            autocomplete.set_movie_actors(movie.id, previous_actor_ids, [actor.id for actor in movie.actors])
+            costar_graph.set_movie_actors(movie.id, [actor.id for actor in movie.actors])
+        if genres is not None or actor_ids is not None:
+            self.similarity_service.refresh_movie(movie.id)
+        return movie
 
     def delete_movie(self, movie_id: int) -> bool:
         movie = self.repository.get_by_id(movie_id)
         if not movie:
             return False
+        self.similarity_service.remove_movie(movie_id)
         self.repository.delete(movie)
+        query_cache.invalidate('movies', 'ratings')
+        read_model.remove_movie(movie_id)
+        autocomplete.remove_movie(movie_id, costar_graph.actor_ids(movie_id))
+        costar_graph.remove_movie(movie_id)
+        trending.remove_movie(movie_id)
         return True
 
+    def get_similar_movies(self, movie_id: int, limit: int) -> Optional[List[Tuple[Movie, float]]]:
+        similar = self.similarity_service.get_similar_movies(movie_id, limit)
+        if not similar and not self.repository.get_by_id(movie_id):
+            return None
+        return similar
+
+    def suggest(self, query: str, limit: int) -> List[Tuple[int, str, int]]:
+        autocomplete.ensure_loaded(self.db)
+        return autocomplete.search("movie", query, limit)
+
+    def get_trending(self, window: str, limit: int) -> List[Tuple[Movie, int]]:
+        trending.ensure_loaded(self.db)
+        ranked = trending.top(window, limit)
+        movies = {movie.id: movie for movie in self.repository.get_by_ids([movie_id for movie_id, _ in ranked])}
+        return [(movies[movie_id], count) for movie_id, count in ranked if movie_id in movies]
+
     def calculate_average_rating(self, movie: Movie) -> Optional[float]:
         if not movie.ratings:
             return None
@@ -110,13 +228,24 @@ class MovieService:
 class ActorService:
     def __init__(self, db: Session):
         self.repository = ActorRepository(db)
+        self.movie_repository = MovieRepository(db)
+        self.db = db
 
     def get_all_actors(self) -> List[Actor]:
+        if read_model.enabled:
+            return read_model.get_all_actors()
         return self.repository.get_all()
 
     def get_actor_by_id(self, actor_id: int) -> Optional[Actor]:
+        if read_model.enabled:
+            return read_model.get_actor(actor_id)
         return self.repository.get_by_id(actor_id)
 
+    def get_actors_by_ids(self, actor_ids: List[int]) -> Tuple[List[Actor], List[int]]:
+        if read_model.enabled:
+            return order_by_ids(read_model.get_actors(actor_ids), actor_ids)
+        return order_by_ids(self.repository.get_by_ids(actor_ids), actor_ids)
+
     def create_actor(
         self,
         first_name: str,
@@ -130,7 +259,10 @@ class ActorService:
             birth_date=birth_date,
             nationality=nationality,
         )
-        return self.repository.create(actor)
+        actor = self.repository.create(actor)
+        read_model.upsert_actor(actor)
+        autocomplete.upsert_actor(actor)
+        return actor
 
     def update_actor(
         self,
@@ -153,28 +285,71 @@ class ActorService:
         if nationality is not None:
             actor.nationality = nationality
 
-        return self.repository.update(actor)
+        actor = self.repository.update(actor)
+        read_model.upsert_actor(actor)
+        if first_name is not None or last_name is not None:
+            autocomplete.upsert_actor(actor)
+        return actor
 
     def delete_actor(self, actor_id: int) -> bool:
         actor = self.repository.get_by_id(actor_id)
         if not actor:
             return False
         self.repository.delete(actor)
+        read_model.remove_actor(actor_id)
+        autocomplete.remove_actor(actor_id)
+        costar_graph.remove_actor(actor_id)
         return True
 
+    def suggest(self, query: str, limit: int) -> List[Tuple[int, str, int]]:
+        autocomplete.ensure_loaded(self.db)
+        return autocomplete.search("actor", query, limit)
+
+    def get_costars(self, actor_id: int, limit: int) -> Optional[List[Tuple[Actor, int]]]:
+        if not self.repository.get_by_id(actor_id):
+            return None
+        costar_graph.ensure_loaded(self.db)
+        ranked = costar_graph.costars(actor_id, limit)
+        actors = {actor.id: actor for actor in self.repository.get_by_ids(costar_id for costar_id, _ in ranked)}
+        return [(actors[costar_id], shared) for costar_id, shared in ranked if costar_id in actors]
+
+    def find_costar_path(self, source_id: int, target_id: int) -> Optional[List[Tuple[Actor, Optional[Movie]]]]:
+        costar_graph.ensure_loaded(self.db)
+        steps = costar_graph.shortest_path(source_id, target_id)
+        if steps is None:
+            return None
+        actors = {actor.id: actor for actor in self.repository.get_by_ids(actor_id for actor_id, _ in steps)}
+        movies = {
+            movie.id: movie
+            for movie in self.movie_repository.get_by_ids(movie_id for _, movie_id in steps if movie_id is not None)
+        }
+        return [(actors[actor_id], movies.get(movie_id)) for actor_id, movie_id in steps]
+
 
 class RatingService:
     def __init__(self, db: Session):
-        self.repository = RatingRepository(db)
+        self.repository = get_rating_repository(db)
         self.movie_repository = MovieRepository(db)
+        self.similarity_service = SimilarityService(db)
 
     def get_all_ratings(self) -> List[Rating]:
+        if read_model.enabled:
+            return read_model.get_all_ratings()
         return self.repository.get_all()
 
     def get_rating_by_id(self, rating_id: int) -> Optional[Rating]:
+        if read_model.enabled:
+            return read_model.get_rating(rating_id)
         return self.repository.get_by_id(rating_id)
 
+    def get_ratings_by_ids(self, rating_ids: List[int]) -> Tuple[List[Rating], List[int]]:
+        if read_model.enabled:
+            return order_by_ids(read_model.get_ratings(rating_ids), rating_ids)
+        return order_by_ids(self.repository.get_by_ids(rating_ids), rating_ids)
+
     def get_ratings_by_movie(self, movie_id: int) -> List[Rating]:
+        if read_model.enabled:
+            return read_model.get_ratings_by_movie(movie_id)
         return self.repository.get_by_movie_id(movie_id)
 
     def create_rating(
@@ -184,8 +359,7 @@ class RatingService:
         review_text: Optional[str] = None,
         reviewer_email: Optional[str] = None,
     ) -> Optional[Rating]:
-        movie = self.movie_repository.get_by_id(movie_id)
-        if not movie:
+        if not self.movie_repository.get_existing_ids([movie_id]):
             return None
 
         rating = Rating(
@@ -193,8 +367,43 @@ class RatingService:
             review_text=review_text,
             reviewer_email=reviewer_email,
             movie_id=movie_id,
+            created_at=utcnow(),
         )
-        return self.repository.create(rating)
+        rating = self.repository.create(rating)
+        query_cache.invalidate('ratings')
+        read_model.upsert_rating(rating)
+        autocomplete.add_ratings(movie_id, 1)
+        trending.add(movie_id, rating.created_at)
+        self.similarity_service.ratings_changed([movie_id])
+        return rating
+
+    def submit_rating(
+        self,
+        score: float,
+        movie_id: int,
+        review_text: Optional[str] = None,
+        reviewer_email: Optional[str] = None,
+    ) -> Optional[RatingSubmission]:
+        if not self.movie_repository.get_existing_ids([movie_id]):
+            return None
+        return rating_writer.submit(score, movie_id, review_text, reviewer_email)
+
+    def get_submission(self, tracking_id: str) -> Optional[RatingSubmission]:
+        return rating_writer.get_submission(tracking_id)
+
+    def create_ratings(self, items: List[dict]) -> List[Optional[Rating]]:
+        existing = set(self.movie_repository.get_existing_ids({item['movie_id'] for item in items}))
+        created_at = utcnow()
+        ratings = [Rating(**item, created_at=created_at) if item['movie_id'] in existing else None for item in items]
+        created = self.repository.create_many([rating for rating in ratings if rating is not None])
+        query_cache.invalidate('ratings')
+        for rating in created:
+            read_model.upsert_rating(rating)
+            trending.add(rating.movie_id, rating.created_at)
+        for movie_id, count in Counter(rating.movie_id for rating in created).items():
+            autocomplete.add_ratings(movie_id, count)
+        self.similarity_service.ratings_changed(rating.movie_id for rating in created)
+        return ratings
 
     def update_rating(
         self,
@@ -214,11 +423,55 @@ class RatingService:
         if reviewer_email is not None:
             rating.reviewer_email = reviewer_email
 
-        return self.repository.update(rating)
+        rating = self.repository.update(rating)
+        query_cache.invalidate('ratings')
+        read_model.upsert_rating(rating)
+        if score is not None:
+            self.similarity_service.ratings_changed([rating.movie_id])
+        return rating
 
     def delete_rating(self, rating_id: int) -> bool:
         rating = self.repository.get_by_id(rating_id)
         if not rating:
             return False
         self.repository.delete(rating)
+        query_cache.invalidate('ratings')
+        read_model.remove_rating(rating_id)
+        autocomplete.add_ratings(rating.movie_id, -1)
+        trending.remove(rating.movie_id, rating.created_at)
+        self.similarity_service.ratings_changed([rating.movie_id])
         return True
+
+
+class ReviewerSummary:
+    __slots__ = ('email', 'rating_count', 'mean_score', 'bias')
+
+    def __init__(self, email: str, rating_count: int, mean_score: float, bias: Optional[float]):
+        self.email = email
+        self.rating_count = rating_count
+        self.mean_score = mean_score
+        self.bias = bias
+
+
+class ReviewerService:
+    def __init__(self, db: Session):
+        self.repository = get_rating_repository(db)
+
+    def get_summary(self, email: str) -> Optional[ReviewerSummary]:
+        stats = self.repository.get_reviewer_stats(email)
+        if not stats or stats.rating_count <= 0:
+            return None
+        bias = self.repository.get_reviewer_bias(email)
+        return ReviewerSummary(
+            email=stats.email,
+            rating_count=stats.rating_count,
+            mean_score=round(stats.score_sum / stats.rating_count, 2),
+            bias=round(bias, 2) if bias is not None else None,
+        )
+
+    def get_ratings(self, email: str, after: int, limit: int) -> Optional[Tuple[List[Rating], bool]]:
+        stats = self.repository.get_reviewer_stats(email)
+        if not stats or stats.rating_count <= 0:
+            return None
+        ratings = self.repository.get_by_reviewer(email, after, limit + 1)
+        return ratings[:limit], len(ratings) > limit
@@ -0,0 +1,255 @@
+import fcntl
+import hashlib
+import heapq
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.database.models import Movie
+from app.persistence.repositories import MovieRepository, MovieSimilarityRepository
+
+logger = logging.getLogger("movie_api.similarity")
+
+DEFAULT_TOP_K = 20
+ACTOR_WEIGHT = 1.0
+GENRE_WEIGHT = 0.5
+NEUTRAL_SCORE = 5.0
+
+
+class MovieFeatures:
+    """Sparse movie x (actor, genre) incidence rows plus average ratings."""
+
+    def __init__(self):
+        self.actors: Dict[int, Set[int]] = defaultdict(set)
+        self.genres: Dict[int, FrozenSet[str]] = {}
+        self.averages: Dict[int, float] = {}
+
+    @classmethod
+    def load(
+        cls,
+        repository: MovieSimilarityRepository,
+        movie_repository: MovieRepository,
+        movie_ids: Optional[Iterable[int]] = None,
+    ) -> 'MovieFeatures':
+        features = cls()
+        if movie_ids is not None:
+            movie_ids = list(movie_ids)
+        for movie_id, actor_id in movie_repository.get_actor_pairs(movie_ids):
+            features.actors[movie_id].add(actor_id)
+        for movie_id, genres in repository.get_genres(movie_ids):
+            features.genres[movie_id] = frozenset(genres.split(',')) if genres else frozenset()
+        features.averages = repository.get_average_scores(movie_ids)
+        return features
+
+    def movie_ids(self) -> List[int]:
+        return list(self.genres)
+
+    def rating_factor(self, movie_id: int) -> float:
+        # Maps an average score of 0-10 onto 0.5-1.0 so unrated movies stay eligible.
+        return 0.5 + self.averages.get(movie_id, NEUTRAL_SCORE) / 20
+
+    def score(self, movie_id: int, candidate_id: int) -> float:
+        shared_actors = len(self.actors.get(movie_id, set()) & self.actors.get(candidate_id, set()))
+        shared_genres = len(self.genres.get(movie_id, frozenset()) & self.genres.get(candidate_id, frozenset()))
+        if not shared_actors and not shared_genres:
+            return 0.0
+        weight = ACTOR_WEIGHT * shared_actors + GENRE_WEIGHT * shared_genres
+        return round(weight * self.rating_factor(candidate_id), 4)
+
+
+class SimilarityService:
+    def __init__(self, db: Session, top_k: int = DEFAULT_TOP_K):
+        self.repository = MovieSimilarityRepository(db)
+        self.movie_repository = MovieRepository(db)
+        self.top_k = top_k
+
+    def get_similar_movies(self, movie_id: int, limit: int) -> List[Tuple[Movie, float]]:
+        return self.repository.get_similar(movie_id, min(limit, self.top_k))
+
+    def rebuild_all(self) -> int:
+        features = MovieFeatures.load(self.repository, self.movie_repository)
+
+        actor_postings: Dict[int, List[int]] = defaultdict(list)
+        for movie_id, actor_ids in features.actors.items():
+            for actor_id in actor_ids:
+                actor_postings[actor_id].append(movie_id)
+
+        # Genres are shared by large parts of the catalogue, so instead of walking
+        # every genre posting list only the best rated movies per genre are kept
+        # as candidates.
+        genre_postings: Dict[str, List[int]] = defaultdict(list)
+        for movie_id, genres in features.genres.items():
+            for genre in genres:
+                genre_postings[genre].append(movie_id)
+        genre_top = {
+            genre: heapq.nlargest(self.genre_top_size, movie_ids, key=features.rating_factor)
+            for genre, movie_ids in genre_postings.items()
+        }
+
+        neighbours = {}
+        for movie_id in features.movie_ids():
+            candidates: Set[int] = set()
+            for actor_id in features.actors.get(movie_id, ()):
+                candidates.update(actor_postings[actor_id])
+            for genre in features.genres[movie_id]:
+                candidates.update(genre_top[genre])
+            candidates.discard(movie_id)
+            neighbours[movie_id] = self._rank(features, movie_id, candidates)
+
+        self.repository.replace_all(neighbours, {
+            genre: {movie_id: features.rating_factor(movie_id) for movie_id in movie_ids}
+            for genre, movie_ids in genre_top.items()
+        })
+        return len(neighbours)
+
+    def refresh_movie(self, movie_id: int, created: bool = False) -> None:
+        own = MovieFeatures.load(self.repository, self.movie_repository, [movie_id])
+        if movie_id not in own.genres:
+            return
+
+        # A movie that was just created has no neighbours and is in no list.
+        current, referencing = ([], []) if created else self.repository.get_links(movie_id)
+        affected = set(self.repository.get_movie_ids_for_actors(own.actors.get(movie_id, ())))
+        affected.update(referencing)
+        affected.update(similar_movie_id for similar_movie_id, _ in current)
+        affected.discard(movie_id)
+        # The same genre candidates rebuild_all gives the movie. Other movies
+        # of its genres only pick it up on the next full rebuild.
+        genre_top = self.repository.get_genre_top(own.genres[movie_id], [movie_id])
+        candidates = affected.union(*(genre_top[genre] for genre in own.genres[movie_id]))
+        candidates.discard(movie_id)
+
+        features = MovieFeatures.load(self.repository, self.movie_repository, candidates | {movie_id})
+        neighbours = {movie_id: self._rank(features, movie_id, candidates)}
+
+        for other_id, ranked in self.repository.get_neighbours(affected).items():
+            ranked = [(similar_id, score) for similar_id, score in ranked if similar_id != movie_id]
+            score = features.score(other_id, movie_id)
+            if score > 0:
+                ranked.append((movie_id, score))
+            neighbours[other_id] = heapq.nlargest(self.top_k, ranked, key=lambda item: item[1])
+
+        self.repository.update_genre_top(*self._place(genre_top, {
+            movie_id: (own.genres[movie_id], own.rating_factor(movie_id))
+        }))
+        self.repository.replace(neighbours)
+
+    def ratings_changed(self, movie_ids: Iterable[int]) -> None:
+        # Moves the rated movies within the best rated lists of their genres.
+        movie_ids = set(movie_ids)
+        if not movie_ids:
+            return
+        features = MovieFeatures()
+        for movie_id, genres in self.repository.get_genres(movie_ids):
+            features.genres[movie_id] = frozenset(genres.split(',')) if genres else frozenset()
+        features.averages = self.repository.get_average_scores(movie_ids)
+        # Ratings don't change a movie's genres, so only those lists matter.
+        genre_top = self.repository.get_genre_top({genre for genres in features.genres.values() for genre in genres})
+        self.repository.update_genre_top(*self._place(genre_top, {
+            movie_id: (genres, features.rating_factor(movie_id)) for movie_id, genres in features.genres.items()
+        }))
+
+    def remove_movie(self, movie_id: int) -> None:
+        self.repository.delete_for_movie(movie_id)
+
+    @property
+    def genre_top_size(self) -> int:
+        return self.top_k * 2
+
+    def _place(
+        self, genre_top: Dict[str, Dict[int, float]], movies: Dict[int, Tuple[FrozenSet[str], float]]
+    ) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int, float]]]:
+        # Puts each movie into the lists of its genres that it ranks in, and
+        # takes it out of lists of genres it no longer has. A movie already
+        # in a list stays there with its new score even when that falls
+        # below a movie outside the list, since those aren't known here; the
+        # next full rebuild ranks them again. Returns the rows to delete and
+        # to upsert.
+        before = {genre: dict(members) for genre, members in genre_top.items()}
+        for genre, members in genre_top.items():
+            for movie_id, (genres, _) in movies.items():
+                if genre not in genres:
+                    members.pop(movie_id, None)
+        for movie_id, (genres, score) in movies.items():
+            for genre in genres:
+                members = genre_top.setdefault(genre, {})
+                if movie_id in members or len(members) < self.genre_top_size:
+                    members[movie_id] = score
+                    continue
+                lowest = min(members, key=lambda member: (members[member], -member))
+                if score > members[lowest]:
+                    del members[lowest]
+                    members[movie_id] = score
+        removed = [
+            (genre, movie_id)
+            for genre, members in before.items()
+            for movie_id in members
+            if movie_id not in genre_top[genre]
+        ]
+        upserted = [
+            (genre, movie_id, score)
+            for genre, members in genre_top.items()
+            for movie_id, score in members.items()
+            if before.get(genre, {}).get(movie_id) != score
+        ]
+        return removed, upserted
+
+    def _rank(self, features: MovieFeatures, movie_id: int, candidates: Iterable[int]) -> List[Tuple[int, float]]:
+        scored = ((candidate_id, features.score(movie_id, candidate_id)) for candidate_id in candidates)
+        return heapq.nlargest(self.top_k, (item for item in scored if item[1] > 0), key=lambda item: item[1])
+
+
+class InitialBuild:
+    """Fills the similarity tables of a database that has never been built,
+    in a background thread so that startup doesn't wait for it. Of several
+    workers starting on the same database, the one holding the lock file
+    builds and the others skip it; the lock is released when its holder
+    exits, however it exits. The lock file lives in the temp directory,
+    named after the database file."""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session_factory: Callable[[], Session], database: Optional[str]) -> None:
+        if self._thread is not None:
+            return
+        with session_factory() as db:
+            if MovieSimilarityRepository(db).is_built():
+                return
+        lock_path = None
+        if database and database != ':memory:':
+            name = hashlib.sha1(os.path.abspath(database).encode()).hexdigest()[:16]
+            lock_path = os.path.join(tempfile.gettempdir(), f"movie-api-{name}.similarities.lock")
+        self._thread = threading.Thread(
+            target=self._run, args=(session_factory, lock_path), name="similarity-build", daemon=True
+        )
+        self._thread.start()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, session_factory: Callable[[], Session], lock_path: Optional[str]) -> None:
+        lock = open(lock_path, 'a') if lock_path else None
+        try:
+            if lock is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+            with session_factory() as db:
+                # Another worker may have finished it before this one got the lock.
+                if not MovieSimilarityRepository(db).is_built():
+                    count = SimilarityService(db).rebuild_all()
+                    logger.info("Built similar movie lists for %d movies", count)
+        except Exception:
+            logger.exception("Building similar movie lists failed; run scripts/build_similarities.py")
+        finally:
+            if lock is not None:
+                lock.close()
+
+
+initial_build = InitialBuild()
@@ -0,0 +1,176 @@
+import heapq
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.persistence.repositories import get_rating_repository
+
+# Ring name -> (seconds per bucket, buckets kept).
+RINGS = {
+    'minute': (60, 60),
+    'hour': (3600, 168),
+}
+# Window -> (ring it is read from, buckets it sums).
+WINDOWS = {
+    '1h': ('minute', 60),
+    '24h': ('hour', 24),
+    '7d': ('hour', 168),
+}
+KEPT_FOR = timedelta(seconds=max(seconds * size for seconds, size in RINGS.values()))
+
+
+class _Ring:
+    """Counts per bucket for one movie. ``last`` is the newest bucket number
+    (seconds since the epoch divided by the bucket length) held; slots of
+    older buckets are reused as newer ones arrive."""
+
+    __slots__ = ('counts', 'last')
+
+    def __init__(self, size: int, bucket: int):
+        self.counts = array('l', bytes(array('l').itemsize * size))
+        self.last = bucket
+
+    def add(self, bucket: int, delta: int) -> None:
+        size = len(self.counts)
+        if bucket > self.last:
+            for stale in range(max(self.last + 1, bucket - size + 1), bucket + 1):
+                self.counts[stale % size] = 0
+            self.last = bucket
+        elif bucket <= self.last - size:
+            return
+        self.counts[bucket % size] = max(0, self.counts[bucket % size] + delta)
+
+    def total(self, now: int, span: int) -> int:
+        # Buckets in (now - span, now] that the ring still holds, which are at
+        # most two runs of slots.
+        size = len(self.counts)
+        first = max(now - span + 1, self.last - size + 1)
+        last = min(now, self.last)
+        if first > last:
+            return 0
+        start, end = first % size, last % size + 1
+        if start < end:
+            return sum(self.counts[start:end])
+        return sum(self.counts[start:]) + sum(self.counts[:end])
+
+
+def _timestamp(created_at: datetime) -> float:
+    # Creation times are stored as naive UTC.
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TrendingCounters:
+    """Ratings per movie over the last hour, day and week.
+
+    Each movie rated in the last week has a ring of minute buckets and a ring
+    of hour buckets, so a window is summed from at most 168 counters and the
+    ratings table is only read on startup. Windows are exact to their bucket:
+    the oldest bucket of a window may be partly older than the window. The
+    totals of a window are summed once per bucket and patched by writes in
+    between. The counters are rebuilt from ``ratings.created_at`` on startup
+    and patched by the service write paths; patches are ignored until the
+    first rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rings: Dict[int, Dict[str, _Ring]] = {}
+        # Window -> (bucket the totals were summed at, total per movie).
+        self._totals: Dict[str, Tuple[int, Dict[int, int]]] = {}
+        self.loaded = False
+
+    def since(self) -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None) - KEPT_FOR
+
+    def rebuild(self, db: Session) -> None:
+        rings: Dict[int, Dict[str, _Ring]] = {}
+        for movie_id, created_at in get_rating_repository(db).get_creation_times(self.since()):
+            self._count(rings, movie_id, created_at, 1)
+        with self._lock:
+            self._rings = rings
+            self._totals = {}
+            self.loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self.loaded:
+            self.rebuild(db)
+
+    def add(self, movie_id: int, created_at: Optional[datetime], delta: int = 1) -> None:
+        if created_at is None:
+            return
+        with self._lock:
+            if self.loaded:
+                self._count(self._rings, movie_id, created_at, delta)
+                self._refresh([movie_id])
+
+    def remove(self, movie_id: int, created_at: Optional[datetime]) -> None:
+        self.add(movie_id, created_at, -1)
+
+    def set_movies(self, rows: Iterable[Tuple[int, datetime]], movie_ids: Optional[Iterable[int]]) -> None:
+        # Replaces the counters of movie_ids (every movie when None) with
+        # counts of the given (movie_id, created_at) rows.
+        rings: Dict[int, Dict[str, _Ring]] = {}
+        for movie_id, created_at in rows:
+            self._count(rings, movie_id, created_at, 1)
+        with self._lock:
+            if not self.loaded:
+                return
+            if movie_ids is None:
+                self._rings = rings
+                self._totals = {}
+                return
+            movie_ids = list(movie_ids)
+            for movie_id in movie_ids:
+                self._rings.pop(movie_id, None)
+            self._rings.update(rings)
+            self._refresh(movie_ids)
+
+    def remove_movie(self, movie_id: int) -> None:
+        with self._lock:
+            self._rings.pop(movie_id, None)
+            self._refresh([movie_id])
+
+    def top(self, window: str, limit: int) -> List[Tuple[int, int]]:
+        ring_name, span = WINDOWS[window]
+        now = int(time.time()) // RINGS[ring_name][0]
+        with self._lock:
+            summed_at, totals = self._totals.get(window, (None, None))
+            if summed_at != now:
+                totals = {movie_id: rings[ring_name].total(now, span) for movie_id, rings in self._rings.items()}
+                self._totals[window] = (now, totals)
+                # Movies with no ratings left in the week don't need their rings.
+                if span == RINGS[ring_name][1] == max(size for _, size in RINGS.values()):
+                    for movie_id in [movie_id for movie_id, count in totals.items() if not count]:
+                        del self._rings[movie_id]
+                        del totals[movie_id]
+            return heapq.nsmallest(limit, ((movie_id, count) for movie_id, count in totals.items() if count),
+                                   key=lambda item: (-item[1], item[0]))
+
+    def _refresh(self, movie_ids: Iterable[int]) -> None:
+        # Keeps the summed window totals in step with the rings of movie_ids.
+        for window, (summed_at, totals) in self._totals.items():
+            ring_name, span = WINDOWS[window]
+            for movie_id in movie_ids:
+                rings = self._rings.get(movie_id)
+                if rings is None:
+                    totals.pop(movie_id, None)
+                else:
+                    totals[movie_id] = rings[ring_name].total(summed_at, span)
+
+    @staticmethod
+    def _count(rings: Dict[int, Dict[str, _Ring]], movie_id: int, created_at: datetime, delta: int) -> None:
+        timestamp = int(_timestamp(created_at))
+        movie_rings = rings.get(movie_id)
+        if movie_rings is None:
+            if delta < 0:
+                return
+            movie_rings = rings[movie_id] = {
+                name: _Ring(size, timestamp // seconds) for name, (seconds, size) in RINGS.items()
+            }
+        for name, (seconds, _) in RINGS.items():
+            movie_rings[name].add(timestamp // seconds, delta)
+
+
+trending = TrendingCounters()
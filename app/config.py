@@ -0,0 +1,79 @@
+from typing import Optional
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    database_url: str = "sqlite:///./movies.db"
+    # Serves reads only and never writes to the database files, e.g. when
+    # running from a snapshot.
+    read_only: bool = False
+    # "wal" lets readers, including snapshots, run alongside writers.
+    sqlite_journal_mode: Optional[str] = None
+
+    snapshot_dir: str = "./snapshots"
+    snapshot_pages_per_step: int = 256
+    snapshot_step_pause_ms: int = 5
+    snapshot_max_restarts: int = 20
+
+    # Ratings are stored in this many SQLite files when set; see
+    # scripts/rebalance_ratings.py to move them in or out.
+    rating_partitions: int = 0
+    rating_partition_url: str = "sqlite:///./ratings-{partition}.db"
+    rating_change_ship_interval_ms: int = 200
+
+    read_model_enabled: bool = False
+
+    # Ordered id lists of filtered movie lists; 0 turns the cache off.
+    query_cache_size: int = 1000
+    query_cache_max_age_seconds: int = 5
+    # How long past max age an entry is still served while it is refreshed.
+    query_cache_stale_seconds: int = 30
+    query_cache_refresh_workers: int = 1
+
+    rating_write_behind_enabled: bool = False
+    rating_batch_size: int = 500
+    rating_batch_latency_ms: int = 50
+    rating_queue_size: int = 100_000
+    rating_status_retention: int = 100_000
+
+    idempotency_ttl_hours: int = 24
+    idempotency_lease_seconds: int = 60
+    batch_max_operations: int = 100
+
+    admin_token: Optional[str] = None
+    profile_sample_rate: float = 0.0
+    profile_interval_ms: float = 1.0
+    profile_retention: int = 200
+
+    admission_enabled: bool = False
+    admission_queue_timeout_ms: int = 1000
+    admission_list_limit: int = 2
+    admission_list_queue: int = 32
+    admission_read_limit: int = 24
+    admission_read_queue: int = 200
+    admission_rating_write_limit: int = 2
+    admission_rating_write_queue: int = 100
+    admission_write_limit: int = 2
+    admission_write_queue: int = 50
+
+    traffic_capture_enabled: bool = False
+    traffic_capture_path: str = "./traffic/capture-{pid}.jsonl"
+    traffic_capture_max_bytes: int = 50_000_000
+    traffic_capture_backups: int = 5
+    traffic_capture_sample_rate: float = 1.0
+    traffic_capture_queue_size: int = 10_000
+    # Keeps reviewer pseudonyms the same across workers and restarts; a
+    # random one per process is used when unset.
+    traffic_capture_salt: Optional[str] = None
+
+    # "changelog" or "redis"; unset in single-process deployments.
+    cache_bus: Optional[str] = None
+    cache_bus_interval_ms: int = 100
+    cache_bus_channel: str = "movie-api:changes"
+    redis_url: str = "redis://localhost:6379/0"
+
+    class Config:
+        env_prefix = "MOVIE_API_"
+
+
+settings = Settings()
@@ -1,15 +1,77 @@
-from sqlalchemy import create_engine
+from typing import List, Tuple
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
-from app.database.models import Base
+from app.config import settings
+from app.database.migrations import SCHEMA_VERSION, get_schema_version, migrate
+from app.database.models import Rating
+from app.database.partitions import rating_partitions
+from app.database.pragmas import apply_pragmas
 
-DATABASE_URL = "sqlite:///./movies.db"
+DATABASE_URL = settings.database_url
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@event.listens_for(engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys (and ON DELETE CASCADE) unless enabled per connection.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+apply_pragmas(engine)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+class BatchSession(Session):
+    """Session that turns the commits repositories make after each write into
+    flushes, so that a series of service calls runs in one transaction.
+    ``commit_batch`` commits it."""
+
+    def commit(self) -> None:
+        self.flush()
+
+    def commit_batch(self) -> None:
+        super().commit()
+
+
+BatchSessionLocal = sessionmaker(
+    class_=BatchSession, autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    if settings.read_only:
+        with engine.connect() as connection:
+            version = get_schema_version(connection)
+        if version != SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema version {version} can't be served read-only by code at version {SCHEMA_VERSION}"
+            )
+    else:
+        # Only PRAGMA user_version is read when the schema is already current.
+        migrate(engine)
+    if rating_partitions.enabled:
+        rating_partitions.init(create=not settings.read_only)
+        with engine.connect() as connection:
+            if connection.execute(select(Rating.id).limit(1)).first() is not None:
+                raise RuntimeError(
+                    "Ratings are partitioned but the main database still has ratings; "
+                    "run scripts/rebalance_ratings.py"
+                )
+
+
+def snapshot_sources() -> List[Tuple[str, Engine]]:
+    # File names in a snapshot directory, with the engine each is copied from.
+    sources = [("movies.db", engine)]
+    sources += [
+        (f"ratings-{partition}.db", partition_engine)
+        for partition, partition_engine in enumerate(rating_partitions.engines)
+    ]
+    return sources
 
 
 def get_db() -> Session:
@@ -0,0 +1,102 @@
+from typing import Callable, List
+from sqlalchemy import func, insert, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+from app.database.models import Base, ChangeLogEntry, GenreTopMovie, Rating, ReviewerStats
+
+
+def create_schema(connection: Connection) -> None:
+    Base.metadata.create_all(bind=connection)
+    # create_all skips tables that already exist, so indexes added to
+    # existing tables have to be created separately. Indexes on columns that
+    # a later migration adds are left to that migration.
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if {column.name for column in index.columns} <= columns:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def backfill_reviewer_stats(connection: Connection) -> None:
+    email = func.lower(Rating.reviewer_email)
+    connection.execute(
+        insert(ReviewerStats).from_select(
+            ['email', 'rating_count', 'score_sum'],
+            select(email, func.count(), func.sum(Rating.score))
+            .where(Rating.reviewer_email.isnot(None))
+            .group_by(email),
+        )
+    )
+
+
+def baseline(connection: Connection) -> None:
+    # Databases created before schema versioning: bring them up to the
+    # tables, indexes and counters the code had when versioning started.
+    existing_tables = set(inspect(connection).get_table_names())
+    create_schema(connection)
+    if ReviewerStats.__tablename__ not in existing_tables:
+        backfill_reviewer_stats(connection)
+
+
+def add_change_log_origin(connection: Connection) -> None:
+    columns = {column['name'] for column in inspect(connection).get_columns(ChangeLogEntry.__tablename__)}
+    if 'origin' not in columns:
+        connection.exec_driver_sql("ALTER TABLE change_log ADD COLUMN origin VARCHAR(64)")
+
+
+def add_rating_created_at(connection: Connection) -> None:
+    # Also run on rating partition files, which hold their own ratings table.
+    columns = {column['name'] for column in inspect(connection).get_columns(Rating.__tablename__)}
+    if 'created_at' not in columns:
+        connection.exec_driver_sql("ALTER TABLE ratings ADD COLUMN created_at DATETIME")
+    for index in Rating.__table__.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def add_genre_top_movies(connection: Connection) -> None:
+    # Filled by the first similarity build, which runs in the background.
+    GenreTopMovie.__table__.create(bind=connection, checkfirst=True)
+
+
+# MIGRATIONS[n] upgrades a database from schema version n to n + 1. The
+# version is only stamped once all of them have run, so each migration has
+# to be safe to run again after an interrupted upgrade.
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    baseline,
+    add_change_log_origin,
+    add_rating_created_at,
+    add_genre_top_movies,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine: Engine) -> int:
+    with engine.connect() as connection:
+        if get_schema_version(connection) == SCHEMA_VERSION:
+            return SCHEMA_VERSION
+        # pysqlite doesn't open a transaction for DDL, so the write lock is
+        # taken explicitly. Workers starting together wait here and then find
+        # the schema already upgraded.
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        version = get_schema_version(connection)
+        if version == SCHEMA_VERSION:
+            connection.rollback()
+            return version
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema version {version} is newer than this code's version {SCHEMA_VERSION}"
+            )
+        if version == 0 and not inspect(connection).get_table_names():
+            create_schema(connection)
+        else:
+            for migration in MIGRATIONS[version:]:
+                migration(connection)
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.commit()
+    return SCHEMA_VERSION
@@ -1,5 +1,5 @@
 from datetime import date
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Table, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, Table, Text, func
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -7,8 +7,9 @@ Base = declarative_base()
 movie_actor_association = Table(
     'movie_actors',
     Base.metadata,
-    Column('movie_id', Integer, ForeignKey('movies.id'), primary_key=True),
-    Column('actor_id', Integer, ForeignKey('actors.id'), primary_key=True)
+    Column('movie_id', Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True),
+    Column('actor_id', Integer, ForeignKey('actors.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_movie_actors_actor_id', 'actor_id')
 )
 
 
@@ -26,8 +27,8 @@ class Movie(Base):
     budget = Column(Float, nullable=True)
     revenue = Column(Float, nullable=True)
 
-    actors = relationship('Actor', secondary=movie_actor_association, back_populates='movies')
-    ratings = relationship('Rating', back_populates='movie', cascade='all, delete-orphan')
+    actors = relationship('Actor', secondary=movie_actor_association, back_populates='movies', passive_deletes=True)
+    ratings = relationship('Rating', back_populates='movie', cascade='all, delete-orphan', passive_deletes=True)
 
 
 class Actor(Base):
@@ -39,7 +40,7 @@ class Actor(Base):
     birth_date = Column(Date, nullable=True)
     nationality = Column(String(100), nullable=True)
 
-    movies = relationship('Movie', secondary=movie_actor_association, back_populates='actors')
+    movies = relationship('Movie', secondary=movie_actor_association, back_populates='actors', passive_deletes=True)
 
 
 class Rating(Base):
@@ -49,6 +50,64 @@ class Rating(Base):
     score = Column(Float, nullable=False)
     review_text = Column(Text, nullable=True)
     reviewer_email = Column(String(255), nullable=True)
-    movie_id = Column(Integer, ForeignKey('movies.id'), nullable=False)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), nullable=False, index=True)
+    # UTC; unknown for ratings created before it was recorded.
+    created_at = Column(DateTime, nullable=True)
 
     movie = relationship('Movie', back_populates='ratings')
+
+    __table_args__ = (
+        Index('ix_ratings_reviewer_email_lower', func.lower(reviewer_email), id),
+        Index('ix_ratings_created_at_movie_id', created_at, movie_id),
+    )
+
+
+class MovieSimilarity(Base):
+    __tablename__ = 'movie_similarities'
+
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    similar_movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+
+
+class GenreTopMovie(Base):
+    """The best rated movies of each genre, which every movie of the genre
+    is compared with when its similar movies are ranked."""
+
+    __tablename__ = 'genre_top_movies'
+
+    genre = Column(String(100), primary_key=True)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True, index=True)
+    score = Column(Float, nullable=False)
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = 'idempotency_keys'
+
+    key = Column(String(255), primary_key=True)
+    scope = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class ChangeLogEntry(Base):
+    __tablename__ = 'change_log'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    origin = Column(String(64))
+
+
+class ReviewerStats(Base):
+    __tablename__ = 'reviewer_stats'
+
+    email = Column(String(255), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
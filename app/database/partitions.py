@@ -0,0 +1,128 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateIndex
+from app.config import settings
+from app.database.models import Base, ChangeLogEntry, Rating, ReviewerStats
+from app.database.migrations import add_rating_created_at
+from app.database.pragmas import apply_pragmas
+
+partition_metadata = MetaData()
+
+# One row per partition file: which partition it is, how many there were
+# when it was written, and the next rating id it hands out.
+partition_info = Table(
+    'rating_partition', partition_metadata,
+    Column('partition', Integer, primary_key=True, autoincrement=False),
+    Column('partition_count', Integer, nullable=False),
+    Column('next_id', Integer, nullable=False),
+)
+
+# Each partition keeps its ratings with their reviewer counters and an outbox
+# of change log entries, so a rating write only locks its own file.
+PARTITION_TABLES = [Rating.__table__, ReviewerStats.__table__, ChangeLogEntry.__table__]
+
+
+def create_partition_schema(connection: Connection, partition: int, partition_count: int, next_id: int) -> None:
+    Base.metadata.create_all(bind=connection, tables=PARTITION_TABLES)
+    partition_metadata.create_all(bind=connection)
+    for table in PARTITION_TABLES:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    connection.execute(insert(partition_info).values(
+        partition=partition, partition_count=partition_count, next_id=next_id,
+    ))
+
+
+def first_id(partition: int, partition_count: int, after: int = 0) -> int:
+    # Ratings in partition k get ids congruent to k modulo the partition count,
+    # so the partitions never hand out the same id.
+    candidate = after + 1
+    return candidate + (partition - candidate) % partition_count
+
+
+class RatingPartitions:
+    """Ratings spread over several SQLite files by ``movie_id``.
+
+    Every movie's ratings live in one partition, so per-movie reads and
+    aggregates touch a single file; lookups by rating id try the partition
+    the id was allocated in first. Writes to one partition are serialized by
+    a per-partition lock in the process (and SQLite's file lock across
+    processes) and don't wait for writes to the others.
+    """
+
+    def __init__(self, count: int, url_template: str):
+        self.count = count
+        self.engines: List[Engine] = [
+            create_engine(url_template.format(partition=partition), connect_args={"check_same_thread": False})
+            for partition in range(count)
+        ]
+        for engine in self.engines:
+            apply_pragmas(engine)
+        self._sessions = [
+            sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+            for engine in self.engines
+        ]
+        self._locks = [threading.Lock() for _ in range(count)]
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 0
+
+    def partition_for(self, movie_id: int) -> int:
+        return movie_id % self.count
+
+    def home_of(self, rating_id: int) -> int:
+        return rating_id % self.count
+
+    def session(self, partition: int) -> Session:
+        return self._sessions[partition]()
+
+    @contextmanager
+    def writing(self, partition: int) -> Iterator[Session]:
+        with self._locks[partition], self.session(partition) as db:
+            yield db
+
+    def allocate_ids(self, db: Session, count: int) -> List[int]:
+        # Takes the partition's write lock, which the rest of the transaction
+        # keeps until commit.
+        step = self.count
+        next_id = db.execute(
+            update(partition_info)
+            .values(next_id=partition_info.c.next_id + step * count)
+            .returning(partition_info.c.next_id)
+        ).scalar_one()
+        first = next_id - step * count
+        return [first + step * offset for offset in range(count)]
+
+    def init(self, create: bool = True) -> None:
+        for partition, engine in enumerate(self.engines):
+            with engine.begin() as connection:
+                tables = set(connection.dialect.get_table_names(connection))
+                if partition_info.name not in tables:
+                    if not create:
+                        raise RuntimeError(f"{engine.url.database} is not a rating partition")
+                    create_partition_schema(connection, partition, self.count, first_id(partition, self.count))
+                    continue
+                info = connection.execute(select(partition_info)).one()
+                if info.partition != partition or info.partition_count != self.count:
+                    raise RuntimeError(
+                        f"{engine.url.database} is partition {info.partition} of {info.partition_count}, "
+                        f"expected {partition} of {self.count}; run scripts/rebalance_ratings.py"
+                    )
+                # Partitions have no schema version; their upgrades check
+                # what is missing.
+                if create:
+                    add_rating_created_at(connection)
+                elif 'created_at' not in {column['name'] for column in inspect(connection).get_columns('ratings')}:
+                    raise RuntimeError(f"{engine.url.database} needs an upgrade; start a writable instance on it first")
+
+    def dispose(self) -> None:
+        for engine in self.engines:
+            engine.dispose()
+
+
+rating_partitions = RatingPartitions(settings.rating_partitions, settings.rating_partition_url)
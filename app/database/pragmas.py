@@ -0,0 +1,15 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+
+def apply_pragmas(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if settings.read_only:
+            # SQLite then refuses any write made through the connection.
+            cursor.execute("PRAGMA query_only=ON")
+        elif settings.sqlite_journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.close()
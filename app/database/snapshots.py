@@ -0,0 +1,142 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class TooManyRestarts(Exception):
+    pass
+
+
+class Snapshot:
+    """One run of ``take_snapshot``: where it goes and how far it got."""
+
+    def __init__(self, snapshot_id: str, path: Path):
+        self.id = snapshot_id
+        self.path = path
+        self.status = RUNNING
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.files: List[str] = []
+        self.pages_total = 0
+        self.pages_copied = 0
+        self.restarts = 0
+        self.error: Optional[str] = None
+
+
+def backup_database(engine: Engine, target: Path, snapshot: Snapshot, pages: int, pause: float, max_restarts: int) -> None:
+    """Copies the engine's database to ``target`` with SQLite's backup API.
+
+    Each step copies ``pages`` pages and then sleeps for ``pause`` seconds.
+    In WAL mode the whole copy runs in one read transaction, so it is the
+    database as of its start and writers carry on meanwhile. Otherwise each
+    step holds the read lock only briefly, but a commit from another
+    connection restarts the copy; after ``max_restarts`` of those the rest is
+    copied in one step, which keeps writers out for the whole copy.
+    """
+    copied_before = snapshot.pages_copied
+    remaining_before: Optional[int] = None
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal remaining_before
+        if remaining_before is not None and remaining > remaining_before:
+            snapshot.restarts += 1
+            if snapshot.restarts > max_restarts:
+                raise TooManyRestarts()
+        remaining_before = remaining
+        snapshot.pages_copied = copied_before + total - remaining
+        time.sleep(pause)
+
+    source = engine.raw_connection()
+    destination = sqlite3.connect(target)
+    try:
+        connection = source.driver_connection
+        if connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            connection.execute("BEGIN")
+            connection.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        try:
+            connection.backup(destination, pages=pages, progress=progress, sleep=pause)
+        except TooManyRestarts:
+            connection.backup(destination, pages=-1)
+        if connection.in_transaction:
+            connection.rollback()
+        snapshot.pages_total += destination.execute("PRAGMA page_count").fetchone()[0]
+        snapshot.pages_copied = snapshot.pages_total
+        result = destination.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            raise RuntimeError(f"{target.name} failed its integrity check: {result}")
+    finally:
+        destination.close()
+        source.close()
+
+
+def take_snapshot(snapshot: Snapshot, databases: List[Tuple[str, Engine]]) -> Snapshot:
+    # Files are written to a staging directory that is renamed once all of
+    # them are complete, so a snapshot directory is never half written.
+    staging = snapshot.path.with_name(snapshot.path.name + ".partial")
+    try:
+        staging.mkdir(parents=True)
+        for name, engine in databases:
+            backup_database(
+                engine, staging / name, snapshot,
+                pages=settings.snapshot_pages_per_step,
+                pause=settings.snapshot_step_pause_ms / 1000,
+                max_restarts=settings.snapshot_max_restarts,
+            )
+            snapshot.files.append(name)
+        os.replace(staging, snapshot.path)
+        snapshot.status = COMPLETED
+    except Exception as exc:
+        shutil.rmtree(staging, ignore_errors=True)
+        snapshot.status = FAILED
+        snapshot.error = str(exc)
+    snapshot.finished_at = datetime.now(timezone.utc)
+    return snapshot
+
+
+class SnapshotManager:
+    """Runs snapshots in a background thread, one at a time per process."""
+
+    def __init__(self, retention: int = 50):
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self._retention = retention
+        self._lock = threading.Lock()
+
+    def start(self, databases: List[Tuple[str, Engine]]) -> Optional[Snapshot]:
+        with self._lock:
+            if any(snapshot.status == RUNNING for snapshot in self._snapshots.values()):
+                return None
+            snapshot = new_snapshot()
+            self._snapshots[snapshot.id] = snapshot
+            while len(self._snapshots) > self._retention:
+                self._snapshots.popitem(last=False)
+        threading.Thread(
+            target=take_snapshot, args=(snapshot, databases), name=f"snapshot-{snapshot.id}", daemon=True
+        ).start()
+        return snapshot
+
+    def get(self, snapshot_id: str) -> Optional[Snapshot]:
+        return self._snapshots.get(snapshot_id)
+
+    def list(self) -> List[Snapshot]:
+        return list(reversed(self._snapshots.values()))
+
+
+def new_snapshot() -> Snapshot:
+    snapshot_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:6]}"
+    return Snapshot(snapshot_id, Path(settings.snapshot_dir) / snapshot_id)
+
+
+snapshot_manager = SnapshotManager()
@@ -1,6 +1,22 @@
-from fastapi import FastAPI
-from app.database.connection import init_db
-from app.api.routes import movies, actors, ratings
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from app.database.connection import SessionLocal, engine, init_db
+from app.config import settings
+from app.business.costar_graph import costar_graph
+from app.business.read_model import read_model
+from app.business.rating_writer import rating_writer
+from app.business.autocomplete import autocomplete as autocomplete_index
+from app.business.cache_bus import cache_bus
+from app.business.trending import trending
+from app.business.query_cache import query_cache
+from app.business.change_feed import change_log_shipper
+from app.business.idempotency import IdempotencyService
+from app.business.similarity import initial_build
+from app.database.partitions import rating_partitions
+from app.api.profiling import profile_request
+from app.api.admission import admission_control
+from app.api.traffic import capture_traffic, traffic_recorder
+from app.api.routes import movies, actors, ratings, changes, autocomplete, reviewers, batch
 
 app = FastAPI(
     title="Movie Browsing API",
@@ -11,11 +27,85 @@ app = FastAPI(
 app.include_router(movies.router)
 app.include_router(actors.router)
 app.include_router(ratings.router)
+app.include_router(changes.router)
+app.include_router(autocomplete.router)
+app.include_router(reviewers.router)
+app.include_router(batch.router)
+
+if settings.admin_token:
+    # Every admin route requires the token, so without one they aren't loaded.
+    from app.api.routes import admin
+    app.include_router(admin.router)
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    # Profiles requests sent with X-Profile: 1 and a valid X-Admin-Token, plus
+    # a MOVIE_API_PROFILE_SAMPLE_RATE fraction of all requests.
+    return await profile_request(request, call_next)
+
+
+if settings.read_only:
+    @app.middleware("http")
+    async def reject_writes(request: Request, call_next):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return JSONResponse(
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+                content={"detail": "This instance is read-only"},
+                headers={"Allow": "GET, HEAD, OPTIONS"},
+            )
+        return await call_next(request)
+
+
+@app.middleware("http")
+async def admit_requests(request: Request, call_next):
+    # Registered last so it runs first: requests shed with a 503 never reach
+    # the profiler or the threadpool.
+    return await admission_control(request, call_next)
+
+
+if settings.traffic_capture_enabled:
+    @app.middleware("http")
+    async def capture_requests(request: Request, call_next):
+        # Outermost, so shed requests are recorded as well and timings cover
+        # the whole stack.
+        return await capture_traffic(request, call_next)
 
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    if settings.traffic_capture_enabled:
+        traffic_recorder.start()
+    if settings.cache_bus:
+        cache_bus.subscribe(SessionLocal, settings.cache_bus)
+    with SessionLocal() as db:
+        costar_graph.rebuild(db)
+        autocomplete_index.rebuild(db)
+        trending.rebuild(db)
+        if settings.read_model_enabled:
+            read_model.rebuild(db)
+    cache_bus.start()
+    query_cache.start(SessionLocal)
+    if settings.read_only:
+        return
+    with SessionLocal() as db:
+        # Expired keys are otherwise only replaced when a request reuses them.
+        IdempotencyService(db).purge_expired()
+    initial_build.start(SessionLocal, engine.url.database)
+    if rating_partitions.enabled:
+        change_log_shipper.start(SessionLocal, settings.rating_change_ship_interval_ms / 1000)
+    if settings.rating_write_behind_enabled:
+        rating_writer.start(SessionLocal)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    rating_writer.stop()
+    change_log_shipper.stop()
+    cache_bus.stop()
+    query_cache.stop()
+    traffic_recorder.stop()
 
 
 @app.get("/")
@@ -1,6 +1,38 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.database.models import Movie, Actor, Rating
+import heapq
+import os
+import socket
+from contextlib import ExitStack
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from sqlalchemy import delete, event, func, insert, inspect, literal, or_, select, union, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.database.models import (
+    Movie, Actor, Rating, MovieSimilarity, GenreTopMovie, IdempotencyRecord, ChangeLogEntry, ReviewerStats,
+    movie_actor_association
+)
+from app.database.partitions import rating_partitions
+
+T = TypeVar('T')
+
+# SQLite's lower() only folds ASCII letters; reviewer emails are normalized
+# the same way so that Python-side keys match the expression index.
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def normalize_email(email: str) -> str:
+    return email.translate(_ASCII_LOWER)
+
+
+_HOSTNAME = socket.gethostname()
+
+
+def change_origin() -> str:
+    # Tags change log entries with the process that wrote them. Not cached,
+    # because forked workers inherit the parent's module state.
+    return f"{_HOSTNAME}:{os.getpid()}"
 
 
 class MovieRepository:
@@ -8,26 +40,89 @@ class MovieRepository:
         self.db = db
 
     def get_all(self) -> List[Movie]:
-        return self.db.query(Movie).all()
+        return self._with_relations(self.db.query(Movie))
+
+    def iter_rows(self) -> Iterable:
+        return self.db.execute(select(Movie.__table__).order_by(Movie.id))
 
-    def get_by_id(self, movie_id: int) -> Optional[Movie]:
-        return self.db.query(Movie).filter(Movie.id == movie_id).first()
+    def get_by_id(self, movie_id: int, include_relations: bool = False) -> Optional[Movie]:
+        query = self.db.query(Movie).filter(Movie.id == movie_id)
+        if include_relations:
+            movies = self._with_relations(query)
+            return movies[0] if movies else None
+        return query.first()
+
+    def get_by_ids(self, movie_ids: Iterable[int], include_relations: bool = False) -> List[Movie]:
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return []
+        query = self.db.query(Movie).filter(Movie.id.in_(movie_ids))
+        if include_relations:
+            return self._with_relations(query)
+        return query.all()
+
+    def get_existing_ids(self, movie_ids: Iterable[int]) -> List[int]:
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return []
+        return [row[0] for row in self.db.execute(select(Movie.id).where(Movie.id.in_(movie_ids)))]
+
+    def find_ids(
+        self,
+        genre: Optional[str] = None,
+        language: Optional[str] = None,
+        year: Optional[int] = None,
+        order_by: str = 'id',
+        descending: bool = False,
+    ) -> List[int]:
+        query = select(Movie.id)
+        if genre is not None:
+            # genres is a comma separated list.
+            padded = literal(',').concat(func.lower(Movie.genres)).concat(',')
+            query = query.where(func.instr(padded, f",{genre.lower()},") > 0)
+        if language is not None:
+            query = query.where(func.lower(Movie.language) == language.lower())
+        if year is not None:
+            query = query.where(Movie.release_date >= date(year, 1, 1), Movie.release_date < date(year + 1, 1, 1))
+        column = {'id': Movie.id, 'title': Movie.title, 'release_date': Movie.release_date}[order_by]
+        query = query.order_by(column.desc() if descending else column.asc())
+        if order_by != 'id':
+            query = query.order_by(Movie.id)
+        return [movie_id for movie_id, in self.db.execute(query)]
+
+    def get_actor_pairs(self, movie_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, int]]:
+        query = select(movie_actor_association.c.movie_id, movie_actor_association.c.actor_id).order_by(
+            movie_actor_association.c.movie_id, movie_actor_association.c.actor_id
+        )
+        if movie_ids is not None:
+            query = query.where(movie_actor_association.c.movie_id.in_(list(movie_ids)))
+        return [(movie_id, actor_id) for movie_id, actor_id in self.db.execute(query)]
 
     def create(self, movie: Movie) -> Movie:
         self.db.add(movie)
         self.db.commit()
-        self.db.refresh(movie)
         return movie
 
     def update(self, movie: Movie) -> Movie:
         self.db.commit()
-        self.db.refresh(movie)
         return movie
 
     def delete(self, movie: Movie) -> None:
+        # Ratings and cast rows are removed with set-based DELETEs instead of
+        # being loaded into the session and deleted one row at a time. They are
+        # deleted explicitly because databases created before ON DELETE CASCADE
+        # was declared don't have it in their schema.
+        get_rating_repository(self.db).delete_by_movie(movie.id)
+        self.db.execute(delete(movie_actor_association).where(movie_actor_association.c.movie_id == movie.id))
         self.db.delete(movie)
         self.db.commit()
 
+    def _with_relations(self, query) -> List[Movie]:
+        ratings = get_rating_repository(self.db)
+        movies = query.options(selectinload(Movie.actors), ratings.movie_ratings_option()).all()
+        ratings.attach_to_movies(movies)
+        return movies
+
 
 class ActorRepository:
     def __init__(self, db: Session):
@@ -36,21 +131,29 @@ class ActorRepository:
     def get_all(self) -> List[Actor]:
         return self.db.query(Actor).all()
 
+    def iter_rows(self) -> Iterable:
+        return self.db.execute(select(Actor.__table__).order_by(Actor.id))
+
     def get_by_id(self, actor_id: int) -> Optional[Actor]:
         return self.db.query(Actor).filter(Actor.id == actor_id).first()
 
+    def get_by_ids(self, actor_ids: Iterable[int]) -> List[Actor]:
+        actor_ids = list(actor_ids)
+        if not actor_ids:
+            return []
+        return self.db.query(Actor).filter(Actor.id.in_(actor_ids)).all()
+
     def create(self, actor: Actor) -> Actor:
         self.db.add(actor)
         self.db.commit()
-        self.db.refresh(actor)
         return actor
 
     def update(self, actor: Actor) -> Actor:
         self.db.commit()
-        self.db.refresh(actor)
         return actor
 
     def delete(self, actor: Actor) -> None:
+        self.db.execute(delete(movie_actor_association).where(movie_actor_association.c.actor_id == actor.id))
         self.db.delete(actor)
         self.db.commit()
 
@@ -62,23 +165,622 @@ class RatingRepository:
     def get_all(self) -> List[Rating]:
         return self.db.query(Rating).all()
 
+    def iter_rows(self) -> Iterable:
+        return self.db.execute(select(Rating.__table__).order_by(Rating.id))
+
     def get_by_id(self, rating_id: int) -> Optional[Rating]:
         return self.db.query(Rating).filter(Rating.id == rating_id).first()
 
+    def get_by_ids(self, rating_ids: Iterable[int]) -> List[Rating]:
+        rating_ids = list(rating_ids)
+        if not rating_ids:
+            return []
+        return self.db.query(Rating).filter(Rating.id.in_(rating_ids)).all()
+
     def get_by_movie_id(self, movie_id: int) -> List[Rating]:
         return self.db.query(Rating).filter(Rating.movie_id == movie_id).all()
 
+    def get_by_movie_ids(self, movie_ids: Iterable[int]) -> List[Rating]:
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return []
+        return self.db.query(Rating).filter(Rating.movie_id.in_(movie_ids)).all()
+
+    def get_by_reviewer(self, email: str, after: int, limit: int) -> List[Rating]:
+        return (
+            self.db.query(Rating)
+            .filter(func.lower(Rating.reviewer_email) == normalize_email(email), Rating.id > after)
+            .order_by(Rating.id)
+            .limit(limit)
+            .all()
+        )
+
+    def get_reviewer_bias(self, email: str) -> Optional[float]:
+        # Mean of (score - movie average) over the reviewer's ratings.
+        total, count = self.get_reviewer_deviation(email)
+        return total / count if count else None
+
+    def get_reviewer_deviation(self, email: str) -> Tuple[float, int]:
+        # Sum of (score - movie average) over the reviewer's ratings, and their
+        # number; only the movies the reviewer rated are aggregated.
+        reviewed = func.lower(Rating.reviewer_email) == normalize_email(email)
+        averages = (
+            select(Rating.movie_id, func.avg(Rating.score).label('average'))
+            .where(Rating.movie_id.in_(select(Rating.movie_id).where(reviewed)))
+            .group_by(Rating.movie_id)
+            .subquery()
+        )
+        query = (
+            select(func.sum(Rating.score - averages.c.average), func.count())
+            .join(averages, averages.c.movie_id == Rating.movie_id)
+            .where(reviewed)
+        )
+        total, count = self.db.execute(query).one()
+        return total or 0.0, count
+
+    def get_reviewer_stats(self, email: str) -> Optional[ReviewerStats]:
+        return ReviewerStatsRepository(self.db).get(email)
+
+    def get_counts_by_movie(self, movie_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+        query = select(Rating.movie_id, func.count()).group_by(Rating.movie_id)
+        if movie_ids is not None:
+            query = query.where(Rating.movie_id.in_(list(movie_ids)))
+        return {movie_id: count for movie_id, count in self.db.execute(query)}
+
+    def get_average_scores(self, movie_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        query = select(Rating.movie_id, func.avg(Rating.score)).group_by(Rating.movie_id)
+        if movie_ids is not None:
+            query = query.where(Rating.movie_id.in_(list(movie_ids)))
+        return {movie_id: average for movie_id, average in self.db.execute(query)}
+
+    def get_creation_times(
+        self, since: datetime, movie_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[int, datetime]]:
+        # Read from the (created_at, movie_id) index alone.
+        query = select(Rating.movie_id, Rating.created_at).where(Rating.created_at >= since)
+        if movie_ids is not None:
+            query = query.where(Rating.movie_id.in_(list(movie_ids)))
+        return [(movie_id, created_at) for movie_id, created_at in self.db.execute(query)]
+
+    def movie_ratings_option(self):
+        # How Movie.ratings is loaded along with movies.
+        return selectinload(Movie.ratings)
+
+    def attach_to_movies(self, movies: List[Movie]) -> None:
+        pass
+
     def create(self, rating: Rating) -> Rating:
         self.db.add(rating)
         self.db.commit()
-        self.db.refresh(rating)
         return rating
 
+    def create_many(self, ratings: List[Rating]) -> List[Rating]:
+        self.db.add_all(ratings)
+        self.db.commit()
+        return ratings
+
     def update(self, rating: Rating) -> Rating:
         self.db.commit()
-        self.db.refresh(rating)
         return rating
 
     def delete(self, rating: Rating) -> None:
         self.db.delete(rating)
         self.db.commit()
+
+    def delete_by_movie(self, movie_id: int) -> None:
+        # Left uncommitted, so that the ratings go with the movie.
+        ChangeLogRepository(self.db).record_deletes('rating', select(Rating.id).where(Rating.movie_id == movie_id))
+        ReviewerStatsRepository(self.db).record_deletes(Rating.movie_id == movie_id)
+        self.db.execute(delete(Rating).where(Rating.movie_id == movie_id), execution_options={'synchronize_session': False})
+
+
+class PartitionedRatingRepository(RatingRepository):
+    """Ratings routed by movie_id to the files of ``rating_partitions``.
+
+    Reads run the plain repository's queries on each partition involved and
+    merge the results. Every partition records its own change log entries
+    (shipped to the main change log by ``change_log_shipper``) and reviewer
+    counters, so a rating write only locks its partition. Ratings come back
+    detached but loaded; update() and delete() attach them to their partition
+    again.
+    """
+
+    def __init__(self, db: Session):
+        super().__init__(db)
+        self.partitions = rating_partitions
+
+    def get_all(self) -> List[Rating]:
+        ratings = [rating for found in self._read(self._all(), RatingRepository.get_all) for rating in found]
+        return sorted(ratings, key=lambda rating: rating.id)
+
+    def iter_rows(self) -> Iterable:
+        with ExitStack() as stack:
+            results = [
+                stack.enter_context(self.partitions.session(partition)).execute(
+                    select(Rating.__table__).order_by(Rating.id)
+                )
+                for partition in self._all()
+            ]
+            yield from heapq.merge(*results, key=lambda row: row.id)
+
+    def get_by_id(self, rating_id: int) -> Optional[Rating]:
+        # Ratings moved by a rebalance can sit outside the partition their id
+        # was allocated in.
+        home = self.partitions.home_of(rating_id)
+        for partition in [home] + [other for other in self._all() if other != home]:
+            rating = self._read([partition], lambda repository: repository.get_by_id(rating_id))[0]
+            if rating is not None:
+                return rating
+        return None
+
+    def get_by_ids(self, rating_ids: Iterable[int]) -> List[Rating]:
+        rating_ids = list(rating_ids)
+        if not rating_ids:
+            return []
+        found = self._read(self._all(), lambda repository: repository.get_by_ids(rating_ids))
+        return [rating for ratings in found for rating in ratings]
+
+    def get_by_movie_id(self, movie_id: int) -> List[Rating]:
+        partition = self.partitions.partition_for(movie_id)
+        return self._read([partition], lambda repository: repository.get_by_movie_id(movie_id))[0]
+
+    def get_by_movie_ids(self, movie_ids: Iterable[int]) -> List[Rating]:
+        found = self._read_movies(movie_ids, RatingRepository.get_by_movie_ids)
+        return [rating for ratings in found for rating in ratings]
+
+    def get_by_reviewer(self, email: str, after: int, limit: int) -> List[Rating]:
+        found = self._read(self._all(), lambda repository: repository.get_by_reviewer(email, after, limit))
+        return heapq.nsmallest(limit, (rating for ratings in found for rating in ratings), key=lambda rating: rating.id)
+
+    def get_reviewer_deviation(self, email: str) -> Tuple[float, int]:
+        # Every movie's ratings are in one partition, so the per-movie
+        # averages can be taken partition by partition.
+        found = self._read(self._all(), lambda repository: repository.get_reviewer_deviation(email))
+        return sum(total for total, _ in found), sum(count for _, count in found)
+
+    def get_reviewer_stats(self, email: str) -> Optional[ReviewerStats]:
+        found = self._read(self._all(), lambda repository: repository.get_reviewer_stats(email))
+        found = [stats for stats in found if stats is not None]
+        if not found:
+            return None
+        return ReviewerStats(
+            email=found[0].email,
+            rating_count=sum(stats.rating_count for stats in found),
+            score_sum=sum(stats.score_sum for stats in found),
+        )
+
+    def get_counts_by_movie(self, movie_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+        return {
+            movie_id: count
+            for counts in self._read_movies(movie_ids, RatingRepository.get_counts_by_movie)
+            for movie_id, count in counts.items()
+        }
+
+    def get_average_scores(self, movie_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        return {
+            movie_id: average
+            for averages in self._read_movies(movie_ids, RatingRepository.get_average_scores)
+            for movie_id, average in averages.items()
+        }
+
+    def get_creation_times(
+        self, since: datetime, movie_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[int, datetime]]:
+        found = self._read_movies(movie_ids, lambda repository, ids: repository.get_creation_times(since, ids))
+        return [row for rows in found for row in rows]
+
+    def movie_ratings_option(self):
+        return noload(Movie.ratings)
+
+    def attach_to_movies(self, movies: List[Movie]) -> None:
+        by_movie: Dict[int, List[Rating]] = {movie.id: [] for movie in movies}
+        for rating in self.get_by_movie_ids(by_movie):
+            by_movie[rating.movie_id].append(rating)
+        for movie in movies:
+            set_committed_value(movie, 'ratings', by_movie[movie.id])
+
+    def create(self, rating: Rating) -> Rating:
+        return self.create_many([rating])[0]
+
+    def create_many(self, ratings: List[Rating]) -> List[Rating]:
+        by_partition: Dict[int, List[Rating]] = {}
+        for rating in ratings:
+            by_partition.setdefault(self.partitions.partition_for(rating.movie_id), []).append(rating)
+        for partition, batch in sorted(by_partition.items()):
+            with self.partitions.writing(partition) as db:
+                for rating, rating_id in zip(batch, self.partitions.allocate_ids(db, len(batch))):
+                    rating.id = rating_id
+                db.add_all(batch)
+                db.commit()
+        return ratings
+
+    def update(self, rating: Rating) -> Rating:
+        with self.partitions.writing(self.partitions.partition_for(rating.movie_id)) as db:
+            db.add(rating)
+            db.commit()
+        return rating
+
+    def delete(self, rating: Rating) -> None:
+        with self.partitions.writing(self.partitions.partition_for(rating.movie_id)) as db:
+            db.delete(rating)
+            db.commit()
+
+    def delete_by_movie(self, movie_id: int) -> None:
+        # Committed before the movie is deleted: a crash in between leaves a
+        # movie without ratings rather than ratings without a movie.
+        with self.partitions.writing(self.partitions.partition_for(movie_id)) as db:
+            RatingRepository(db).delete_by_movie(movie_id)
+            db.commit()
+
+    def _all(self) -> List[int]:
+        return list(range(self.partitions.count))
+
+    def _read(self, partitions: Iterable[int], read: Callable[[RatingRepository], T]) -> List[T]:
+        results = []
+        for partition in partitions:
+            with self.partitions.session(partition) as db:
+                results.append(read(RatingRepository(db)))
+        return results
+
+    def _read_movies(self, movie_ids: Optional[Iterable[int]], read: Callable[..., T]) -> List[T]:
+        if movie_ids is None:
+            return self._read(self._all(), lambda repository: read(repository, None))
+        by_partition: Dict[int, List[int]] = {}
+        for movie_id in movie_ids:
+            by_partition.setdefault(self.partitions.partition_for(movie_id), []).append(movie_id)
+        return [
+            self._read([partition], lambda repository: read(repository, ids))[0]
+            for partition, ids in sorted(by_partition.items())
+        ]
+
+
+def get_rating_repository(db: Session) -> RatingRepository:
+    return PartitionedRatingRepository(db) if rating_partitions.enabled else RatingRepository(db)
+
+
+class MovieSimilarityRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_similar(self, movie_id: int, limit: int) -> List[Tuple[Movie, float]]:
+        rows = (
+            self.db.query(Movie, MovieSimilarity.score)
+            .join(MovieSimilarity, MovieSimilarity.similar_movie_id == Movie.id)
+            .filter(MovieSimilarity.movie_id == movie_id)
+            .order_by(MovieSimilarity.rank)
+            .limit(limit)
+            .all()
+        )
+        return [(movie, score) for movie, score in rows]
+
+    def is_built(self) -> bool:
+        # Both tables are filled by a full build; databases that predate
+        # either have one of them empty.
+        return all(
+            self.db.execute(select(column).limit(1)).first() is not None
+            for column in (MovieSimilarity.movie_id, GenreTopMovie.movie_id)
+        )
+
+    def get_links(self, movie_id: int) -> Tuple[List[Tuple[int, float]], List[int]]:
+        # The neighbour list of movie_id and the movies whose lists hold it.
+        rows = self.db.execute(
+            select(MovieSimilarity.movie_id, MovieSimilarity.similar_movie_id, MovieSimilarity.score)
+            .where(or_(MovieSimilarity.movie_id == movie_id, MovieSimilarity.similar_movie_id == movie_id))
+            .order_by(MovieSimilarity.movie_id, MovieSimilarity.rank)
+        )
+        neighbours, referencing = [], []
+        for owner_id, similar_movie_id, score in rows:
+            if owner_id == movie_id:
+                neighbours.append((similar_movie_id, score))
+            else:
+                referencing.append(owner_id)
+        return neighbours, referencing
+
+    def get_genre_top(self, genres: Iterable[str], movie_ids: Iterable[int] = ()) -> Dict[str, Dict[int, float]]:
+        # The lists of the given genres and of every genre holding movie_ids.
+        genres, movie_ids = list(genres), list(movie_ids)
+        lists: Dict[str, Dict[int, float]] = {genre: {} for genre in genres}
+        columns = (GenreTopMovie.genre, GenreTopMovie.movie_id, GenreTopMovie.score)
+        # One query per condition, so that each is answered from its index.
+        queries = [select(*columns).where(GenreTopMovie.genre.in_(genres))] if genres else []
+        if movie_ids:
+            queries.append(select(*columns).where(GenreTopMovie.movie_id.in_(movie_ids)))
+        if not queries:
+            return lists
+        for genre, movie_id, score in self.db.execute(union(*queries) if len(queries) > 1 else queries[0]):
+            lists.setdefault(genre, {})[movie_id] = score
+        return lists
+
+    def update_genre_top(self, removed: List[Tuple[str, int]], upserted: List[Tuple[str, int, float]]) -> None:
+        if removed:
+            self.db.execute(
+                delete(GenreTopMovie).where(or_(*(
+                    (GenreTopMovie.genre == genre) & (GenreTopMovie.movie_id == movie_id) for genre, movie_id in removed
+                )))
+            )
+        if upserted:
+            statement = sqlite_insert(GenreTopMovie)
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[GenreTopMovie.genre, GenreTopMovie.movie_id],
+                    set_={'score': statement.excluded.score},
+                ),
+                [{'genre': genre, 'movie_id': movie_id, 'score': score} for genre, movie_id, score in upserted],
+            )
+        self.db.commit()
+
+    def get_neighbours(self, movie_ids: Iterable[int]) -> Dict[int, List[Tuple[int, float]]]:
+        neighbours: Dict[int, List[Tuple[int, float]]] = {movie_id: [] for movie_id in movie_ids}
+        if not neighbours:
+            return neighbours
+        rows = self.db.execute(
+            select(MovieSimilarity.movie_id, MovieSimilarity.similar_movie_id, MovieSimilarity.score)
+            .where(MovieSimilarity.movie_id.in_(list(neighbours)))
+            .order_by(MovieSimilarity.movie_id, MovieSimilarity.rank)
+        )
+        for movie_id, similar_movie_id, score in rows:
+            neighbours[movie_id].append((similar_movie_id, score))
+        return neighbours
+
+    def get_movie_ids_for_actors(self, actor_ids: Iterable[int]) -> List[int]:
+        actor_ids = list(actor_ids)
+        if not actor_ids:
+            return []
+        rows = self.db.execute(
+            select(movie_actor_association.c.movie_id)
+            .where(movie_actor_association.c.actor_id.in_(actor_ids))
+            .distinct()
+        )
+        return [row[0] for row in rows]
+
+    def get_genres(self, movie_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, Optional[str]]]:
+        query = select(Movie.id, Movie.genres)
+        if movie_ids is not None:
+            query = query.where(Movie.id.in_(list(movie_ids)))
+        return [(movie_id, genres) for movie_id, genres in self.db.execute(query)]
+
+    def get_average_scores(self, movie_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        return get_rating_repository(self.db).get_average_scores(movie_ids)
+
+    def replace(self, neighbours: Dict[int, List[Tuple[int, float]]]) -> None:
+        if neighbours:
+            self.db.execute(delete(MovieSimilarity).where(MovieSimilarity.movie_id.in_(list(neighbours))))
+        self._insert(neighbours)
+        self.db.commit()
+
+    def replace_all(
+        self, neighbours: Dict[int, List[Tuple[int, float]]], genre_top: Dict[str, Dict[int, float]]
+    ) -> None:
+        self.db.execute(delete(MovieSimilarity))
+        self.db.execute(delete(GenreTopMovie))
+        self._insert(neighbours)
+        rows = [
+            {'genre': genre, 'movie_id': movie_id, 'score': score}
+            for genre, members in genre_top.items()
+            for movie_id, score in members.items()
+        ]
+        if rows:
+            self.db.execute(insert(GenreTopMovie), rows)
+        self.db.commit()
+
+    def delete_for_movie(self, movie_id: int) -> None:
+        self.db.execute(
+            delete(MovieSimilarity).where(
+                or_(MovieSimilarity.movie_id == movie_id, MovieSimilarity.similar_movie_id == movie_id)
+            )
+        )
+        self.db.commit()
+
+    def _insert(self, neighbours: Dict[int, List[Tuple[int, float]]]) -> None:
+        rows = [
+            {'movie_id': movie_id, 'rank': rank, 'similar_movie_id': similar_movie_id, 'score': score}
+            for movie_id, ranked in neighbours.items()
+            for rank, (similar_movie_id, score) in enumerate(ranked)
+        ]
+        if rows:
+            self.db.execute(insert(MovieSimilarity), rows)
+
+
+class ReviewerStatsRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, email: str) -> Optional[ReviewerStats]:
+        return self.db.get(ReviewerStats, normalize_email(email))
+
+    def record_deletes(self, condition) -> None:
+        # For set-based rating deletes that bypass the session's change tracking.
+        email = func.lower(Rating.reviewer_email)
+        query = (
+            select(email, func.count(), func.sum(Rating.score))
+            .where(condition, Rating.reviewer_email.isnot(None))
+            .group_by(email)
+        )
+        apply_reviewer_deltas(
+            self.db.connection(), {email: (-count, -total) for email, count, total in self.db.execute(query)}
+        )
+
+
+def apply_reviewer_deltas(connection, deltas: Dict[str, Tuple[int, float]]) -> None:
+    deltas = {email: delta for email, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    statement = sqlite_insert(ReviewerStats)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ReviewerStats.email],
+        set_={
+            'rating_count': ReviewerStats.rating_count + statement.excluded.rating_count,
+            'score_sum': ReviewerStats.score_sum + statement.excluded.score_sum,
+        },
+    )
+    connection.execute(statement, [
+        {'email': email, 'rating_count': count, 'score_sum': total}
+        for email, (count, total) in sorted(deltas.items())
+    ])
+
+
+class IdempotencyRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, key: str, scope: str) -> Optional[IdempotencyRecord]:
+        return self.db.get(IdempotencyRecord, (key, scope), populate_existing=True)
+
+    def reserve(self, record: IdempotencyRecord) -> bool:
+        self.db.add(record)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            return False
+        return True
+
+    def take_over(self, record: IdempotencyRecord, now: datetime) -> bool:
+        # Claims a key whose lease or stored response has expired; of several
+        # requests racing for it, one gets it.
+        result = self.db.execute(
+            update(IdempotencyRecord)
+            .where(
+                IdempotencyRecord.key == record.key,
+                IdempotencyRecord.scope == record.scope,
+                IdempotencyRecord.expires_at < now,
+            )
+            .values(request_hash=record.request_hash, status_code=None, response_body=None,
+                    expires_at=record.expires_at)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def complete(self, record: IdempotencyRecord) -> None:
+        self.db.commit()
+
+    def delete(self, record: IdempotencyRecord) -> None:
+        self.db.delete(record)
+        self.db.commit()
+
+    def delete_expired(self, now: datetime) -> None:
+        self.db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < now))
+        self.db.commit()
+
+
+class ChangeLogRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_since(self, since: int, limit: int) -> List[ChangeLogEntry]:
+        return (
+            self.db.query(ChangeLogEntry)
+            .filter(ChangeLogEntry.seq > since)
+            .order_by(ChangeLogEntry.seq)
+            .limit(limit)
+            .all()
+        )
+
+    def get_entries_since(self, since: int, limit: int) -> List[Tuple[int, str, int, str, Optional[str]]]:
+        query = (
+            select(
+                ChangeLogEntry.seq, ChangeLogEntry.entity, ChangeLogEntry.entity_id,
+                ChangeLogEntry.operation, ChangeLogEntry.origin,
+            )
+            .where(ChangeLogEntry.seq > since)
+            .order_by(ChangeLogEntry.seq)
+            .limit(limit)
+        )
+        return [tuple(row) for row in self.db.execute(query)]
+
+    def get_latest_seq(self) -> int:
+        return self.db.execute(select(func.max(ChangeLogEntry.seq))).scalar() or 0
+
+    def record_deletes(self, entity: str, entity_ids) -> None:
+        # For set-based deletes that bypass the session's change tracking.
+        changed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.db.execute(
+            insert(ChangeLogEntry).from_select(
+                ['entity', 'entity_id', 'operation', 'changed_at', 'origin'],
+                select(
+                    literal(entity), entity_ids.subquery().c[0], literal('delete'), literal(changed_at),
+                    literal(change_origin()),
+                ),
+            )
+        )
+
+
+TRACKED_ENTITIES = {Movie: 'movie', Actor: 'actor', Rating: 'rating'}
+
+
+@event.listens_for(Session, "before_flush")
+def collect_changes(session: Session, flush_context, instances) -> None:
+    # Attribute history is only reliable before the flush, while new rows
+    # only get their ids during it, so objects are collected here and
+    # written out in record_changes.
+    pending = session.info['pending_changes'] = []
+    for operation, objects, check_modified in (
+        ('upsert', session.new, False),
+        ('upsert', session.dirty, True),
+        ('delete', session.deleted, False),
+    ):
+        for obj in objects:
+            entity = TRACKED_ENTITIES.get(type(obj))
+            if entity is None:
+                continue
+            # Only a movie's actor list is part of the synced data; collection
+            # changes on the other side of a relationship are not.
+            if check_modified and not session.is_modified(obj, include_collections=entity == 'movie'):
+                continue
+            pending.append((entity, obj, operation))
+
+
+@event.listens_for(Session, "after_flush")
+def record_changes(session: Session, flush_context) -> None:
+    # Runs inside the flush, so change log rows commit or roll back together
+    # with the writes they describe.
+    pending = session.info.pop('pending_changes', None)
+    if not pending:
+        return
+    changes = sorted({(entity, obj.id, operation) for entity, obj, operation in pending})
+    changed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    origin = change_origin()
+    session.connection().execute(insert(ChangeLogEntry), [
+        {'entity': entity, 'entity_id': entity_id, 'operation': operation, 'changed_at': changed_at, 'origin': origin}
+        for entity, entity_id, operation in changes
+    ])
+    # Published to other workers by the cache bus once the transaction commits.
+    session.info.setdefault('uncommitted_changes', []).extend(changes)
+
+
+def _committed_value(obj, key: str):
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+@event.listens_for(Session, "before_flush")
+def collect_reviewer_deltas(session: Session, flush_context, instances) -> None:
+    deltas: Dict[str, List[float]] = {}
+
+    def add(email: Optional[str], score: Optional[float], sign: int) -> None:
+        if email is None or score is None:
+            return
+        delta = deltas.setdefault(normalize_email(email), [0, 0.0])
+        delta[0] += sign
+        delta[1] += sign * score
+
+    for obj in session.new:
+        if isinstance(obj, Rating):
+            add(obj.reviewer_email, obj.score, 1)
+    for obj in session.dirty:
+        if isinstance(obj, Rating) and session.is_modified(obj):
+            add(_committed_value(obj, 'reviewer_email'), _committed_value(obj, 'score'), -1)
+            add(obj.reviewer_email, obj.score, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Rating):
+            add(_committed_value(obj, 'reviewer_email'), _committed_value(obj, 'score'), -1)
+    session.info['reviewer_deltas'] = deltas
+
+
+@event.listens_for(Session, "after_flush")
+def record_reviewer_deltas(session: Session, flush_context) -> None:
+    deltas = session.info.pop('reviewer_deltas', None)
+    if deltas:
+        apply_reviewer_deltas(session.connection(), {email: tuple(delta) for email, delta in deltas.items()})
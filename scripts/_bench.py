@@ -0,0 +1,33 @@
+"""Helpers shared by the benchmark and check scripts.
+
+The scripts import this as ``from _bench import ...``, which works because
+Python puts a script's own directory first on ``sys.path``.
+"""
+import socket
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, timeout: float = 30) -> None:
+    # Polls GET / until a server started in a subprocess answers.
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if client.get("/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError("server did not start")
+
+
+def percentile(samples, fraction: float) -> float:
+    # Samples must be sorted; an empty list gives NaN.
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else float("nan")
@@ -0,0 +1,115 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from _bench import free_port, percentile, wait_for
+
+ROOT = Path(__file__).parent.parent
+ADMIN_TOKEN = "benchmark-admission"
+
+
+def start_server(port: int, database: Path, admission: bool) -> subprocess.Popen:
+    environment = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        MOVIE_API_DATABASE_URL=f"sqlite:///{database}",
+        MOVIE_API_ADMISSION_ENABLED=str(admission).lower(),
+        MOVIE_API_ADMIN_TOKEN=ADMIN_TOKEN,
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=environment,
+    )
+
+
+def run_scenario(admission: bool, database: Path, duration: float, list_clients: int, write_clients: int) -> None:
+    port = free_port()
+    server = start_server(port, database, admission)
+    base_url = f"http://127.0.0.1:{port}"
+    statuses = {"list": Counter(), "rating write": Counter(), "detail read": Counter()}
+    detail_latencies = []
+    stop = threading.Event()
+
+    def flood(kind: str, send) -> None:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            while not stop.is_set():
+                response = send(client)
+                statuses[kind][response.status_code] += 1
+                if response.status_code == 503:
+                    # Well-behaved clients back off as told.
+                    stop.wait(float(response.headers["Retry-After"]))
+
+    def probe() -> None:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            movie_id = 1
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = client.get(f"/movies/{movie_id}")
+                detail_latencies.append(time.perf_counter() - started)
+                statuses["detail read"][response.status_code] += 1
+                movie_id = movie_id % 50 + 1
+                time.sleep(0.01)
+
+    try:
+        with httpx.Client(base_url=base_url) as client:
+            wait_for(client)
+        threads = [threading.Thread(target=flood, args=("list", lambda client: client.get("/movies")))
+                   for _ in range(list_clients)]
+        threads += [
+            threading.Thread(target=flood, args=("rating write", lambda client: client.post(
+                "/ratings", json={"score": 5, "movieId": 1, "reviewerEmail": "load@example.com"}
+            )))
+            for _ in range(write_clients)
+        ]
+        threads.append(threading.Thread(target=probe))
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        with httpx.Client(base_url=base_url) as client:
+            gates = client.get("/admin/admission", headers={"X-Admin-Token": ADMIN_TOKEN}).json()
+    finally:
+        server.terminate()
+        server.wait()
+
+    detail_latencies.sort()
+    print(f"admission control {'on' if admission else 'off'}:")
+    print(f"  detail reads p50 {percentile(detail_latencies, 0.5) * 1000:.1f}ms "
+          f"p99 {percentile(detail_latencies, 0.99) * 1000:.1f}ms")
+    for kind, counts in statuses.items():
+        print(f"  {kind:13} " + ", ".join(f"{code}: {count}" for code, count in sorted(counts.items())))
+    if admission:
+        for gate in gates:
+            print(f"  gate {gate['name']:13} admitted {gate['admitted']}, "
+                  f"shed {gate['shedQueueFull']} queue full / {gate['shedTimeout']} timed out")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Flood list requests and rating writes and measure detail reads, with and without admission control"
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--list-clients", type=int, default=48)
+    parser.add_argument("--write-clients", type=int, default=48)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="admission-"))
+    try:
+        for admission in (False, True):
+            database = directory / f"movies-{admission}.db"
+            shutil.copy(ROOT / "movies.db", database)
+            run_scenario(admission, database, args.duration, args.list_clients, args.write_clients)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
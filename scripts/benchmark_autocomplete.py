@@ -0,0 +1,79 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.business.autocomplete import PrefixIndex, movie_keys, normalize
+from _bench import percentile
+
+WORDS = (
+    "the a of and night day dark light star war love lost last first city river king queen man woman "
+    "house road blood fire ice storm dream story secret world time heart ghost shadow summer winter "
+    "return rise fall empire game hunt island ocean mountain sky iron silver golden red blue black"
+).split()
+
+
+def make_titles(count: int, rng: random.Random):
+    for movie_id in range(1, count + 1):
+        words = rng.choices(WORDS, k=rng.randint(1, 4))
+        yield movie_id, f"{' '.join(words).title()} {movie_id}"
+
+
+def report(label: str, timings) -> None:
+    print(f"{len(timings)} {label}: p50 {percentile(timings, 0.5) * 1000:.3f}ms "
+          f"p99 {percentile(timings, 0.99) * 1000:.3f}ms max {percentile(timings, 1.0) * 1000:.3f}ms")
+
+
+def run(title_count: int, query_count: int, write_count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    titles = dict(make_titles(title_count, rng))
+    # Zipf-like popularity: a few titles carry most of the ratings.
+    popularity = {movie_id: int(1000 / rng.randint(1, 1000)) for movie_id in titles}
+
+    started = time.perf_counter()
+    index = PrefixIndex()
+    index.load(((movie_id, title, movie_keys(title)) for movie_id, title in titles.items()), popularity)
+    print(f"built index over {title_count} titles in {time.perf_counter() - started:.2f}s")
+
+    # Queries are what a search box sends while typing: every prefix of a title.
+    sample = rng.sample(list(titles.values()), max(1, query_count // 8))
+    queries = [normalize(title)[:length] for title in sample for length in range(1, 9)][:query_count]
+
+    def time_searches():
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, 10)
+            timings.append(time.perf_counter() - started)
+        return sorted(timings)
+
+    report("searches", time_searches())
+
+    next_id = title_count + 1
+    write_timings = []
+    for _ in range(write_count):
+        started = time.perf_counter()
+        if rng.random() < 0.5:
+            title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {next_id}"
+            index.put(next_id, title, movie_keys(title))
+            next_id += 1
+        else:
+            index.add_popularity(rng.randint(1, title_count), 1)
+        write_timings.append(time.perf_counter() - started)
+
+    if write_timings:
+        report("writes", sorted(write_timings))
+        report("searches after writes", time_searches())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time title autocomplete over a synthetic catalogue")
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--writes", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.titles, args.queries, args.writes, args.seed)
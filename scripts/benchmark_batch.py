@@ -0,0 +1,108 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+from _bench import free_port, percentile, wait_for
+
+ROOT = Path(__file__).parent.parent
+
+
+def actor(index: int) -> dict:
+    return {"firstName": "Bench", "lastName": f"Actor {index}"}
+
+
+def movie(actor_ids: list) -> dict:
+    return {"title": "Bench Movie", "releaseDate": "2024-01-01", "runtime": 100, "language": "en", "actorIds": actor_ids}
+
+
+def rating(movie_id, index: int) -> dict:
+    return {"movieId": movie_id, "score": index % 10 + 1, "reviewerEmail": f"bench{index}@example.com"}
+
+
+class Client:
+    """Sleeps for the simulated round trip time before every request."""
+
+    def __init__(self, client: httpx.Client, rtt: float):
+        self.client = client
+        self.rtt = rtt
+        self.requests = 0
+
+    def post(self, path: str, body: dict) -> httpx.Response:
+        time.sleep(self.rtt)
+        self.requests += 1
+        response = self.client.post(path, json=body)
+        response.raise_for_status()
+        return response
+
+
+def separately(client: Client, actors: int, ratings: int) -> None:
+    actor_ids = [client.post("/actors", actor(index)).json()["id"] for index in range(actors)]
+    movie_id = client.post("/movies", movie(actor_ids)).json()["id"]
+    for index in range(ratings):
+        client.post("/ratings", rating(movie_id, index))
+
+
+def batched(client: Client, actors: int, ratings: int) -> None:
+    operations = [
+        {"method": "POST", "path": "/actors", "body": actor(index), "ref": f"actor{index}"} for index in range(actors)
+    ]
+    operations.append({
+        "method": "POST", "path": "/movies", "ref": "movie",
+        "body": movie([{"$ref": f"actor{index}"} for index in range(actors)]),
+    })
+    operations.extend(
+        {"method": "POST", "path": "/ratings", "body": rating({"$ref": "movie"}, index)} for index in range(ratings)
+    )
+    client.post("/batch", {"operations": operations})
+
+
+def measure(label: str, workflow, client: Client, iterations: int, actors: int, ratings: int) -> None:
+    durations: List[float] = []
+    client.requests = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        workflow(client, actors, ratings)
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    print(f"{label:10} {client.requests / iterations:5.0f} requests  "
+          f"p50 {percentile(durations, 0.5) * 1000:7.1f}ms  p99 {percentile(durations, 0.99) * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare publishing a movie with its cast and ratings through separate calls and one batch"
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--actors", type=int, default=3)
+    parser.add_argument("--ratings", type=int, default=8)
+    parser.add_argument("--rtt", type=float, nargs="+", default=[0.0, 20.0],
+                        help="simulated network round trip times in milliseconds")
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="batch-"))
+    shutil.copy(ROOT / "movies.db", directory / "movies.db")
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, PYTHONPATH=str(ROOT), MOVIE_API_DATABASE_URL=f"sqlite:///{directory / 'movies.db'}"),
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as http:
+            wait_for(http)
+            for rtt in args.rtt:
+                print(f"round trip {rtt:g}ms, {args.actors} actors + 1 movie + {args.ratings} ratings:")
+                client = Client(http, rtt / 1000)
+                measure("separate", separately, client, args.iterations, args.actors, args.ratings)
+                measure("batch", batched, client, args.iterations, args.actors, args.ratings)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,83 @@
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+from app.database.connection import enable_sqlite_foreign_keys
+from app.database.models import Base, Movie, Actor, Rating, movie_actor_association
+from app.business.services import MovieService, ActorService
+
+
+def seed(db: Session, rating_count: int, actor_count: int) -> None:
+    db.execute(insert(Movie), [
+        {"id": movie_id, "title": f"Movie {movie_id}", "release_date": date(2000, 1, 1), "runtime": 120,
+         "language": "English", "genres": "Drama"}
+        for movie_id in (1, 2)
+    ])
+    db.execute(insert(Actor), [
+        {"id": actor_id, "first_name": "Actor", "last_name": str(actor_id)} for actor_id in range(1, actor_count + 1)
+    ])
+    db.execute(insert(movie_actor_association), [
+        {"movie_id": movie_id, "actor_id": actor_id} for movie_id in (1, 2) for actor_id in range(1, actor_count + 1)
+    ])
+    db.execute(insert(Rating), [
+        {"score": 7.5, "review_text": "Seen it.", "reviewer_email": f"reviewer{i}@example.com", "movie_id": movie_id}
+        for movie_id in (1, 2)
+        for i in range(rating_count)
+    ])
+    db.commit()
+
+
+def legacy_delete(db: Session, movie_id: int) -> None:
+    # What the ORM cascade without passive_deletes does: load every rating and
+    # cast row into the session and delete them one statement at a time.
+    for rating in db.query(Rating).filter(Rating.movie_id == movie_id).all():
+        db.delete(rating)
+    db.flush()
+    movie = db.get(Movie, movie_id)
+    movie.actors = []
+    db.delete(movie)
+    db.commit()
+
+
+def run(rating_count: int, actor_count: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/deletes.db")
+        event.listen(engine, "connect", enable_sqlite_foreign_keys)
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            seed(db, rating_count, actor_count)
+
+        with Session(engine) as db:
+            started = time.perf_counter()
+            legacy_delete(db, 2)
+            legacy = time.perf_counter() - started
+
+        with Session(engine) as db:
+            started = time.perf_counter()
+            MovieService(db).delete_movie(1)
+            set_based = time.perf_counter() - started
+
+        with Session(engine) as db:
+            started = time.perf_counter()
+            ActorService(db).delete_actor(1)
+            actor = time.perf_counter() - started
+        engine.dispose()
+
+    print(f"movie with {rating_count} ratings, row-by-row ORM cascade: {legacy:8.3f}s")
+    print(f"movie with {rating_count} ratings, set-based delete:       {set_based:8.3f}s")
+    print(f"actor delete:                                       {actor:8.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time deleting a movie with many ratings")
+    parser.add_argument("--ratings", type=int, default=100_000)
+    parser.add_argument("--actors", type=int, default=50)
+    args = parser.parse_args()
+    run(args.ratings, args.actors)
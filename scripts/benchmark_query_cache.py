@@ -0,0 +1,137 @@
+import argparse
+import itertools
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from _bench import free_port, percentile, wait_for
+
+ROOT = Path(__file__).parent.parent
+
+GENRES = ["Action", "Comedy", "Crime", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller"]
+LANGUAGES = ["English", "French", "German", "Japanese", "Korean", "Spanish"]
+# The few dozen list queries a listing page sends, one page of 20 each.
+QUERIES = [
+    {"genre": genre, "sort": sort, "limit": 20} for genre, sort in itertools.product(GENRES, ["-rating", "-releaseDate"])
+] + [
+    {"language": language, "sort": "-rating", "limit": 20} for language in LANGUAGES
+] + [
+    {"year": year, "sort": "title", "limit": 20} for year in range(2010, 2020)
+]
+
+
+def seed(database: Path, movies: int, ratings_per_movie: int) -> None:
+    # Runs in a child process, since the app binds its engine on import.
+    code = f"""
+import random
+from datetime import date
+from sqlalchemy import insert
+from app.database.connection import SessionLocal, init_db
+from app.database.models import Movie, Rating
+from app.business.similarity import SimilarityService
+rng = random.Random(3)
+init_db()
+with SessionLocal() as db:
+    db.execute(insert(Movie), [
+        {{"id": i, "title": f"Movie {{i}}", "release_date": date(rng.randint(1970, 2023), 1, 1), "runtime": 100,
+          "language": rng.choice({LANGUAGES!r}), "genres": ",".join(rng.sample({GENRES!r}, 2))}}
+        for i in range(1, {movies} + 1)
+    ])
+    db.execute(insert(Rating), [
+        {{"score": round(rng.uniform(0, 10), 1), "movie_id": movie_id}}
+        for movie_id in range(1, {movies} + 1) for _ in range({ratings_per_movie})
+    ])
+    db.commit()
+    # Built here so the first build doesn't run in the background during the runs.
+    SimilarityService(db).rebuild_all()
+"""
+    subprocess.run(
+        [sys.executable, "-c", code], check=True,
+        env=dict(os.environ, PYTHONPATH=str(ROOT), MOVIE_API_DATABASE_URL=f"sqlite:///{database}"),
+    )
+
+
+def run_scenario(label: str, database: Path, cache_size: int, duration: float, clients: int, writes: float) -> None:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(
+            os.environ, PYTHONPATH=str(ROOT), MOVIE_API_DATABASE_URL=f"sqlite:///{database}",
+            MOVIE_API_QUERY_CACHE_SIZE=str(cache_size), MOVIE_API_ADMISSION_ENABLED="false",
+        ),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    latencies = []
+    outcomes = Counter()
+    stop = threading.Event()
+
+    def read() -> None:
+        rng = random.Random()
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = client.get("/movies", params=rng.choice(QUERIES))
+                latencies.append(time.perf_counter() - started)
+                outcomes[response.headers.get("X-Cache", str(response.status_code))] += 1
+
+    def write() -> None:
+        # New ratings bump the ratings generation, so rating-sorted entries
+        # keep going stale.
+        rng = random.Random()
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while not stop.wait(1 / writes):
+                client.post("/ratings", json={"score": rng.randint(1, 10), "movieId": rng.randint(1, 1000)})
+
+    try:
+        with httpx.Client(base_url=base_url) as client:
+            wait_for(client, timeout=60)
+        threads = [threading.Thread(target=read) for _ in range(clients)]
+        if writes:
+            threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    print(f"{label:10} {len(latencies) / duration:7.0f} requests/s  "
+          f"p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  p99 {percentile(latencies, 0.99) * 1000:7.1f}ms  "
+          + ", ".join(f"{outcome}: {count}" for outcome, count in sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare filtered movie list requests with the query cache on and off"
+    )
+    parser.add_argument("--movies", type=int, default=20_000)
+    parser.add_argument("--ratings", type=int, default=5, help="ratings per movie")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--writes", type=float, default=5.0, help="rating writes per second during the run")
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="query-cache-"))
+    try:
+        seed(directory / "seed.db", args.movies, args.ratings)
+        print(f"{len(QUERIES)} distinct queries over {args.movies} movies, {args.clients} clients, "
+              f"{args.writes:g} rating writes/s")
+        for label, cache_size in (("no cache", 0), ("cache", 1000)):
+            database = directory / f"{cache_size}.db"
+            shutil.copy(directory / "seed.db", database)
+            run_scenario(label, database, cache_size, args.duration, args.clients, args.writes)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
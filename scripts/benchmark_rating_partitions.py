@@ -0,0 +1,99 @@
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from _bench import free_port, percentile, wait_for
+
+ROOT = Path(__file__).parent.parent
+
+
+def run_scenario(partitions: int, directory: Path, duration: float, clients: int, workers: int) -> None:
+    environment = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        MOVIE_API_DATABASE_URL=f"sqlite:///{directory / 'movies.db'}",
+        MOVIE_API_RATING_PARTITION_URL=f"sqlite:///{directory}/ratings-{{partition}}.db",
+        MOVIE_API_ADMISSION_ENABLED="false",
+    )
+    shutil.copy(ROOT / "movies.db", directory / "movies.db")
+    if partitions:
+        subprocess.run(
+            [sys.executable, str(ROOT / "scripts" / "rebalance_ratings.py"), "--partitions", str(partitions),
+             "--from-partitions", "0"],
+            env=environment, check=True, stdout=subprocess.DEVNULL,
+        )
+    environment["MOVIE_API_RATING_PARTITIONS"] = str(partitions)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=environment,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    latencies = []
+    errors = 0
+    stop = threading.Event()
+
+    def write(movie_ids) -> None:
+        nonlocal errors
+        rng = random.Random()
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = client.post("/ratings", json={
+                    "score": rng.randint(1, 10), "movieId": rng.choice(movie_ids),
+                    "reviewerEmail": f"load{rng.randint(1, 500)}@example.com",
+                })
+                if response.status_code == 201:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+    try:
+        with httpx.Client(base_url=base_url) as client:
+            wait_for(client)
+            movie_ids = [movie["id"] for movie in client.get("/movies").json()]
+        threads = [threading.Thread(target=write, args=(movie_ids,)) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    layout = f"{partitions} partitions" if partitions else "unpartitioned"
+    print(f"{layout:15} {len(latencies) / duration:7.0f} writes/s  "
+          f"p50 {percentile(latencies, 0.5) * 1000:6.1f}ms  p99 {percentile(latencies, 0.99) * 1000:6.1f}ms  "
+          f"errors {errors}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure rating write throughput against several worker processes for each partition count"
+    )
+    parser.add_argument("--partitions", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    for partitions in args.partitions:
+        directory = Path(tempfile.mkdtemp(prefix="rating-partitions-"))
+        try:
+            run_scenario(partitions, directory, args.duration, args.clients, args.workers)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
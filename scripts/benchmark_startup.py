@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Runs in a fresh interpreter so that nothing is imported or cached yet.
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+ready_started = time.perf_counter()
+client.__enter__()
+ready = time.perf_counter()
+response = client.get("/movies/1")
+first = time.perf_counter()
+client.__exit__(None, None, None)
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - ready_started) * 1000,
+    "first_request_ms": (first - ready) * 1000,
+}))
+"""
+
+METRICS = ("import_ms", "startup_ms", "first_request_ms", "process_ms")
+
+
+def probe(database: Path) -> dict:
+    environment = dict(os.environ, PYTHONPATH=str(ROOT), MOVIE_API_DATABASE_URL=f"sqlite:///{database}")
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], env=environment, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def run(source: Path, runs: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        first_boots, reboots = [], []
+        for index in range(runs):
+            database = Path(directory) / f"movies-{index}.db"
+            shutil.copy(source, database)
+            first_boots.append(probe(database))
+            reboots.append(probe(database))
+
+    print(f"median of {runs} runs against a copy of {source.name}")
+    print(f"{'':28}" + "".join(f"{metric:>18}" for metric in METRICS))
+    for label, results in (("first boot on the database", first_boots), ("restart, schema current", reboots)):
+        medians = [statistics.median(result[metric] for result in results) for metric in METRICS]
+        print(f"{label:28}" + "".join(f"{median:16.1f}ms" for median in medians))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time, startup time and first-request latency")
+    parser.add_argument("--database", type=Path, default=ROOT / "movies.db")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.database, args.runs)
@@ -0,0 +1,25 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database.connection import SessionLocal, init_db
+from app.business.similarity import SimilarityService
+
+
+def build_similarities():
+    init_db()
+    db = SessionLocal()
+
+    try:
+        started = time.perf_counter()
+        count = SimilarityService(db).rebuild_all()
+        elapsed = time.perf_counter() - started
+        print(f"Computed neighbour lists for {count} movies in {elapsed:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    build_similarities()
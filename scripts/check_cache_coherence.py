@@ -0,0 +1,141 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from _bench import free_port
+
+ROOT = Path(__file__).parent.parent
+WORKERS = 2
+
+
+def start_worker(port: int, database: Path, bus: str) -> subprocess.Popen:
+    environment = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        MOVIE_API_DATABASE_URL=f"sqlite:///{database}",
+        MOVIE_API_READ_MODEL_ENABLED="true",
+        MOVIE_API_CACHE_BUS=bus,
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=environment,
+    )
+
+
+def wait_until(condition, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if condition():
+            return time.perf_counter() - started
+        time.sleep(0.01)
+    raise TimeoutError
+
+
+def suggestions(client: httpx.Client, kind: str, query: str) -> dict:
+    response = client.get("/autocomplete", params={"q": query, "type": kind})
+    return {item["id"]: item for item in response.json()}
+
+
+def popularity(client: httpx.Client, movie_id: int, query: str):
+    suggestion = suggestions(client, "movie", query).get(movie_id)
+    return suggestion["popularity"] if suggestion else None
+
+
+def trending_count(client: httpx.Client, movie_id: int) -> int:
+    response = client.get("/movies/trending", params={"window": "1h", "limit": 100})
+    return {item["movieId"]: item["ratingCount"] for item in response.json()}.get(movie_id, 0)
+
+
+def is_up(client: httpx.Client) -> bool:
+    try:
+        return client.get("/").status_code == 200
+    except httpx.TransportError:
+        return False
+
+
+def run(bus: str, timeout: float) -> int:
+    directory = Path(tempfile.mkdtemp(prefix="cache-coherence-"))
+    database = directory / "movies.db"
+    shutil.copy(ROOT / "movies.db", database)
+    ports = [free_port() for _ in range(WORKERS)]
+    processes = [start_worker(port, database, bus) for port in ports]
+    clients = [httpx.Client(base_url=f"http://127.0.0.1:{port}") for port in ports]
+    writer, reader = clients[0], clients[-1]
+    failures = 0
+
+    def check(label: str, condition) -> None:
+        nonlocal failures
+        try:
+            elapsed = wait_until(condition, timeout)
+            print(f"ok   {label:55} visible on the other worker after {elapsed * 1000:7.1f}ms")
+        except TimeoutError:
+            failures += 1
+            print(f"FAIL {label:55} not visible on the other worker after {timeout:.0f}s")
+
+    try:
+        for client in clients:
+            wait_until(lambda: is_up(client), 30)
+
+        actor = writer.post("/actors", json={"firstName": "Coherence", "lastName": "Zyxwv"}).json()
+        costar = writer.post("/actors", json={"firstName": "Second", "lastName": "Qwvut"}).json()
+        check("created actor", lambda: reader.get(f"/actors/{actor['id']}").status_code == 200)
+        check("created actor in autocomplete", lambda: actor["id"] in suggestions(reader, "actor", "zyxwv"))
+
+        movie = writer.post("/movies", json={
+            "title": "Coherence Check", "releaseDate": "2020-01-01", "runtime": 90, "language": "English",
+            "genres": ["Drama"], "actorIds": [actor["id"], costar["id"]],
+        }).json()
+        check("created movie with cast", lambda: len(reader.get(f"/movies/{movie['id']}").json().get("actors", [])) == 2)
+        check("co-stars of the new cast", lambda: any(
+            entry["actor"]["id"] == costar["id"] for entry in reader.get(f"/actors/{actor['id']}/costars").json()
+        ))
+
+        writer.put(f"/movies/{movie['id']}", json={"title": "Vqxzt Check"})
+        check("renamed movie", lambda: reader.get(f"/movies/{movie['id']}").json()["title"] == "Vqxzt Check")
+        check("renamed movie in autocomplete", lambda: movie["id"] in suggestions(reader, "movie", "vqxzt check"))
+
+        rating = writer.post("/ratings", json={"score": 8, "movieId": movie["id"]}).json()
+        check("new rating on the movie", lambda: len(reader.get(f"/movies/{movie['id']}").json()["ratings"]) == 1)
+        check("rating count in autocomplete", lambda: popularity(reader, movie["id"], "vqxzt check") == 1)
+        check("new rating in trending", lambda: trending_count(reader, movie["id"]) == 1)
+
+        writer.delete(f"/ratings/{rating['id']}")
+        check("deleted rating", lambda: reader.get(f"/ratings/{rating['id']}").status_code == 404)
+        check("rating count after delete", lambda: popularity(reader, movie["id"], "vqxzt check") == 0)
+        check("trending after delete", lambda: trending_count(reader, movie["id"]) == 0)
+
+        writer.delete(f"/movies/{movie['id']}")
+        check("deleted movie", lambda: reader.get(f"/movies/{movie['id']}").status_code == 404)
+        check("co-stars after movie delete", lambda: reader.get(f"/actors/{actor['id']}/costars").json() == [])
+
+        writer.delete(f"/actors/{actor['id']}")
+        check("deleted actor", lambda: reader.get(f"/actors/{actor['id']}").status_code == 404)
+        check("deleted actor in autocomplete", lambda: actor["id"] not in suggestions(reader, "actor", "zyxwv"))
+    finally:
+        for client in clients:
+            client.close()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print("all changes reached the other worker" if not failures else f"{failures} changes did not reach the other worker")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Start two API workers on one database, write through one and wait for the other's caches"
+    )
+    parser.add_argument("--bus", choices=["changelog", "redis"], default="changelog")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds to wait for each change")
+    args = parser.parse_args()
+    sys.exit(run(args.bus, args.timeout))
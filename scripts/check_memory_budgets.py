@@ -0,0 +1,200 @@
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# The app binds its engine on import, so the scratch database is chosen first.
+DATABASE_DIRECTORY = tempfile.mkdtemp(prefix="memory-budgets-")
+os.environ["MOVIE_API_DATABASE_URL"] = f"sqlite:///{DATABASE_DIRECTORY}/movies.db"
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from app.main import app
+from app.database.connection import SessionLocal, engine, init_db
+from app.database.models import Movie, Actor, Rating, movie_actor_association
+from app.persistence.repositories import MovieRepository, RatingRepository
+from app.business.services import MovieService
+from app.business.similarity import SimilarityService
+from app.api.routes.movies import convert_movie_to_response
+from app.api.routes.ratings import convert_rating_to_response
+from app.api.schemas import MovieResponse, RatingResponse
+
+ACTORS_PER_MOVIE = 5
+RATINGS_PER_MOVIE = 10
+BLOCKBUSTER_ID = 1
+
+
+class MemoryCheck:
+    __slots__ = ('label', 'path', 'rows', 'budget')
+
+    def __init__(self, label, path, rows, budget):
+        self.label = label
+        self.path = path
+        self.rows = rows
+        self.budget = budget
+
+
+def checks(movies: int, cast: int) -> List[MemoryCheck]:
+    # Budgets are peak bytes allocated while serving the request, per row in
+    # the response, counting every movie, actor and rating in it. They leave
+    # about 25% headroom over what the routes measured when they were set, so
+    # a route that starts holding another copy of its rows fails.
+    ratings = (movies - 1) * RATINGS_PER_MOVIE + cast
+    return [
+        MemoryCheck("list movies", "/movies", movies + (movies - 1) * ACTORS_PER_MOVIE + ratings + cast, 2_400),
+        MemoryCheck("movie with huge cast", f"/movies/{BLOCKBUSTER_ID}", 1 + cast * 2, 3_000),
+        MemoryCheck("list ratings", "/ratings", ratings, 2_200),
+    ]
+
+
+def seed(movies: int, cast: int) -> None:
+    rng = random.Random(7)
+    actors = max(movies // 2, cast)
+    with SessionLocal() as db:
+        db.execute(insert(Actor), [
+            {"id": i, "first_name": f"First{i}", "last_name": f"Last{i}", "birth_date": date(1970, 1, 1),
+             "nationality": rng.choice(["American", "British", "French"])}
+            for i in range(1, actors + 1)
+        ])
+        db.execute(insert(Movie), [
+            {"id": i, "title": f"Movie title number {i}", "release_date": date(2000, 1, 1), "runtime": 120,
+             "synopsis": "A short synopsis of the movie that is about this long.",
+             "poster_url": f"https://example.com/posters/{i}.jpg", "language": "English",
+             "genres": ",".join(rng.sample(["Action", "Comedy", "Drama", "Horror"], 2)), "budget": 1e7,
+             "revenue": 5e7}
+            for i in range(1, movies + 1)
+        ])
+        # The first movie has a cast of every actor and as many ratings.
+        db.execute(insert(movie_actor_association), [
+            {"movie_id": movie_id, "actor_id": actor_id}
+            for movie_id in range(1, movies + 1)
+            for actor_id in (
+                range(1, cast + 1) if movie_id == BLOCKBUSTER_ID else rng.sample(range(1, actors + 1), ACTORS_PER_MOVIE)
+            )
+        ])
+        db.execute(insert(Rating), [
+            {"score": round(rng.uniform(0, 10), 1), "review_text": "Great movie, would watch again.",
+             "reviewer_email": f"reviewer{rng.randint(1, 1000)}@example.com", "movie_id": movie_id}
+            for movie_id in range(1, movies + 1)
+            for _ in range(cast if movie_id == BLOCKBUSTER_ID else RATINGS_PER_MOVIE)
+        ])
+        db.commit()
+        # Built here so that the first build doesn't run in the background
+        # while requests are measured.
+        SimilarityService(db).rebuild_all()
+
+
+def peak_allocated(function) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_check(client: TestClient, check: MemoryCheck, baseline: int) -> bool:
+    responses = []
+    peak = peak_allocated(lambda: responses.append(client.get(check.path)))
+    per_row = (peak - baseline) / check.rows
+    problems = []
+    if responses[0].status_code != 200:
+        problems.append(f"returned {responses[0].status_code}")
+    if per_row > check.budget:
+        problems.append(f"allocated {per_row:,.0f} bytes per row, budget is {check.budget:,}")
+    status = "FAIL" if problems else "ok"
+    print(f"{status:4} {check.label:22} GET {check.path:12} {peak / 2**20:8.1f} MiB peak "
+          f"{check.rows:8} rows {per_row:8,.0f}/{check.budget:,} bytes per row")
+    for problem in problems:
+        print(f"       {problem}")
+    return bool(problems)
+
+
+def retained(stages) -> List[int]:
+    # Memory still held after each stage, with every stage's result kept
+    # alive the way a request keeps them until the response is sent.
+    kept, sizes = [], []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for stage in stages:
+            before = tracemalloc.get_traced_memory()[0]
+            kept.append(stage(kept[-1] if kept else None))
+            gc.collect()
+            sizes.append(tracemalloc.get_traced_memory()[0] - before)
+    finally:
+        tracemalloc.stop()
+    return sizes
+
+
+def report_row_sizes(movies: int) -> None:
+    # Stage by stage cost of the list routes: ORM objects in the identity
+    # map, response models, the JSON-ready dicts FastAPI encodes them to and
+    # the encoded body.
+    movie_adapter = TypeAdapter(List[MovieResponse])
+    rating_adapter = TypeAdapter(List[RatingResponse])
+    with SessionLocal() as db:
+        service = MovieService(db)
+        movie_sizes = retained([
+            lambda _: MovieRepository(db).get_by_ids(range(2, movies + 1), include_relations=True),
+            lambda rows: [convert_movie_to_response(movie, service) for movie in rows],
+            lambda models: movie_adapter.dump_python(models, mode="json", by_alias=True),
+            lambda encoded: json.dumps(encoded).encode(),
+        ])
+    with SessionLocal() as db:
+        rating_sizes = retained([
+            lambda _: RatingRepository(db).get_all(),
+            lambda rows: [convert_rating_to_response(rating) for rating in rows],
+            lambda models: rating_adapter.dump_python(models, mode="json", by_alias=True),
+            lambda encoded: json.dumps(encoded).encode(),
+        ])
+        ratings = db.query(Rating).count()
+
+    print(f"bytes per row retained at each stage ({movies - 1} movies with {ACTORS_PER_MOVIE} actors and "
+          f"{RATINGS_PER_MOVIE} ratings each, {ratings} ratings):")
+    print(f"       {'':8} {'ORM objects':>12} {'models':>12} {'dicts':>12} {'JSON':>12} {'total':>12}")
+    for label, sizes, rows in (("movie", movie_sizes, movies - 1), ("rating", rating_sizes, ratings)):
+        print(f"       {label:8} " + " ".join(f"{size / rows:12,.0f}" for size in sizes + [sum(sizes)]))
+
+
+def main(movies: int, cast: int, report: bool) -> int:
+    try:
+        init_db()
+        seed(movies, cast)
+        with TestClient(app) as client:
+            # What any request allocates, whatever it returns.
+            baseline = min(peak_allocated(lambda: client.get("/")) for _ in range(3))
+            all_checks = checks(movies, cast)
+            failures = sum(run_check(client, check, baseline) for check in all_checks)
+        if report:
+            report_row_sizes(movies)
+    finally:
+        engine.dispose()
+        shutil.rmtree(DATABASE_DIRECTORY, ignore_errors=True)
+    print(f"{len(all_checks) - failures}/{len(all_checks)} routes within their memory budgets")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check peak memory allocated by the list and detail routes against per-row budgets"
+    )
+    parser.add_argument("--movies", type=int, default=1_000)
+    parser.add_argument("--cast", type=int, default=2_000, help="actors and ratings of the one huge movie")
+    parser.add_argument("--no-report", dest="report", action="store_false",
+                        help="skip the bytes per row breakdown of ORM objects, models and JSON")
+    args = parser.parse_args()
+    sys.exit(main(args.movies, args.cast, args.report))
@@ -0,0 +1,190 @@
+import argparse
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# The app binds its engine on import, so the scratch database is chosen first.
+DATABASE_DIRECTORY = tempfile.mkdtemp(prefix="query-plans-")
+os.environ["MOVIE_API_DATABASE_URL"] = f"sqlite:///{DATABASE_DIRECTORY}/movies.db"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from app.main import app
+from app.database.connection import SessionLocal, engine, init_db
+from app.database.migrations import backfill_reviewer_stats
+from app.database.models import Movie, Actor, Rating, movie_actor_association
+from app.business.similarity import SimilarityService
+
+# Tables that grow with the catalogue. Any statement that walks one of them
+# end to end fails the check unless the route is a list route over that table.
+GUARDED_TABLES = ("movies", "ratings", "movie_actors")
+SCAN = re.compile(r"^SCAN (%s)(?:_\d+)?\b" % "|".join(GUARDED_TABLES))
+
+MOVIES = 200
+ACTORS = 300
+ACTORS_PER_MOVIE = 5
+RATINGS_PER_MOVIE = 10
+
+
+class RouteCheck:
+    __slots__ = ('label', 'method', 'path', 'budget', 'allowed_scans', 'json')
+
+    def __init__(self, label, method, path, budget, allowed_scans=(), json=None):
+        self.label = label
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.allowed_scans = set(allowed_scans)
+        self.json = json
+
+
+# Budgets are the number of SQL statements a request may issue. GET /movies
+# loads movies, their actors and their ratings with selectin eager loading,
+# so it issues three statements however many movies are returned.
+CHECKS = [
+    RouteCheck("list movies", "GET", "/movies", 3, allowed_scans={"movies", "ratings", "movie_actors"}),
+    RouteCheck("get movies by ids", "GET", "/movies?ids=1,2,3", 3),
+    # Reading the ids of a filtered list scans movies; a cached one skips the
+    # first two statements.
+    RouteCheck("filter movies", "GET", "/movies?genre=drama&sort=-rating&limit=20", 5, allowed_scans={"movies"}),
+    RouteCheck("get movie", "GET", "/movies/1", 3),
+    RouteCheck("similar movies", "GET", "/movies/1/similar", 1),
+    RouteCheck("trending movies", "GET", "/movies/trending?window=7d", 1),
+    RouteCheck("list actors", "GET", "/actors", 1),
+    RouteCheck("get actors by ids", "GET", "/actors?ids=1,2,3", 1),
+    RouteCheck("get actor", "GET", "/actors/1", 1),
+    RouteCheck("actor costars", "GET", "/actors/1/costars", 2),
+    RouteCheck("actor path", "GET", "/actors/1/path/2", 4),
+    RouteCheck("list ratings", "GET", "/ratings", 1, allowed_scans={"ratings"}),
+    RouteCheck("get ratings by ids", "GET", "/ratings?ids=1,2,3", 1),
+    RouteCheck("get rating", "GET", "/ratings/1", 1),
+    RouteCheck("change feed", "GET", "/changes", 1),
+    RouteCheck("autocomplete", "GET", "/autocomplete?q=movie", 0),
+    RouteCheck("reviewer", "GET", "/reviewers/reviewer1@example.com", 2),
+    RouteCheck("reviewer ratings", "GET", "/reviewers/reviewer1@example.com/ratings", 2),
+    RouteCheck("create actor", "POST", "/actors", 2, json={"firstName": "New", "lastName": "Actor"}),
+    RouteCheck("update actor", "PUT", "/actors/1", 3, json={"firstName": "Renamed"}),
+    RouteCheck(
+        "create movie", "POST", "/movies", 16,
+        json={"title": "New Movie", "releaseDate": "2020-01-01", "runtime": 100, "language": "English",
+              "genres": ["Drama"], "actorIds": [1, 2, 3]},
+    ),
+    RouteCheck("update movie", "PUT", "/movies/1", 5, json={"title": "Renamed"}),
+    # Rating writes look up the movie's genres, its average and the best
+    # rated lists of those genres, which the movie may move within.
+    RouteCheck("create rating", "POST", "/ratings", 7,
+               json={"score": 7.5, "movieId": 1, "reviewerEmail": "reviewer1@example.com"}),
+    RouteCheck("update rating", "PUT", "/ratings/1", 7, json={"score": 3.0}),
+    RouteCheck("delete rating", "DELETE", "/ratings/2", 7),
+    RouteCheck("delete actor", "DELETE", "/actors/3", 4),
+    RouteCheck("delete movie", "DELETE", "/movies/2", 9),
+]
+
+
+def seed() -> None:
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with SessionLocal() as db:
+        db.execute(insert(Actor), [
+            {"id": i, "first_name": f"First{i}", "last_name": f"Last{i}", "birth_date": date(1970, 1, 1)}
+            for i in range(1, ACTORS + 1)
+        ])
+        db.execute(insert(Movie), [
+            {"id": i, "title": f"Movie {i}", "release_date": date(2000, 1, 1), "runtime": 120,
+             "language": "English", "genres": ",".join(rng.sample(["Action", "Comedy", "Drama", "Horror"], 2))}
+            for i in range(1, MOVIES + 1)
+        ])
+        db.execute(insert(movie_actor_association), [
+            {"movie_id": movie_id, "actor_id": actor_id}
+            for movie_id in range(1, MOVIES + 1)
+            for actor_id in rng.sample(range(1, ACTORS + 1), ACTORS_PER_MOVIE)
+        ])
+        db.execute(insert(Rating), [
+            {"score": round(rng.uniform(0, 10), 1), "reviewer_email": f"reviewer{rng.randint(1, 50)}@example.com",
+             "movie_id": movie_id, "created_at": now - timedelta(minutes=rng.randint(0, 14 * 24 * 60))}
+            for movie_id in range(1, MOVIES + 1)
+            for _ in range(RATINGS_PER_MOVIE)
+        ])
+        db.commit()
+        backfill_reviewer_stats(db.connection())
+        db.commit()
+        SimilarityService(db).rebuild_all()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+
+def explain(statement: str, parameters) -> list:
+    if isinstance(parameters, list):
+        parameters = parameters[0] if parameters else ()
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[3] for row in rows]
+
+
+def run_check(client: TestClient, check: RouteCheck, verbose: bool) -> list:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("PRAGMA"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.request(check.method, check.path, json=check.json)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    problems = []
+    if response.status_code >= 400:
+        problems.append(f"returned {response.status_code}")
+    if len(statements) > check.budget:
+        problems.append(f"issued {len(statements)} statements, budget is {check.budget}")
+    plans = []
+    for statement, parameters in statements:
+        statement = " ".join(statement.split())
+        plan = explain(statement, parameters)
+        plans.append((statement, plan))
+        for detail in plan:
+            scan = SCAN.match(detail)
+            if scan and scan.group(1) not in check.allowed_scans:
+                problems.append(f"{detail} in: {statement[:120]}")
+
+    status = "FAIL" if problems else "ok"
+    print(f"{status:4} {check.label:20} {check.method:6} {check.path:45} {len(statements):3}/{check.budget}")
+    for problem in problems:
+        print(f"       {problem}")
+    if verbose:
+        for statement, plan in plans:
+            print(f"       > {statement[:120]}")
+            for detail in plan:
+                print(f"           {detail}")
+    return problems
+
+
+def main(verbose: bool) -> int:
+    try:
+        init_db()
+        seed()
+        with TestClient(app) as client:
+            failures = sum(bool(run_check(client, check, verbose)) for check in CHECKS)
+    finally:
+        engine.dispose()
+        shutil.rmtree(DATABASE_DIRECTORY, ignore_errors=True)
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} routes within their plan and statement budgets")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check every route's SQL for full scans and statement counts against a seeded database"
+    )
+    parser.add_argument("--verbose", action="store_true", help="print each statement with its query plan")
+    args = parser.parse_args()
+    sys.exit(main(args.verbose))
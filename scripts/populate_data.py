@@ -6,6 +6,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.database.connection import SessionLocal, init_db
 from app.business.services import MovieService, ActorService, RatingService
+from app.business.similarity import SimilarityService
 
 
 def populate_database():
@@ -365,6 +366,9 @@ def populate_database():
 
         print(f"Created {rating_count} ratings")
 
+        print("Computing similar movies...")
+        SimilarityService(db).rebuild_all()
+
         print("\nDatabase populated successfully!")
         print(f"Total actors: {len(actor_service.get_all_actors())}")
         print(f"Total movies: {len(movie_service.get_all_movies())}")
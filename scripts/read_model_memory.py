@@ -0,0 +1,75 @@
+import gc
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from app.database.models import Base, Movie, Actor, Rating, movie_actor_association
+from app.business.read_model import CatalogueReadModel
+
+GENRES = ["Action", "Comedy", "Crime", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller"]
+LANGUAGES = ["English", "French", "German", "Japanese", "Korean", "Spanish"]
+
+
+def seed(db: Session, movie_count: int, actors_per_movie: int, ratings_per_movie: int):
+    actor_count = max(movie_count // 2, actors_per_movie)
+    db.execute(insert(Actor), [
+        {"id": i, "first_name": f"First{i}", "last_name": f"Last{i}", "birth_date": date(1970, 1, 1),
+         "nationality": random.choice(["American", "British", "French"])}
+        for i in range(1, actor_count + 1)
+    ])
+    db.execute(insert(Movie), [
+        {"id": i, "title": f"Movie title number {i}", "release_date": date(2000, 1, 1), "runtime": 120,
+         "synopsis": "A short synopsis of the movie that is about this long.",
+         "poster_url": f"https://example.com/posters/{i}.jpg", "language": random.choice(LANGUAGES),
+         "genres": ",".join(random.sample(GENRES, 2)), "budget": 1e7, "revenue": 5e7}
+        for i in range(1, movie_count + 1)
+    ])
+    db.execute(insert(movie_actor_association), [
+        {"movie_id": movie_id, "actor_id": actor_id}
+        for movie_id in range(1, movie_count + 1)
+        for actor_id in random.sample(range(1, actor_count + 1), actors_per_movie)
+    ])
+    db.execute(insert(Rating), [
+        {"score": round(random.uniform(0, 10), 1), "review_text": "Great movie, would watch again.",
+         "reviewer_email": f"reviewer{random.randint(1, 1000)}@example.com", "movie_id": movie_id}
+        for movie_id in range(1, movie_count + 1)
+        for _ in range(ratings_per_movie)
+    ])
+    db.commit()
+
+
+def measure(movie_count: int, actors_per_movie: int = 5, ratings_per_movie: int = 4):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/read_model.db")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            seed(db, movie_count, actors_per_movie, ratings_per_movie)
+
+        model = CatalogueReadModel()
+        with Session(engine) as db:
+            gc.collect()
+            tracemalloc.start()
+            model.rebuild(db)
+            gc.collect()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        engine.dispose()
+
+    print(
+        f"{movie_count:>8} movies ({actors_per_movie} actors, {ratings_per_movie} ratings each): "
+        f"{retained / movie_count:8.0f} bytes/movie retained, "
+        f"{retained / 2**20:7.1f} MiB total, {peak / 2**20:7.1f} MiB peak during rebuild"
+    )
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    for count in (1_000, 10_000, 100_000):
+        measure(count)
@@ -0,0 +1,132 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Move ratings between the main database and partition files. Stop the API first."
+    )
+    parser.add_argument("--partitions", type=int, required=True, help="target partition count; 0 moves them back")
+    parser.add_argument(
+        "--from-partitions", type=int, default=int(os.environ.get("MOVIE_API_RATING_PARTITIONS", 0)),
+        help="current partition count; defaults to MOVIE_API_RATING_PARTITIONS",
+    )
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    return parser.parse_args()
+
+
+args = parse_args()
+# The app reads its partition layout on import, so the current one is set first.
+os.environ["MOVIE_API_RATING_PARTITIONS"] = str(args.from_partitions)
+
+from sqlalchemy import delete, func, insert, select, update
+from app.config import settings
+from app.database.connection import SessionLocal, engine
+from app.database.migrations import backfill_reviewer_stats, migrate
+from app.database.models import Rating, ReviewerStats
+from app.database.partitions import RatingPartitions, create_partition_schema, first_id, partition_info, rating_partitions
+from app.business.change_feed import change_log_shipper
+
+RATING_COLUMNS = [column.name for column in Rating.__table__.columns]
+
+
+def count_ratings(connection) -> int:
+    return connection.execute(select(func.count()).select_from(Rating.__table__)).scalar()
+
+
+def copy_ratings(sources, targets, partition_count: int, batch_size: int):
+    counts = [0] * len(targets)
+    batches = [[] for _ in targets]
+    max_id = 0
+
+    def flush(target: int) -> None:
+        if batches[target]:
+            targets[target].execute(insert(Rating.__table__), batches[target])
+            counts[target] += len(batches[target])
+            batches[target] = []
+
+    for source in sources:
+        with source.connect() as connection:
+            for row in connection.execution_options(yield_per=batch_size).execute(select(Rating.__table__)):
+                target = row.movie_id % partition_count if partition_count else 0
+                batches[target].append(dict(zip(RATING_COLUMNS, row)))
+                max_id = max(max_id, row.id)
+                if len(batches[target]) >= batch_size:
+                    flush(target)
+    for target in range(len(targets)):
+        flush(target)
+    return counts, max_id
+
+
+def rebalance(partition_count: int, batch_size: int) -> None:
+    migrate(engine)
+    with engine.connect() as connection:
+        in_main = count_ratings(connection)
+    if rating_partitions.enabled:
+        rating_partitions.init()
+        if in_main:
+            raise SystemExit(f"The main database has {in_main} ratings as well as partitions; fix that first")
+        # Their change log entries are moved before the partitions go away.
+        print(f"shipped {change_log_shipper.ship(SessionLocal)} pending change log entries")
+        sources = rating_partitions.engines
+    else:
+        sources = [engine]
+    total = 0
+    for source in sources:
+        with source.connect() as connection:
+            total += count_ratings(connection)
+
+    # The new layout is built next to the old one and swapped in at the end.
+    if partition_count:
+        staging = RatingPartitions(partition_count, settings.rating_partition_url + ".rebalance")
+        for staging_engine in staging.engines:
+            Path(staging_engine.url.database).unlink(missing_ok=True)
+        targets = [staging_engine.connect() for staging_engine in staging.engines]
+        for partition, connection in enumerate(targets):
+            create_partition_schema(connection, partition, partition_count, first_id(partition, partition_count))
+    else:
+        targets = [engine.connect()]
+
+    try:
+        counts, max_id = copy_ratings(sources, targets, partition_count, batch_size)
+        if sum(counts) != total:
+            raise RuntimeError(f"Copied {sum(counts)} ratings, expected {total}")
+        for partition, connection in enumerate(targets):
+            if partition_count:
+                connection.execute(update(partition_info).values(next_id=first_id(partition, partition_count, max_id)))
+            else:
+                connection.execute(delete(ReviewerStats))
+            backfill_reviewer_stats(connection)
+            connection.commit()
+    finally:
+        for connection in targets:
+            connection.close()
+
+    old_paths = [Path(partition_engine.url.database) for partition_engine in rating_partitions.engines]
+    rating_partitions.dispose()
+    if partition_count:
+        staging.dispose()
+        final = RatingPartitions(partition_count, settings.rating_partition_url)
+        for staging_engine, final_engine in zip(staging.engines, final.engines):
+            os.replace(staging_engine.url.database, final_engine.url.database)
+        final.dispose()
+        if not rating_partitions.enabled:
+            with engine.begin() as connection:
+                connection.execute(delete(Rating.__table__))
+                connection.execute(delete(ReviewerStats))
+    for path in old_paths[partition_count:]:
+        path.unlink(missing_ok=True)
+
+    layout = f"{partition_count} partitions" if partition_count else "the main database"
+    print(f"moved {total} ratings into {layout}: " + ", ".join(str(count) for count in counts))
+    print(f"set MOVIE_API_RATING_PARTITIONS={partition_count} before starting the API")
+
+
+if __name__ == "__main__":
+    if args.partitions == args.from_partitions:
+        raise SystemExit(f"Ratings are already in {args.partitions} partitions")
+    rebalance(args.partitions, args.batch_size)
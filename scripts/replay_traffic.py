@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.api.traffic import pseudonymize
+from _bench import free_port, percentile, wait_for
+
+COLLECTIONS = ("movies", "actors", "ratings")
+# Body fields that refer to rows, and the collection they refer to.
+REFERENCE_FIELDS = {"movieId": "movies", "actorId": "actors", "actorIds": "actors"}
+
+
+def load_capture(paths: List[Path], limit: Optional[int]) -> List[dict]:
+    lines = []
+    for path in paths:
+        with open(path, encoding="utf-8") as capture:
+            lines.extend(json.loads(line) for line in capture if line.strip())
+    lines.sort(key=lambda line: line["ts"])
+    return lines[:limit] if limit else lines
+
+
+def pseudonymize_seed(database: Path, salt: str) -> None:
+    # Captured requests carry pseudonymized reviewer emails; rewriting the
+    # seed's the same way lets them find the reviewers' existing ratings.
+    with sqlite3.connect(database) as connection:
+        connection.create_function("pseudonymize", 1, lambda email: email and pseudonymize(email, salt))
+        tables = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        connection.execute("UPDATE ratings SET reviewer_email = pseudonymize(reviewer_email)")
+        if "reviewer_stats" in tables:
+            connection.execute("UPDATE reviewer_stats SET email = pseudonymize(email)")
+
+
+class IdMap:
+    """Captured ids of rows created during the capture, mapped to the ids the
+    replay created for them. Requests wait for a creation that is still in
+    flight before they are sent."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._ids: Dict[Tuple[str, int], int] = {}
+        self._pending: Dict[Tuple[str, int], threading.Event] = {}
+
+    def expect(self, collection: str, captured_id: int) -> None:
+        self._pending[(collection, captured_id)] = threading.Event()
+
+    def created(self, collection: str, captured_id: int, replayed_id: Optional[int]) -> None:
+        if replayed_id is not None:
+            self._ids[(collection, captured_id)] = replayed_id
+        self._pending[(collection, captured_id)].set()
+
+    def resolve(self, collection: str, captured_id) -> int:
+        if not isinstance(captured_id, int):
+            return captured_id
+        pending = self._pending.get((collection, captured_id))
+        if pending is not None:
+            pending.wait(self.timeout)
+        return self._ids.get((collection, captured_id), captured_id)
+
+
+def rewrite(line: dict, ids: IdMap) -> Tuple[str, list, Optional[dict]]:
+    segments = line["path"].split("/")
+    collection = segments[1] if len(segments) > 1 and segments[1] in COLLECTIONS else None
+    if collection and len(segments) > 2 and segments[2].isdigit():
+        segments[2] = str(ids.resolve(collection, int(segments[2])))
+    query = []
+    for name, value in line["query"]:
+        if name == "ids" and collection:
+            value = ",".join(
+                str(ids.resolve(collection, int(item))) if item.strip().isdigit() else item
+                for item in value.split(",")
+            )
+        query.append((name, value))
+    body = line["body"]
+    if isinstance(body, dict):
+        body = dict(body)
+        for field, target in REFERENCE_FIELDS.items():
+            if isinstance(body.get(field), list):
+                body[field] = [ids.resolve(target, item) for item in body[field]]
+            elif field in body:
+                body[field] = ids.resolve(target, body[field])
+    return "/".join(segments), query, body
+
+
+def replay(lines: List[dict], base_url: str, speed: float, concurrency: int) -> None:
+    ids = IdMap(timeout=30)
+    results = defaultdict(list)
+    statuses = defaultdict(Counter)
+    matched = Counter()
+    lock = threading.Lock()
+    client = httpx.Client(
+        base_url=base_url, timeout=60,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+    def send(line: dict, due: float) -> None:
+        path, query, body = rewrite(line, ids)
+        headers = {"Idempotency-Key": line["idempotencyKey"]} if line.get("idempotencyKey") else {}
+        response = None
+        try:
+            response = client.request(
+                line["method"], path, params=query, json=body if line["body"] is not None else None, headers=headers
+            )
+        except httpx.TransportError:
+            pass
+        finished = time.perf_counter()
+        if "createdId" in line:
+            replayed_id = None
+            if response is not None and response.status_code == 201:
+                replayed_id = response.json().get("id")
+            ids.created(path.split("/")[1], line["createdId"], replayed_id)
+        route = f"{line['method']} {line.get('route') or line['path']}"
+        status = response.status_code if response is not None else "error"
+        with lock:
+            # Latency counts from when the request was due, so time spent
+            # waiting for a free client is included.
+            results[route].append(finished - due)
+            statuses[route][status] += 1
+            matched[status == line["status"]] += 1
+
+    first = lines[0]["ts"]
+    started = time.perf_counter()
+    lag = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for line in lines:
+            due = started + (line["ts"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag.append(-delay)
+            if "createdId" in line:
+                ids.expect(line["path"].split("/")[1], line["createdId"])
+            executor.submit(send, line, due)
+    elapsed = time.perf_counter() - started
+    client.close()
+
+    captured_span = (lines[-1]["ts"] - first) or 1e-9
+    print(f"replayed {len(lines)} requests in {elapsed:.1f}s ({len(lines) / elapsed:.0f}/s; "
+          f"captured at {len(lines) / captured_span:.0f}/s, speed x{speed:g})")
+    print(f"status matched the capture for {matched[True]} of {len(lines)}; "
+          f"dispatch ran late for {len(lag)} requests, worst {max(lag, default=0) * 1000:.1f}ms")
+    captured = defaultdict(list)
+    for line in lines:
+        captured[f"{line['method']} {line.get('route') or line['path']}"].append(line["durationMs"] / 1000)
+    print(f"{'route':40} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} "
+          f"{'captured p50':>13} {'p99':>9}  statuses")
+    everything = []
+    for route, latencies in sorted(results.items(), key=lambda item: -len(item[1])):
+        everything.extend(latencies)
+        print(summary(route, latencies, captured[route]) + "  " + ", ".join(
+            f"{code}: {count}" for code, count in sorted(statuses[route].items(), key=str)
+        ))
+    print(summary("all", everything, [duration for durations in captured.values() for duration in durations]))
+
+
+def summary(label: str, latencies: List[float], captured: List[float]) -> str:
+    latencies, captured = sorted(latencies), sorted(captured)
+    return f"{label:40} {len(latencies):6} " + " ".join(
+        f"{percentile(latencies, fraction) * 1000:7.1f}ms" for fraction in (0.5, 0.9, 0.99, 1.0)
+    ) + " " + f"{percentile(captured, 0.5) * 1000:11.1f}ms {percentile(captured, 0.99) * 1000:7.1f}ms"
+
+
+def start_server(port: int, database: Path, workers: int) -> subprocess.Popen:
+    environment = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        MOVIE_API_DATABASE_URL=f"sqlite:///{database}",
+        MOVIE_API_TRAFFIC_CAPTURE_ENABLED="false",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=environment,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay captured traffic against a copy of a seed database and report latencies per route"
+    )
+    parser.add_argument("captures", nargs="+", type=Path, help="capture files, including rotated ones")
+    parser.add_argument("--seed", type=Path, default=ROOT / "movies.db",
+                        help="database to copy for the replay, e.g. a snapshot taken when the capture started")
+    parser.add_argument("--salt", help="MOVIE_API_TRAFFIC_CAPTURE_SALT of the capture, to pseudonymize the seed")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay rate relative to the captured rate")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--base-url", help="replay against a running API instead of starting one")
+    args = parser.parse_args()
+
+    lines = load_capture(args.captures, args.limit)
+    if not lines:
+        raise SystemExit("The capture files have no requests")
+    if args.base_url:
+        replay(lines, args.base_url, args.speed, args.concurrency)
+        sys.exit(0)
+
+    directory = Path(tempfile.mkdtemp(prefix="replay-"))
+    database = directory / "movies.db"
+    shutil.copy(args.seed, database)
+    if args.salt:
+        pseudonymize_seed(database, args.salt)
+    port = free_port()
+    server = start_server(port, database, args.workers)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            wait_for(client)
+        replay(lines, f"http://127.0.0.1:{port}", args.speed, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
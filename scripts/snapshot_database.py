@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Copy the database, and any rating partitions, into a snapshot directory while the API runs"
+    )
+    parser.add_argument("--dir", default=os.environ.get("MOVIE_API_SNAPSHOT_DIR", "./snapshots"),
+                        help="directory that snapshots are created in")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["MOVIE_API_SNAPSHOT_DIR"] = args.dir
+
+from app.database.connection import snapshot_sources
+from app.database.snapshots import COMPLETED, new_snapshot, take_snapshot
+
+
+def main() -> int:
+    snapshot = new_snapshot()
+    started = time.perf_counter()
+    worker = threading.Thread(target=take_snapshot, args=(snapshot, snapshot_sources()))
+    worker.start()
+    while worker.is_alive():
+        worker.join(1)
+        print(f"  {snapshot.pages_copied} pages copied, {snapshot.restarts} restarts", file=sys.stderr)
+    if snapshot.status != COMPLETED:
+        print(f"snapshot failed: {snapshot.error}", file=sys.stderr)
+        return 1
+
+    print(f"{snapshot.path} ({snapshot.pages_total} pages, {snapshot.restarts} restarts, "
+          f"{time.perf_counter() - started:.1f}s)")
+    print("serve it read-only with:")
+    print(f"  MOVIE_API_READ_ONLY=true MOVIE_API_DATABASE_URL=sqlite:///{snapshot.path}/movies.db \\")
+    if len(snapshot.files) > 1:
+        print(f"  MOVIE_API_RATING_PARTITIONS={len(snapshot.files) - 1} "
+              f"MOVIE_API_RATING_PARTITION_URL='sqlite:///{snapshot.path}/ratings-{{partition}}.db' \\")
+    print("  uvicorn app.main:app")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
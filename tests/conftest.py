@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def run_script():
+    # The check scripts seed or copy their own scratch databases, so running
+    # them leaves movies.db untouched.
+    def run(name: str, *args: str) -> None:
+        result = subprocess.run(
+            [sys.executable, str(ROOT / "scripts" / name), *args],
+            cwd=ROOT, capture_output=True, text=True, timeout=600,
+        )
+        assert result.returncode == 0, f"{name} failed:\n{result.stdout}{result.stderr}"
+
+    return run
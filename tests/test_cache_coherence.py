@@ -0,0 +1,2 @@
+def test_changes_reach_other_worker(run_script):
+    run_script("check_cache_coherence.py")
@@ -0,0 +1,2 @@
+def test_memory_within_budgets(run_script):
+    run_script("check_memory_budgets.py", "--no-report")
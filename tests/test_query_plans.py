@@ -0,0 +1,2 @@
+def test_query_plans_within_budgets(run_script):
+    run_script("check_query_plans.py")